@@ -0,0 +1,3 @@
+from .daemon.server import main
+
+main()
@@ -0,0 +1,204 @@
+import warnings
+from collections import deque
+from typing import Callable, Dict, List, Mapping, Optional, Tuple
+
+from .subscriptions import EventFilter, Subscription
+
+# Keysyms of modifier keys, which type nothing but do not move the cursor either: Shift_L to Hyper_R, and ISO_Lock to ISO_Level5_Lock.
+_MODIFIER_KEYSYMS = (range(0xffe1, 0xffef), range(0xfe01, 0xfe10))
+# Characters that edit text instead of typing it, and make us forget what was typed before them.
+_RESET_CHARS = frozenset('\x1b\x7f')
+
+class AbbreviationAutomaton:
+	"""
+	An Aho-Corasick automaton over every trigger at once, compiled once and never modified.
+
+	Each state stands for the longest suffix of the typed text that is a prefix of some trigger.
+	Typing a character follows a goto edge, falling back along failure links when there is none,
+	which costs O(1) amortized per character however many triggers there are.
+	"""
+	def __init__(self, triggers: Mapping[str, Callable]):
+		self.triggers: Dict[str, Callable] = dict(triggers)
+		self._goto: List[Dict[str, int]] = [{}]
+		self._depth = [0]
+		# The trigger ending at each state, if any.
+		self._output: List[Optional[str]] = [None]
+		for trigger in self.triggers:
+			if not trigger:
+				raise ValueError('Triggers cannot be empty.')
+			state = 0
+			for char in trigger:
+				next_state = self._goto[state].get(char)
+				if next_state is None:
+					next_state = len(self._goto)
+					self._goto[state][char] = next_state
+					self._goto.append({})
+					self._depth.append(self._depth[state] + 1)
+					self._output.append(None)
+				state = next_state
+			self._output[state] = trigger
+		self._fail = [0] * len(self._goto)
+		# The next state along the failure links that ends a trigger, or 0.
+		self._dictionary = [0] * len(self._goto)
+		queue = deque(self._goto[0].values())
+		while queue:
+			state = queue.popleft()
+			for char, next_state in self._goto[state].items():
+				fallback = self._fail[state]
+				while fallback and char not in self._goto[fallback]:
+					fallback = self._fail[fallback]
+				target = self._goto[fallback].get(char, 0)
+				self._fail[next_state] = target if target != next_state else 0
+				self._dictionary[next_state] = target if self._output[target] is not None else self._dictionary[target]
+				queue.append(next_state)
+		self.max_length = max(self._depth)
+
+	def step(self, state: int, char: str) -> int:
+		""" Returns the state after typing char in the given state. """
+		goto = self._goto
+		while state and char not in goto[state]:
+			state = self._fail[state]
+		return goto[state].get(char, 0)
+
+	def shadowing(self, trigger: str):
+		""" Yields (other, end) for every trigger matched while typing trigger, before its last character. end is the index just past other. """
+		state = 0
+		for end, char in enumerate(trigger[:-1], 1):
+			state = self.step(state, char)
+			for other in self.matches(state):
+				yield other, end
+
+	def matches(self, state: int):
+		""" Yields every trigger the typed text ends with in the given state, longest first. """
+		if self._output[state] is None:
+			state = self._dictionary[state]
+		while state:
+			yield self._output[state]
+			state = self._dictionary[state]
+
+class AbbreviationMatcher:
+	"""
+	Calls a function whenever its trigger is typed, e.g. for text expansion.
+	Triggers are matched against translated characters, with one automaton step per keystroke.
+
+	Backspace undoes the last character. Keys that type nothing and are not modifiers,
+	such as arrows, and escape, make the matcher forget what was typed before them.
+	After a trigger fires, matching starts over. A trigger containing a shorter one, such as 'hers' and 'he',
+	can therefore never fire, and setting such triggers warns with a RuntimeWarning.
+	With word_start, triggers only fire when typed at the start of a word.
+
+	set_triggers() replaces every trigger while the Listener keeps running.
+	The new automaton is compiled on the calling thread, and swapped in with a single assignment.
+	"""
+	def __init__(self, triggers: Optional[Mapping[str, Callable]]=None, word_start: bool=False, history: int=64):
+		self.word_start = word_start
+		self._automaton = self._compile(triggers or {})
+		# The automaton our states belong to. When it is not the current one, they are rebuilt from _chars.
+		self._states_automaton = self._automaton
+		self._chars = deque(maxlen=history)
+		self._states = deque(maxlen=history)
+
+	@property
+	def triggers(self) -> Dict[str, Callable]:
+		return self._automaton.triggers
+
+	def set_triggers(self, triggers: Mapping[str, Callable]):
+		""" Replaces every trigger. Safe to call from any thread, and typed text that was already seen is kept. """
+		self._automaton = self._compile(triggers)
+
+	def _compile(self, triggers: Mapping[str, Callable]) -> AbbreviationAutomaton:
+		""" Compiles triggers, warning about those that a shorter trigger always fires in front of. """
+		automaton = AbbreviationAutomaton(triggers)
+		shadowed = []
+		for trigger in automaton.triggers:
+			for other, end in automaton.shadowing(trigger):
+				start = end - len(other)
+				# With word_start, a trigger inside a word of another does not fire.
+				if not self.word_start or start == 0 or not trigger[start - 1].isalnum():
+					shadowed.append('{!r} by {!r}'.format(trigger, other))
+					break
+		if shadowed:
+			warnings.warn('{} triggers can never fire, as a shorter trigger fires first: {}{}.'.format(
+				len(shadowed), ', '.join(shadowed[:5]), ', ...' if len(shadowed) > 5 else ''
+			), RuntimeWarning)
+		return automaton
+
+	def add_trigger(self, trigger: str, function: Callable):
+		""" Adds or replaces one trigger. Recompiles the automaton, so prefer set_triggers() for many at once. """
+		triggers = dict(self.triggers)
+		triggers[trigger] = function
+		self.set_triggers(triggers)
+
+	def remove_trigger(self, trigger: str):
+		triggers = dict(self.triggers)
+		triggers.pop(trigger, None)
+		self.set_triggers(triggers)
+
+	def reset(self):
+		""" Forgets what has been typed. """
+		self._chars.clear()
+		self._states.clear()
+
+	def feed(self, char: str) -> Optional[Tuple[str, Callable]]:
+		""" Advances by one typed character. Returns the (trigger, function) typed by it, if any. """
+		automaton = self._automaton
+		if automaton is not self._states_automaton:
+			self._replay(automaton)
+		if char == '\b':
+			if self._chars:
+				self._chars.pop()
+				self._states.pop()
+			return None
+		if char in _RESET_CHARS:
+			self.reset()
+			return None
+		state = automaton.step(self._states[-1] if self._states else 0, char)
+		self._chars.append(char)
+		self._states.append(state)
+		for trigger in automaton.matches(state):
+			if self.word_start and not self._at_word_start(len(trigger)):
+				continue
+			self.reset()
+			return trigger, automaton.triggers[trigger]
+		return None
+
+	def _at_word_start(self, length: int) -> bool:
+		if len(self._chars) <= length:
+			return True
+		return not self._chars[-length - 1].isalnum()
+
+	def _replay(self, automaton: AbbreviationAutomaton):
+		""" Rebuilds our states in a new automaton from the characters typed so far. """
+		self._states.clear()
+		state = 0
+		for char in self._chars:
+			state = automaton.step(state, char)
+			self._states.append(state)
+		self._states_automaton = automaton
+
+	def attach(self, listener, translate: Optional[Callable[[int, int], Optional[str]]]=None) -> Subscription:
+		"""
+		Feeds a Listener's key presses to this matcher, and calls matched functions from the Listener's thread.
+		translate(keycode, modifiers) returns the character a key types, '' for keys to ignore such as modifiers,
+		or None for keys that make us forget what was typed. By default, the Listener's keymap translates.
+		"""
+		if translate is None:
+			translate = _keymap_translator(listener.keymap)
+		def on_key(event):
+			char = translate(event.keycode, event.modifiers)
+			if char is None:
+				self.reset()
+			elif char:
+				match = self.feed(char)
+				if match is not None:
+					listener._call(match[0], match[1])
+		return listener.subscribe(on_key, EventFilter(is_keyup=False))
+
+def _keymap_translator(keymap) -> Callable[[int, int], Optional[str]]:
+	""" Translates through an X keymap, ignoring modifier keys. """
+	def translate(keycode: int, state: int) -> Optional[str]:
+		char = keymap.translate(keycode, state)
+		if char is None and any(keymap.keysym(keycode, state) in keysyms for keysyms in _MODIFIER_KEYSYMS):
+			return ''
+		return char
+	return translate
@@ -0,0 +1,57 @@
+from collections import namedtuple
+from contextlib import contextmanager
+from threading import RLock, get_ident
+from types import MappingProxyType
+from typing import Mapping, Optional
+
+BindingSnapshot = namedtuple('BindingSnapshot', ['version', 'functions'])
+BindingSnapshot.__doc__ = """
+An immutable, versioned set of bindings.
+functions maps (keycode, modifiers, call_after_release) to the bound function, and cannot be modified.
+"""
+
+class BindingTable:
+	"""
+	Holds a Listener's bindings as copy-on-write snapshots.
+
+	The Listener's thread reads self.snapshot without taking any lock.
+	Writers edit a private copy inside edit(), which is published as a new
+	snapshot, with a single attribute assignment, when the outermost edit() exits.
+	Nested edits therefore produce one new version between them.
+	"""
+	def __init__(self):
+		self.snapshot = BindingSnapshot(0, MappingProxyType({}))
+		self._lock = RLock()
+		self._pending: Optional[dict] = None
+		self._depth = 0
+		self._writer: Optional[int] = None
+
+	def view(self) -> Mapping:
+		"""
+		Returns the bindings as the calling thread should see them.
+		The thread that is editing sees its unpublished edits, everyone else sees the latest snapshot.
+		"""
+		if self._writer == get_ident():
+			return self._pending
+		return self.snapshot.functions
+
+	@contextmanager
+	def edit(self):
+		""" Yields a dict of bindings to modify. Changes are published once the outermost edit() exits. """
+		with self._lock:
+			if self._depth == 0:
+				self._pending = dict(self.snapshot.functions)
+				self._writer = get_ident()
+			self._depth += 1
+			try:
+				yield self._pending
+			finally:
+				self._depth -= 1
+				if self._depth == 0:
+					pending = self._pending
+					self._pending = None
+					self._writer = None
+					# Edits that raised part way through are published as well.
+					# Anything grabbed before the error must stay bound, so that it can be ungrabbed later.
+					if pending != self.snapshot.functions:
+						self.snapshot = BindingSnapshot(self.snapshot.version + 1, MappingProxyType(pending))
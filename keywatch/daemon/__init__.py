@@ -0,0 +1,2 @@
+from .server import HotkeyDaemon
+from .client import DaemonClient
@@ -0,0 +1,128 @@
+import socket
+from collections import deque
+from queue import Queue, Empty
+from select import select
+from threading import Lock, current_thread
+from time import monotonic
+from typing import Dict, Optional
+
+from . import protocol
+from .protocol import Kinds, Errors
+from ..listener import Listener
+from ..errors import AlreadyGrabbedError, GenericGrabError
+
+class DaemonClient(Listener):
+	"""
+	A Listener whose grabs are made by the keywatch daemon (python -m keywatch).
+	Use it exactly like a KeyGrab. Any number of processes can bind the same keys this way.
+	"""
+	def __init__(self, socket_path: Optional[str]=None, timeout: float=5):
+		super().__init__()
+		self.socket_path = socket_path or protocol.default_socket_path()
+		self.timeout = timeout
+		self._socket: Optional[socket.socket] = None
+		# Request id -> the queue its reply is put in by the Listener's thread.
+		self._waiting: Dict[int, Queue] = {}
+		# Guards request ids, _waiting, and sending.
+		self._request_lock = Lock()
+		self._request_id = 0
+		# Received bytes of an incomplete frame, and events received but not yielded yet.
+		self._buffer = b''
+		self._events = deque()
+
+	def start(self, *args, **kwargs):
+		""" Connects to the daemon, and then starts listening for events on a new thread. """
+		if self.living.is_set():
+			raise Exception('Listener has already been started.')
+		self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+		self._buffer = b''
+		self._events.clear()
+		try:
+			self._socket.connect(self.socket_path)
+			super().start(*args, **kwargs)
+		except Exception as e:
+			self._socket.close()
+			raise e
+
+	def _stop(self):
+		super()._stop()
+		# Wakes our thread from recv().
+		self._socket.shutdown(socket.SHUT_RDWR)
+
+	def _thread_entry(self):
+		super()._thread_entry()
+		self._socket.close()
+
+	def _grab(self, keycode: int, modifiers: int, call_after_release: bool):
+		self._request(Kinds.bind, keycode, modifiers, call_after_release)
+
+	def _ungrab(self, keycode: int, modifiers: int, call_after_release: bool):
+		self._request(Kinds.unbind, keycode, modifiers, call_after_release)
+
+	def _request(self, kind: int, keycode: int, modifiers: int, call_after_release: bool):
+		""" Sends a request to the daemon and waits for its reply. Raises an error if it failed. """
+		replies = Queue()
+		with self._request_lock:
+			self._request_id = (self._request_id + 1) % 65536
+			request_id = self._request_id
+			self._waiting[request_id] = replies
+			self._socket.sendall(protocol.pack(kind, keycode, modifiers, call_after_release, request_id))
+		try:
+			if current_thread() is self.thread:
+				# Called from a bound function. Our thread is the one receiving replies, so it reads its own.
+				reply = self._receive_reply(replies)
+			else:
+				reply = replies.get(timeout=self.timeout)
+		except Empty:
+			raise GenericGrabError('The keywatch daemon did not reply in time.')
+		finally:
+			with self._request_lock:
+				# A reply arriving after we gave up on it is dropped.
+				del self._waiting[request_id]
+		if reply.kind == Kinds.error:
+			message = 'keywatch daemon refused {} ({}, {}, {})'.format('bind' if kind == Kinds.bind else 'unbind', keycode, modifiers, call_after_release)
+			if reply.keycode == Errors.already_grabbed:
+				raise AlreadyGrabbedError(message)
+			if reply.keycode in (Errors.already_bound, Errors.not_bound):
+				raise KeyError(message)
+			raise GenericGrabError(message)
+
+	def _receive_reply(self, replies: Queue):
+		""" Receives frames on our own thread until a reply is put in replies. Events received meanwhile are yielded by _input afterwards. """
+		deadline = monotonic() + self.timeout
+		while replies.empty():
+			remaining = deadline - monotonic()
+			if remaining <= 0 or not select([self._socket], [], [], remaining)[0]:
+				raise Empty
+			if not self._receive():
+				raise GenericGrabError('The connection to the keywatch daemon was closed.')
+		return replies.get_nowait()
+
+	def _receive(self) -> bool:
+		""" Receives frames from the daemon, queueing events and passing replies on to _request. Returns False once the connection is closed. """
+		try:
+			data = self._socket.recv(4096)
+		except OSError:
+			return False
+		if not data:
+			return False
+		frames, self._buffer = protocol.unpack(self._buffer + data)
+		for frame in frames:
+			if frame.kind == Kinds.event:
+				self._events.append((frame.keycode, frame.modifiers, bool(frame.flags & protocol.FLAG_RELEASE)))
+				#                    keycode        modifiers        is_keyup
+			else:
+				with self._request_lock:
+					replies = self._waiting.get(frame.request_id)
+				if replies is not None:
+					replies.put(frame)
+		return True
+
+	def _input(self):
+		""" Yields the events received from the daemon. """
+		events = self._events
+		while self.living.is_set():
+			while events:
+				yield events.popleft()
+			if not self._receive():
+				break
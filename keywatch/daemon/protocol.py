@@ -0,0 +1,49 @@
+"""
+Framing used between the keywatch daemon and its clients.
+
+Every message is a fixed size frame of 8 bytes, in network byte order:
+	kind (1 byte), flags (1 byte), request id (2 bytes), keycode (2 bytes), modifiers (2 bytes)
+
+Flags bit 0 holds call_after_release for BIND/UNBIND requests, and is_keyup for EVENTs.
+ERROR replies carry their error code in the keycode field.
+"""
+
+import os
+import struct
+import tempfile
+from collections import namedtuple
+
+frame = struct.Struct('!BBHHH')
+
+Frame = namedtuple('Frame', ['kind', 'flags', 'request_id', 'keycode', 'modifiers'])
+
+class Kinds:
+	bind = 1
+	unbind = 2
+	event = 3
+	ack = 4
+	error = 5
+
+class Errors:
+	already_grabbed = 1
+	already_bound = 2
+	not_bound = 3
+	unknown = 4
+
+FLAG_RELEASE = 0x01
+
+def pack(kind: int, keycode: int=0, modifiers: int=0, release: bool=False, request_id: int=0) -> bytes:
+	return frame.pack(kind, FLAG_RELEASE if release else 0, request_id, keycode, modifiers)
+
+def unpack(buffer: bytes):
+	"""
+	Splits a receive buffer into frames.
+	Returns a list of Frames, and the bytes of an incomplete trailing frame.
+	"""
+	end = len(buffer) - len(buffer) % frame.size
+	frames = [Frame(*values) for values in frame.iter_unpack(buffer[:end])]
+	return frames, buffer[end:]
+
+def default_socket_path() -> str:
+	runtime_dir = os.environ.get('XDG_RUNTIME_DIR') or tempfile.gettempdir()
+	return os.path.join(runtime_dir, 'keywatch-{}.sock'.format(os.getuid()))
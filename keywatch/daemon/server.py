@@ -0,0 +1,257 @@
+import os
+import socket
+import selectors
+from argparse import ArgumentParser
+from functools import partial
+from threading import Lock
+from typing import Dict, Optional, Set
+
+from . import protocol
+from .protocol import Kinds, Errors
+from ..listener import Listener
+from ..errors import AlreadyGrabbedError
+
+# A client that falls this many bytes behind on events is disconnected.
+MAX_BACKLOG = 64 * 1024
+
+class _Client:
+	""" A connection to one client process. Sending never blocks, so a stalled client cannot hold up the others. """
+	def __init__(self, connection: socket.socket):
+		self.connection = connection
+		self.buffer = b''
+		self.bindings = set()
+		self.send_lock = Lock()
+		self.alive = True
+		# Bytes the client's socket had no room for yet, sent by the main thread once it is writable.
+		self.backlog = bytearray()
+
+	def send(self, data: bytes) -> bool:
+		""" Sends data, or queues what does not fit. Returns True if the main thread now has to flush or disconnect us. """
+		with self.send_lock:
+			if not self.alive:
+				return False
+			had_backlog = bool(self.backlog)
+			if not had_backlog:
+				try:
+					data = data[self.connection.send(data):]
+				except BlockingIOError:
+					pass
+				except OSError:
+					# The main thread notices the closed connection and cleans up after it.
+					self.alive = False
+					return False
+				if not data:
+					return False
+			self.backlog += data
+			if len(self.backlog) > MAX_BACKLOG:
+				self.alive = False
+				return True
+			return not had_backlog
+
+	def flush(self):
+		""" Sends as much of the backlog as the socket takes. Called by the main thread when the socket is writable. """
+		with self.send_lock:
+			try:
+				sent = self.connection.send(self.backlog)
+			except BlockingIOError:
+				return
+			except OSError:
+				self.alive = False
+				return
+			del self.backlog[:sent]
+
+class HotkeyDaemon:
+	"""
+	Owns the grabs for every keywatch client on this desktop.
+
+	Clients bind keys through a Unix domain socket. Each binding is grabbed once,
+	however many clients ask for it, and matching events are pushed to all of them.
+	A binding is ungrabbed when its last client unbinds it or disconnects.
+	"""
+	def __init__(self, socket_path: Optional[str]=None, listener: Optional[Listener]=None):
+		if listener is None:
+			from .. import KeyGrab
+			listener = KeyGrab()
+		self.listener = listener
+		self.socket_path = socket_path or protocol.default_socket_path()
+		self._server: Optional[socket.socket] = None
+		self._selector = selectors.DefaultSelector()
+		self._clients: Dict[socket.socket, _Client] = {}
+		# binding -> the clients bound to it
+		self._subscribers: Dict[tuple, Set[_Client]] = {}
+		self._lock = Lock()
+		self._wake_read, self._wake_write = socket.socketpair()
+		self._running = False
+
+	def serve_forever(self):
+		""" Starts the Listener and serves clients until shutdown() is called. """
+		self._listen()
+		self.listener.start()
+		self._running = True
+		self._selector.register(self._wake_read, selectors.EVENT_READ)
+		try:
+			while self._running:
+				for key, mask in self._selector.select():
+					if key.fileobj is self._server:
+						self._accept()
+					elif key.fileobj is self._wake_read:
+						self._wake_read.recv(4096)
+						self._update_clients()
+					else:
+						client = self._clients.get(key.fileobj)
+						if client is not None and mask & selectors.EVENT_WRITE:
+							client.flush()
+							self._update_client(client)
+						client = self._clients.get(key.fileobj)
+						if client is not None and mask & selectors.EVENT_READ:
+							self._read(client)
+		finally:
+			self._close()
+
+	def shutdown(self):
+		""" Stops serve_forever(). May be called from any thread. """
+		self._running = False
+		self._wake_write.send(b'\0')
+
+	def _listen(self):
+		if os.path.exists(self.socket_path):
+			probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+			try:
+				probe.connect(self.socket_path)
+			except OSError:
+				# Left behind by a daemon that did not exit cleanly.
+				os.unlink(self.socket_path)
+			else:
+				raise AlreadyGrabbedError('A keywatch daemon is already listening on {}'.format(self.socket_path))
+			finally:
+				probe.close()
+		self._server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+		self._server.bind(self.socket_path)
+		os.chmod(self.socket_path, 0o600)
+		self._server.listen()
+		self._selector.register(self._server, selectors.EVENT_READ)
+
+	def _close(self):
+		for client in list(self._clients.values()):
+			self._disconnect(client)
+		self._selector.unregister(self._server)
+		self._selector.unregister(self._wake_read)
+		self._server.close()
+		self._server = None
+		os.unlink(self.socket_path)
+		self.listener.stop()
+
+	def _accept(self):
+		connection, _ = self._server.accept()
+		# Events are sent from the Listener's thread, which must never wait on a stuck client.
+		connection.setblocking(False)
+		self._clients[connection] = _Client(connection)
+		self._selector.register(connection, selectors.EVENT_READ)
+
+	def _disconnect(self, client: _Client):
+		client.alive = False
+		for binding in list(client.bindings):
+			self._unbind(client, binding)
+		self._selector.unregister(client.connection)
+		del self._clients[client.connection]
+		client.connection.close()
+
+	def _update_client(self, client: _Client):
+		""" Disconnects a client that was dropped, and waits for its socket to be writable while it has a backlog. Main thread only. """
+		if not client.alive:
+			self._disconnect(client)
+			return
+		events = selectors.EVENT_READ | (selectors.EVENT_WRITE if client.backlog else 0)
+		if self._selector.get_key(client.connection).events != events:
+			self._selector.modify(client.connection, events)
+
+	def _update_clients(self):
+		for client in list(self._clients.values()):
+			self._update_client(client)
+
+	def _read(self, client: _Client):
+		try:
+			data = client.connection.recv(4096)
+		except BlockingIOError:
+			return
+		except OSError:
+			data = b''
+		if not data or not client.alive:
+			self._disconnect(client)
+			return
+		frames, client.buffer = protocol.unpack(client.buffer + data)
+		replies = []
+		for frame in frames:
+			binding = (frame.keycode, frame.modifiers, bool(frame.flags & protocol.FLAG_RELEASE))
+			if frame.kind == Kinds.bind:
+				error = self._bind(client, binding)
+			elif frame.kind == Kinds.unbind:
+				error = self._unbind(client, binding)
+			else:
+				error = Errors.unknown
+			if error:
+				replies.append(protocol.pack(Kinds.error, error, request_id=frame.request_id))
+			else:
+				replies.append(protocol.pack(Kinds.ack, request_id=frame.request_id))
+		if client.send(b''.join(replies)):
+			self._update_client(client)
+
+	def _bind(self, client: _Client, binding: tuple) -> int:
+		""" Adds a client to a binding, grabbing it if it is new. Returns an error code, or 0. """
+		with self._lock:
+			subscribers = self._subscribers.get(binding)
+			if subscribers is None:
+				try:
+					self.listener.bind(partial(self._broadcast, binding), *binding)
+				except AlreadyGrabbedError:
+					return Errors.already_grabbed
+				except Exception:
+					return Errors.unknown
+				subscribers = self._subscribers[binding] = set()
+			elif client in subscribers:
+				return Errors.already_bound
+			subscribers.add(client)
+			client.bindings.add(binding)
+		return 0
+
+	def _unbind(self, client: _Client, binding: tuple) -> int:
+		""" Removes a client from a binding, ungrabbing it if nobody is left. Returns an error code, or 0. """
+		with self._lock:
+			subscribers = self._subscribers.get(binding)
+			if subscribers is None or client not in subscribers:
+				return Errors.not_bound
+			subscribers.discard(client)
+			client.bindings.discard(binding)
+			if not subscribers:
+				del self._subscribers[binding]
+				self.listener.unbind(*binding)
+		return 0
+
+	def _broadcast(self, binding: tuple):
+		"""
+		Called by the Listener's thread. Pushes an event to every client bound to it, without blocking.
+		Clients that fell behind or were dropped are left to the main thread.
+		"""
+		keycode, modifiers, release = binding
+		data = protocol.pack(Kinds.event, keycode, modifiers, release)
+		with self._lock:
+			subscribers = tuple(self._subscribers.get(binding, ()))
+		wake = False
+		for client in subscribers:
+			wake |= client.send(data)
+		if wake:
+			self._wake_write.send(b'\0')
+
+def main():
+	parser = ArgumentParser(prog='python -m keywatch', description='Owns all keywatch grabs, and shares them with clients over a Unix domain socket.')
+	parser.add_argument('--socket', default=None, help='Path of the socket to listen on. Defaults to {}'.format(protocol.default_socket_path()))
+	parser.add_argument('--transparent', action='store_true', help='Let other programs receive grabbed keys as well.')
+	args = parser.parse_args()
+
+	from .. import KeyGrab
+	daemon = HotkeyDaemon(args.socket, KeyGrab(transparent=True) if args.transparent else KeyGrab())
+	print('keywatch daemon listening on', daemon.socket_path)
+	try:
+		daemon.serve_forever()
+	except KeyboardInterrupt:
+		pass
@@ -0,0 +1,229 @@
+import os
+import mmap
+from bisect import bisect_left
+from collections import namedtuple
+from struct import Struct
+from threading import Lock
+from time import time
+from typing import Iterator, List, Optional
+
+from .subscriptions import EventFilter, Subscription
+
+# Record flags.
+KEYUP = 1 << 0
+MOTION = 1 << 1
+
+# timestamp in milliseconds since the epoch, keycode, flags, modifiers, pointer dx, pointer dy.
+RECORD = Struct('<QHHIii')
+# magic, version, record size, number of records written.
+HEADER = Struct('<8sHHQ')
+HEADER_SIZE = 64
+MAGIC = b'KWEVLOG\0'
+VERSION = 1
+SEGMENT_SUFFIX = '.seg'
+
+LogRecord = namedtuple('LogRecord', ['timestamp', 'keycode', 'flags', 'modifiers', 'dx', 'dy'])
+
+class RecordView:
+	"""
+	A run of consecutive records, read straight out of a segment's memory map without copying it.
+	buffer is a memoryview of the raw records, RECORD.size bytes each.
+	The view must be released before its EventLog is closed.
+	"""
+	def __init__(self, buffer: memoryview):
+		self.buffer = buffer
+
+	def __len__(self) -> int:
+		return len(self.buffer) // RECORD.size
+
+	def __getitem__(self, index: int) -> LogRecord:
+		if index < 0:
+			index += len(self)
+		if not 0 <= index < len(self):
+			raise IndexError('Record index out of range.')
+		return LogRecord._make(RECORD.unpack_from(self.buffer, index * RECORD.size))
+
+	def __iter__(self) -> Iterator[LogRecord]:
+		return map(LogRecord._make, RECORD.iter_unpack(self.buffer))
+
+	def release(self):
+		self.buffer.release()
+
+class Segment:
+	"""
+	One file of the log: a header followed by fixed-size records, mapped into memory.
+	The header's record count is updated with every append, so a reader, or a reopened log,
+	always knows how many records are valid.
+
+	Timestamps are non-decreasing within a segment. Every index_interval-th record's timestamp
+	is kept in a sparse index, which narrows a search to one block of records before bisecting it.
+	"""
+	def __init__(self, path: str, capacity: int, index_interval: int, create: bool=False):
+		self.path = path
+		self.index_interval = index_interval
+		size = HEADER_SIZE + capacity * RECORD.size
+		fd = os.open(path, os.O_RDWR | (os.O_CREAT | os.O_EXCL if create else 0))
+		try:
+			if create:
+				os.ftruncate(fd, size)
+			else:
+				size = os.fstat(fd).st_size
+			self._map = mmap.mmap(fd, size)
+		finally:
+			os.close(fd)
+		self.capacity = (size - HEADER_SIZE) // RECORD.size
+		if create:
+			HEADER.pack_into(self._map, 0, MAGIC, VERSION, RECORD.size, 0)
+			self.count = 0
+		else:
+			magic, version, record_size, self.count = HEADER.unpack_from(self._map, 0)
+			if magic != MAGIC or version != VERSION or record_size != RECORD.size:
+				self._map.close()
+				raise ValueError('{} is not an event log segment this version can read.'.format(path))
+		self._index: List[int] = [self.timestamp(i) for i in range(0, self.count, index_interval)]
+
+	@property
+	def full(self) -> bool:
+		return self.count >= self.capacity
+
+	@property
+	def first_timestamp(self) -> Optional[int]:
+		return self._index[0] if self._index else None
+
+	@property
+	def last_timestamp(self) -> Optional[int]:
+		return self.timestamp(self.count - 1) if self.count else None
+
+	def timestamp(self, index: int) -> int:
+		return RECORD.unpack_from(self._map, HEADER_SIZE + index * RECORD.size)[0]
+
+	def append(self, timestamp: int, keycode: int, flags: int, modifiers: int, dx: int, dy: int):
+		count = self.count
+		RECORD.pack_into(self._map, HEADER_SIZE + count * RECORD.size, timestamp, keycode, flags, modifiers, dx, dy)
+		if count % self.index_interval == 0:
+			self._index.append(timestamp)
+		self.count = count + 1
+		HEADER.pack_into(self._map, 0, MAGIC, VERSION, RECORD.size, self.count)
+
+	def bisect(self, timestamp: int) -> int:
+		""" Returns the index of the first record at or after timestamp. """
+		block = max(bisect_left(self._index, timestamp) - 1, 0)
+		low = block * self.index_interval
+		high = min(low + 2 * self.index_interval, self.count)
+		while low < high:
+			middle = (low + high) // 2
+			if self.timestamp(middle) < timestamp:
+				low = middle + 1
+			else:
+				high = middle
+		return low
+
+	def view(self, start: int, end: int) -> RecordView:
+		return RecordView(memoryview(self._map)[HEADER_SIZE + start * RECORD.size:HEADER_SIZE + end * RECORD.size])
+
+	def flush(self):
+		self._map.flush()
+
+	def close(self):
+		self._map.flush()
+		self._map.close()
+
+class EventLog:
+	"""
+	An append-only, on-disk log of input events, for keeping days of them without holding them as Python objects.
+
+	Events are written as fixed-size binary records into memory-mapped segment files in 'directory'.
+	A segment holds 'segment_records' records, and a new one is started when it is full.
+	Timestamps are milliseconds since the epoch. They are kept non-decreasing, so that
+	time-range queries can bisect, and only the records in range are ever read from disk.
+
+	Appends come from one thread, e.g. a Listener's. Queries are safe from any thread.
+	"""
+	def __init__(self, directory: str, segment_records: int=1 << 20, index_interval: int=256):
+		self.directory = directory
+		self.segment_records = segment_records
+		self.index_interval = index_interval
+		self._lock = Lock()
+		self._last_timestamp = 0
+		os.makedirs(directory, exist_ok=True)
+		names = sorted(name for name in os.listdir(directory) if name.endswith(SEGMENT_SUFFIX))
+		self._segments: List[Segment] = [Segment(os.path.join(directory, name), 0, index_interval) for name in names]
+		if self._segments and self._segments[-1].count:
+			self._last_timestamp = self._segments[-1].last_timestamp
+
+	def append(self, timestamp: int, keycode: int=0, modifiers: int=0, flags: int=0, dx: int=0, dy: int=0):
+		""" Writes one record. A timestamp older than the previous record's is recorded as the previous record's. """
+		if timestamp < self._last_timestamp:
+			timestamp = self._last_timestamp
+		segment = self._segments[-1] if self._segments else None
+		if segment is None or segment.full:
+			segment = self._new_segment()
+		segment.append(timestamp, keycode, flags, modifiers, dx, dy)
+		self._last_timestamp = timestamp
+
+	def _new_segment(self) -> Segment:
+		with self._lock:
+			if self._segments:
+				self._segments[-1].flush()
+			number = int(os.path.basename(self._segments[-1].path)[:-len(SEGMENT_SUFFIX)]) + 1 if self._segments else 0
+			path = os.path.join(self.directory, '{:010d}{}'.format(number, SEGMENT_SUFFIX))
+			segment = Segment(path, self.segment_records, self.index_interval, create=True)
+			self._segments.append(segment)
+		return segment
+
+	def range(self, start: int, end: int) -> List[RecordView]:
+		""" Returns views of every record with start <= timestamp < end, one view per segment. Nothing is copied. """
+		with self._lock:
+			segments = tuple(self._segments)
+		views = []
+		for segment in segments:
+			count = segment.count
+			if not count or segment.first_timestamp >= end or segment.timestamp(count - 1) < start:
+				continue
+			first = segment.bisect(start)
+			last = segment.bisect(end)
+			if first < last:
+				views.append(segment.view(first, last))
+		return views
+
+	def events(self, start: int, end: int) -> Iterator[LogRecord]:
+		""" Yields every record with start <= timestamp < end, in order. """
+		views = self.range(start, end)
+		try:
+			for view in views:
+				yield from view
+		finally:
+			# Even when iteration stops early, so that close() does not find the buffers still exported.
+			for view in views:
+				view.release()
+
+	def __len__(self) -> int:
+		return sum(segment.count for segment in self._segments)
+
+	def flush(self):
+		""" Writes everything appended so far to disk. """
+		for segment in tuple(self._segments):
+			segment.flush()
+
+	def close(self):
+		with self._lock:
+			for segment in self._segments:
+				segment.close()
+			self._segments = []
+
+	def attach(self, listener, event_filter: Optional[EventFilter]=None) -> Subscription:
+		"""
+		Records every key and button event of a Listener that matches event_filter.
+		Timestamps are the events' own, moved onto the wall clock.
+		"""
+		def record(event):
+			timestamp = listener._event_timestamp() - listener._clock() + int(time() * 1000)
+			self.append(timestamp, event.keycode, event.modifiers, KEYUP if event.is_keyup else 0)
+		return listener.subscribe(record, event_filter)
+
+	def movement_fn(self, listener):
+		""" Returns a movement function, for set_movement_fn(), that records each (pos, delta) sample as a motion record. """
+		def record(pos, delta):
+			timestamp = listener._event_timestamp() - listener._clock() + int(time() * 1000)
+			self.append(timestamp, flags=MOTION, dx=delta[0], dy=delta[1])
+		return record
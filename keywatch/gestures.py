@@ -0,0 +1,179 @@
+from math import atan2, hypot, pi
+from time import monotonic
+from typing import Callable, List, Optional, Sequence, Tuple
+
+# Directions in screen coordinates, where y grows downwards. Indexes go clockwise from 'right'.
+DIRECTIONS = ('right', 'down-right', 'down', 'down-left', 'left', 'up-left', 'up', 'up-right')
+
+def direction_of(dx: float, dy: float) -> int:
+	""" Quantizes a movement into one of the eight DIRECTIONS, returning its index. """
+	return round(atan2(dy, dx) / (pi / 4)) % 8
+
+def _substitution_cost(a: int, b: int) -> float:
+	""" 0 for the same direction, 0.25 for neighbouring directions, up to 1 for opposite ones. """
+	difference = abs(a - b) % 8
+	return min(difference, 8 - difference) / 4
+
+class StrokeTemplate:
+	"""
+	A stroke as a sequence of directions, e.g. ('down', 'right') for an L shape.
+	Matched against the stroke being drawn with an edit distance that is updated
+	one column at a time, as each new direction of the stroke is settled.
+	"""
+	def __init__(self, function: Callable, directions: Sequence[str]):
+		self.function = function
+		self.directions = tuple(DIRECTIONS.index(direction) for direction in directions)
+		self.reset()
+
+	def reset(self):
+		# Edit distance between the empty stroke and each prefix of the template.
+		self.column = [float(i) for i in range(len(self.directions) + 1)]
+
+	def append(self, direction: int):
+		""" Extends the stroke by one direction. Costs O(len(template)), regardless of the stroke's length. """
+		previous = self.column
+		column = [previous[0] + 1]
+		for i, expected in enumerate(self.directions, 1):
+			column.append(min(
+				previous[i] + 1,
+				column[i - 1] + 1,
+				previous[i - 1] + _substitution_cost(direction, expected),
+			))
+		self.column = column
+
+	@property
+	def distance(self) -> float:
+		return self.column[-1]
+
+class GestureRecognizer:
+	"""
+	Recognizes strokes, flicks and drags made while a mouse button is held.
+
+	Movement is resampled as it arrives, into a point every 'spacing' pixels of travel.
+	Each resampled segment is quantized to a direction, and a direction only counts once it
+	has lasted 'min_run' segments, which filters out jitter. Settled directions are matched
+	against every stroke template incrementally. Each sample therefore costs the same,
+	however long the stroke gets, and nothing is stored per point.
+
+	Bound functions are called when the button is released, from the Listener's thread:
+	the best matching stroke within 'tolerance' wins, then a flick, then a drag.
+	"""
+	def __init__(self, button: int=3, spacing: float=12, min_run: int=2, tolerance: float=0.75,
+			flick_speed: float=1500, flick_time: float=0.3, drag_distance: float=8):
+		self.button = button
+		self.spacing = spacing
+		self.min_run = min_run
+		self.tolerance = tolerance
+		self.flick_speed = flick_speed
+		self.flick_time = flick_time
+		self.drag_distance = drag_distance
+		self._strokes: List[StrokeTemplate] = []
+		self._flicks: List[Tuple[Optional[int], Callable]] = []
+		self._drags: List[Callable] = []
+		self._active = False
+		self._reset((0, 0))
+
+	def bind_stroke(self, function: Callable, directions: Sequence[str]):
+		""" Calls function() when a stroke made of these DIRECTIONS, in order, is drawn. """
+		self._strokes.append(StrokeTemplate(function, directions))
+
+	def bind_flick(self, function: Callable, direction: Optional[str]=None):
+		""" Calls function() after a quick flick in a direction, or function(direction) for any direction if it is None. """
+		self._flicks.append((DIRECTIONS.index(direction) if direction is not None else None, function))
+
+	def bind_drag(self, function: Callable):
+		""" Calls function(start_pos, end_pos) when the button is released after moving, unless a stroke or flick matched. """
+		self._drags.append(function)
+
+	def attach(self, listener, modifiers: int=0):
+		"""
+		Feeds a mouse Listener's movement and our button's events to this recognizer.
+		Replaces the Listener's movement function.
+		"""
+		listener.bind(self.press, self.button, modifiers)
+		listener.bind(self.release, self.button, modifiers, True)
+		listener.set_movement_fn(self.on_movement)
+
+	def press(self):
+		self._active = True
+		self._reset(self._pos)
+
+	def release(self):
+		if not self._active:
+			return
+		self._active = False
+		self._complete()
+
+	def on_movement(self, pos, delta):
+		""" Movement function, receiving (pos, delta) for each movement sample. """
+		self._pos = pos
+		if not self._active:
+			return
+		now = monotonic()
+		elapsed = now - self._last_sample
+		if elapsed > 0:
+			# Exponential moving average, so that only the last few samples set the speed.
+			self._velocity = (
+				0.5 * self._velocity[0] + 0.5 * delta[0] / elapsed,
+				0.5 * self._velocity[1] + 0.5 * delta[1] / elapsed,
+			)
+		self._last_sample = now
+		self._resample(pos)
+
+	def _reset(self, pos):
+		self._pos = pos
+		self._start = pos
+		self._anchor = pos
+		self._pressed_at = self._last_sample = monotonic()
+		self._velocity = (0.0, 0.0)
+		self._run_direction: Optional[int] = None
+		self._run_length = 0
+		self._settled: Optional[int] = None
+		for stroke in self._strokes:
+			stroke.reset()
+
+	def _resample(self, pos):
+		""" Emits a segment each time the pointer has travelled 'spacing' pixels from the previous resampled point. """
+		dx, dy = pos[0] - self._anchor[0], pos[1] - self._anchor[1]
+		distance = hypot(dx, dy)
+		while distance >= self.spacing:
+			step = self.spacing / distance
+			self._anchor = (self._anchor[0] + dx * step, self._anchor[1] + dy * step)
+			self._segment(direction_of(dx, dy))
+			dx, dy = pos[0] - self._anchor[0], pos[1] - self._anchor[1]
+			distance = hypot(dx, dy)
+
+	def _segment(self, direction: int):
+		if direction == self._run_direction:
+			self._run_length += 1
+		else:
+			self._run_direction = direction
+			self._run_length = 1
+		if self._run_length == self.min_run and direction != self._settled:
+			self._settled = direction
+			for stroke in self._strokes:
+				stroke.append(direction)
+
+	def _complete(self):
+		moved = hypot(self._pos[0] - self._start[0], self._pos[1] - self._start[1])
+		if self._settled is not None and self._strokes:
+			best = min(self._strokes, key=lambda stroke: stroke.distance)
+			if best.distance <= self.tolerance:
+				best.function()
+				return
+		speed = hypot(*self._velocity)
+		if self._flicks and speed >= self.flick_speed and monotonic() - self._pressed_at <= self.flick_time:
+			direction = direction_of(*self._velocity)
+			flicked = False
+			for flick_direction, function in self._flicks:
+				if flick_direction is None:
+					function(DIRECTIONS[direction])
+					flicked = True
+				elif flick_direction == direction:
+					function()
+					flicked = True
+			if flicked:
+				return
+		if moved >= self.drag_distance:
+			for function in self._drags:
+				function(self._start, self._pos)
@@ -0,0 +1,58 @@
+from typing import Iterable, Optional, Tuple
+
+class InputState:
+	"""
+	Which keys and buttons are held down, and where the pointer is, as last seen by a Listener.
+
+	Written only by the Listener's thread, from the events it receives.
+	Reads are plain lookups in a 256-bit bitmap, or of a tuple, so they are safe from any thread.
+	Like X, we only track keycodes and buttons up to 255. Higher ones, which evdev can report, are ignored.
+	"""
+	def __init__(self):
+		self._keys = bytearray(32)
+		self._buttons = bytearray(32)
+		self.pos: Tuple[int, int] = (0, 0)
+
+	def is_pressed(self, keycode: int) -> bool:
+		return keycode < 256 and bool(self._keys[keycode >> 3] & (1 << (keycode & 7)))
+
+	def is_button_pressed(self, button: int) -> bool:
+		return button < 256 and bool(self._buttons[button >> 3] & (1 << (button & 7)))
+
+	def pressed_keys(self) -> Tuple[int, ...]:
+		return self._set_bits(bytes(self._keys))
+
+	def pressed_buttons(self) -> Tuple[int, ...]:
+		return self._set_bits(bytes(self._buttons))
+
+	def seed(self, keymap: Iterable[int], buttons: Iterable[int]=(), pos: Optional[Tuple[int, int]]=None):
+		"""
+		Replaces our state. keymap is 32 bytes with a bit set for each held keycode, as XQueryKeymap returns.
+		buttons are the held buttons' numbers.
+		"""
+		keys = bytearray(keymap)
+		held_buttons = bytearray(32)
+		for button in buttons:
+			self._set(held_buttons, button, True)
+		self._keys, self._buttons = keys, held_buttons
+		if pos is not None:
+			self.pos = pos
+
+	def set_key(self, keycode: int, pressed: bool):
+		self._set(self._keys, keycode, pressed)
+
+	def set_button(self, button: int, pressed: bool):
+		self._set(self._buttons, button, pressed)
+
+	@staticmethod
+	def _set(bitmap: bytearray, index: int, pressed: bool):
+		if index >= 256:
+			return
+		if pressed:
+			bitmap[index >> 3] |= 1 << (index & 7)
+		else:
+			bitmap[index >> 3] &= ~(1 << (index & 7)) & 0xff
+
+	@staticmethod
+	def _set_bits(bitmap: bytes) -> Tuple[int, ...]:
+		return tuple(byte_index * 8 + bit for byte_index, byte in enumerate(bitmap) if byte for bit in range(8) if byte & (1 << bit))
@@ -1 +1,13 @@
-from .x11 import *
\ No newline at end of file
+from os import environ as _environ
+
+_use_x11 = 'DISPLAY' in _environ
+if _use_x11:
+	try:
+		from .x11 import *
+	except ImportError:
+		# python-xlib is not installed.
+		_use_x11 = False
+if not _use_x11:
+	# There is no X server to use, as is common on headless machines.
+	# Fall back to reading the input devices directly.
+	from .evdev import *
@@ -0,0 +1,3 @@
+from .keygrab import KeyGrab
+from .keyboard_grab import KeyboardGrab
+from .mouse_grab import MouseGrab
@@ -0,0 +1,110 @@
+import os
+import errno
+from fcntl import ioctl
+from glob import glob
+
+from . import ecodes
+from ...errors import AlreadyGrabbedError, GenericGrabError
+
+# Number of input_event structs we try to read from a device in one read() call.
+READ_BATCH = 64
+
+def _test_bit(bits: bytes, bit: int) -> bool:
+	return bool(bits[bit // 8] & (1 << (bit % 8)))
+
+class InputDevice:
+	""" A /dev/input/event* character device. """
+	def __init__(self, path: str):
+		self.path = path
+		self.fd = os.open(path, os.O_RDONLY | os.O_NONBLOCK)
+		self.is_grabbed = False
+		try:
+			self.name = self._ioctl_buffer(ecodes.EVIOCGNAME, 256).split(b'\0', 1)[0].decode(errors='replace')
+			self._key_bits = self._ioctl_buffer(lambda n: ecodes.EVIOCGBIT(ecodes.EV_KEY, n), ecodes.KEY_MAX // 8 + 1)
+			self._rel_bits = self._ioctl_buffer(lambda n: ecodes.EVIOCGBIT(ecodes.EV_REL, n), 2)
+		except OSError:
+			os.close(self.fd)
+			raise
+
+	def _ioctl_buffer(self, request, length: int) -> bytes:
+		return ioctl(self.fd, request(length), bytes(length))
+
+	@property
+	def is_keyboard(self) -> bool:
+		return _test_bit(self._key_bits, ecodes.KEY_A) and _test_bit(self._key_bits, ecodes.KEY_SPACE)
+
+	@property
+	def is_mouse(self) -> bool:
+		return (_test_bit(self._key_bits, ecodes.BTN_LEFT)
+			and _test_bit(self._rel_bits, ecodes.REL_X)
+			and _test_bit(self._rel_bits, ecodes.REL_Y))
+
+	def pressed_keys(self):
+		""" Returns the evdev codes of every key currently held down on this device. """
+		bits = self._ioctl_buffer(ecodes.EVIOCGKEY, ecodes.KEY_MAX // 8 + 1)
+		return [code for code in range(ecodes.KEY_MAX + 1) if _test_bit(bits, code)]
+
+	def leds(self):
+		""" Returns the LED codes that are currently lit on this device. """
+		bits = self._ioctl_buffer(ecodes.EVIOCGLED, ecodes.LED_MAX // 8 + 1)
+		return [code for code in range(ecodes.LED_MAX + 1) if _test_bit(bits, code)]
+
+	def grab(self):
+		"""
+		Takes exclusive access of the device using EVIOCGRAB.
+		Afterwards, its events are only delivered to us.
+		"""
+		try:
+			ioctl(self.fd, ecodes.EVIOCGRAB, 1)
+		except OSError as e:
+			if e.errno == errno.EBUSY:
+				raise AlreadyGrabbedError('Error grabbing {} ({}). It is grabbed by another process.'.format(self.path, self.name))
+			raise GenericGrabError('Error grabbing {} ({}). {}'.format(self.path, self.name, e))
+		self.is_grabbed = True
+
+	def ungrab(self):
+		if self.is_grabbed:
+			ioctl(self.fd, ecodes.EVIOCGRAB, 0)
+			self.is_grabbed = False
+
+	def read(self):
+		"""
+		Reads every pending event from the device, up to READ_BATCH events per system call.
+		Yields (type, code, value) tuples.
+		"""
+		while True:
+			try:
+				data = os.read(self.fd, ecodes.input_event.size * READ_BATCH)
+			except BlockingIOError:
+				return
+			for _, _, type_, code, value in ecodes.input_event.iter_unpack(data):
+				yield type_, code, value
+			if len(data) < ecodes.input_event.size * READ_BATCH:
+				return
+
+	def fileno(self):
+		return self.fd
+
+	def close(self):
+		if self.fd is None:
+			return
+		try:
+			self.ungrab()
+		except OSError:
+			# The device has been unplugged.
+			pass
+		os.close(self.fd)
+		self.fd = None
+
+	def __repr__(self):
+		return '{}({!r}, {!r})'.format(self.__class__.__name__, self.path, self.name)
+
+def list_devices(pattern='/dev/input/event*'):
+	""" Returns an InputDevice for every event device we are allowed to open. """
+	devices = []
+	for path in sorted(glob(pattern)):
+		try:
+			devices.append(InputDevice(path))
+		except OSError:
+			continue
+	return devices
@@ -0,0 +1,94 @@
+"""
+Constants from linux/input-event-codes.h, linux/input.h and linux/uinput.h.
+Only the values keywatch needs are listed here.
+"""
+
+import struct
+
+# struct input_event { struct timeval time; __u16 type; __u16 code; __s32 value; }
+input_event = struct.Struct('llHHi')
+
+# Event types
+EV_SYN = 0x00
+EV_KEY = 0x01
+EV_REL = 0x02
+EV_MSC = 0x04
+EV_LED = 0x11
+
+SYN_REPORT = 0
+
+# Key values
+KEY_UP = 0
+KEY_DOWN = 1
+KEY_REPEAT = 2
+
+KEY_MAX = 0x2ff
+
+KEY_A = 30
+KEY_SPACE = 57
+
+KEY_LEFTCTRL = 29
+KEY_LEFTSHIFT = 42
+KEY_RIGHTSHIFT = 54
+KEY_LEFTALT = 56
+KEY_CAPSLOCK = 58
+KEY_NUMLOCK = 69
+KEY_RIGHTCTRL = 97
+KEY_RIGHTALT = 100
+KEY_LEFTMETA = 125
+KEY_RIGHTMETA = 126
+
+BTN_LEFT = 0x110
+BTN_RIGHT = 0x111
+BTN_MIDDLE = 0x112
+BTN_SIDE = 0x113
+BTN_EXTRA = 0x114
+
+REL_X = 0x00
+REL_Y = 0x01
+REL_HWHEEL = 0x06
+REL_WHEEL = 0x08
+
+LED_NUML = 0x00
+LED_CAPSL = 0x01
+LED_MAX = 0x0f
+
+BUS_VIRTUAL = 0x06
+
+# X11 keycodes are evdev keycodes offset by 8.
+# We report X11 keycodes so that bindings work the same with either backend.
+X_KEYCODE_OFFSET = 8
+
+
+# ioctl request number construction, see asm-generic/ioctl.h
+_IOC_WRITE = 1
+_IOC_READ = 2
+
+def _IOC(direction, type_, nr, size):
+	return (direction << 30) | (size << 16) | (ord(type_) << 8) | nr
+
+def EVIOCGNAME(length):
+	return _IOC(_IOC_READ, 'E', 0x06, length)
+
+def EVIOCGKEY(length):
+	return _IOC(_IOC_READ, 'E', 0x18, length)
+
+def EVIOCGLED(length):
+	return _IOC(_IOC_READ, 'E', 0x19, length)
+
+def EVIOCGBIT(event_type, length):
+	return _IOC(_IOC_READ, 'E', 0x20 + event_type, length)
+
+EVIOCGRAB = _IOC(_IOC_WRITE, 'E', 0x90, 4)
+
+UI_DEV_CREATE = _IOC(0, 'U', 1, 0)
+UI_DEV_DESTROY = _IOC(0, 'U', 2, 0)
+UI_SET_EVBIT = _IOC(_IOC_WRITE, 'U', 100, 4)
+UI_SET_KEYBIT = _IOC(_IOC_WRITE, 'U', 101, 4)
+UI_SET_RELBIT = _IOC(_IOC_WRITE, 'U', 102, 4)
+
+def UI_GET_SYSNAME(length):
+	return _IOC(_IOC_READ, 'U', 44, length)
+
+# struct uinput_user_dev { char name[80]; struct input_id id; __u32 ff_effects_max; __s32 abs*[64] x4; }
+uinput_user_dev = struct.Struct('80sHHHHI256i')
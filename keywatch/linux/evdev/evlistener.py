@@ -0,0 +1,241 @@
+import os
+from typing import Iterable, List, Optional
+
+from . import ecodes
+from .device import InputDevice, list_devices
+from ...listener import Listener
+from ...errors import GenericGrabError
+
+# Keycodes below this value are keyboard keys. Mouse buttons start here.
+BTN_MISC = 0x100
+
+class Masks:
+	""" X11 modifier masks. We use the same values so that bindings carry over between the Linux backends. """
+	shift = 1 << 0
+	lock = 1 << 1
+	control = 1 << 2
+	mod1 = 1 << 3
+	mod2 = 1 << 4
+	mod4 = 1 << 6
+	mod5 = 1 << 7
+	button1 = 1 << 8
+	button2 = 1 << 9
+	button3 = 1 << 10
+
+# Keys that set a modifier for as long as they are held down.
+_held_modifier_masks = {
+	ecodes.KEY_LEFTSHIFT: Masks.shift,
+	ecodes.KEY_RIGHTSHIFT: Masks.shift,
+	ecodes.KEY_LEFTCTRL: Masks.control,
+	ecodes.KEY_RIGHTCTRL: Masks.control,
+	ecodes.KEY_LEFTALT: Masks.mod1,
+	ecodes.KEY_RIGHTALT: Masks.mod5, # AltGr, ISO_Level3_Shift
+	ecodes.KEY_LEFTMETA: Masks.mod4,
+	ecodes.KEY_RIGHTMETA: Masks.mod4,
+	ecodes.BTN_LEFT: Masks.button1,
+	ecodes.BTN_MIDDLE: Masks.button2,
+	ecodes.BTN_RIGHT: Masks.button3,
+}
+
+# Keys that toggle a modifier each time they are pressed.
+_lock_modifier_masks = {
+	ecodes.KEY_CAPSLOCK: Masks.lock,
+	ecodes.KEY_NUMLOCK: Masks.mod2,
+}
+
+_led_modifier_masks = {
+	ecodes.LED_CAPSL: Masks.lock,
+	ecodes.LED_NUML: Masks.mod2,
+}
+
+class EvdevListener(Listener):
+	"""
+	Base class for Listeners that read /dev/input/event* devices directly.
+	Does not require an X server.
+
+	Keycodes are reported as X11 keycodes (evdev keycode + 8), and modifiers
+	as X11 modifier masks, so bindings made for the X11 backend work unchanged.
+	Modifier state is tracked by the Listener itself, because evdev does not report it.
+	"""
+	def __init__(self, devices: Optional[Iterable[str]]=None):
+		"""
+		devices: Paths of the event devices to use.
+		By default, every device this Listener is interested in is used.
+		"""
+		super().__init__()
+		self._device_paths = list(devices) if devices is not None else None
+		self._devices: List[InputDevice] = []
+		# Paths of devices we created ourselves, which must never be read or grabbed.
+		self._own_device_paths = set()
+		self._wake_read, self._wake_write = os.pipe()
+		os.set_blocking(self._wake_read, False)
+
+		self._held_modifiers = {}
+		self._locked_modifiers = 0
+		self._state = 0
+
+		self._modifiers = {
+			'shift': Masks.shift,
+			'control': Masks.control,
+			'alt': Masks.mod1,
+			'win': Masks.mod4,
+			'numlock': Masks.mod2,
+		}
+
+	def __del__(self):
+		# The wake pipe is kept across restarts, and only closed with the Listener.
+		for fd in (getattr(self, '_wake_read', None), getattr(self, '_wake_write', None)):
+			if fd is not None:
+				os.close(fd)
+
+	def _reads_device(self, device: InputDevice) -> bool:
+		""" Returns True if this Listener should read events from the device. """
+		return device.is_keyboard
+
+	def _grabs_device(self, device: InputDevice) -> bool:
+		""" Returns True if this Listener should take exclusive access of the device. """
+		return False
+
+	def start(self, *args, **kwargs):
+		"""
+		Opens and grabs the devices, and then starts
+		listening to them on a new thread.
+		Raises an error if a grab did not succeed.
+		"""
+		if self.living.is_set():
+			raise Exception('Listener has already been started.')
+		self._open_devices()
+		try:
+			super().start(*args, **kwargs)
+		except Exception as e:
+			self._close_devices()
+			raise e
+
+	def _thread_entry(self):
+		super()._thread_entry()
+		self._close_devices()
+
+	def _stop(self):
+		super()._stop()
+		self._next_event()
+
+	def _release_grabs(self, functions):
+		super()._release_grabs(functions)
+		for device in self._devices:
+			if self._grabs_device(device):
+				device.ungrab()
+
+	def _restore_grabs(self, functions):
+		grabbed = []
+		try:
+			for device in self._devices:
+				if self._grabs_device(device):
+					device.grab()
+					grabbed.append(device)
+			super()._restore_grabs(functions)
+		except Exception:
+			for device in grabbed:
+				device.ungrab()
+			raise
+
+	def _open_devices(self):
+		candidates = list_devices() if self._device_paths is None else []
+		try:
+			# Opened one at a time, so that the devices opened before a failing one are closed as well.
+			for path in self._device_paths or ():
+				candidates.append(InputDevice(path))
+			for device in candidates:
+				if device.path in self._own_device_paths or not self._reads_device(device):
+					device.close()
+					continue
+				self._devices.append(device)
+				if self._grabs_device(device):
+					device.grab()
+			if not self._devices:
+				raise GenericGrabError('No usable input devices were found for {}.'.format(self.__class__.__name__))
+		except Exception:
+			for device in candidates:
+				device.close()
+			self._devices.clear()
+			raise
+		self._seed_state()
+
+	def _close_devices(self):
+		for device in self._devices:
+			device.close()
+		self._devices.clear()
+		self._held_modifiers.clear()
+		self._locked_modifiers = 0
+		self._state = 0
+		self.input_state.seed(bytes(32))
+
+	def _seed_state(self):
+		""" Reads the modifier keys and lock LEDs that are already active on our devices. """
+		for device in self._devices:
+			for code in device.pressed_keys():
+				if code < BTN_MISC:
+					self.input_state.set_key(code + ecodes.X_KEYCODE_OFFSET, True)
+				if code in _held_modifier_masks:
+					self._held_modifiers[code] = _held_modifier_masks[code]
+			for led in device.leds():
+				self._locked_modifiers |= _led_modifier_masks.get(led, 0)
+		self._recompute_state()
+
+	def _recompute_state(self):
+		state = self._locked_modifiers
+		for mask in self._held_modifiers.values():
+			state |= mask
+		self._state = state
+
+	def _update_state(self, code: int, value: int) -> int:
+		"""
+		Updates our modifier state with a key or button event.
+		Returns the state from before the event, which is what X11 reports as well.
+		"""
+		state = self._state
+		if code < BTN_MISC and value != ecodes.KEY_REPEAT:
+			self.input_state.set_key(code + ecodes.X_KEYCODE_OFFSET, value == ecodes.KEY_DOWN)
+		if code in _held_modifier_masks:
+			if value == ecodes.KEY_DOWN:
+				self._held_modifiers[code] = _held_modifier_masks[code]
+			elif value == ecodes.KEY_UP:
+				self._held_modifiers.pop(code, None)
+			self._recompute_state()
+		elif code in _lock_modifier_masks and value == ecodes.KEY_DOWN:
+			self._locked_modifiers ^= _lock_modifier_masks[code]
+			self._recompute_state()
+		return state
+
+	def _get_events(self):
+		"""
+		Blocks until one of our devices is readable, and then yields
+		every event it has pending as (device, type, code, value).
+		"""
+		devices = {device.fileno(): device for device in self._devices}
+		while self.living.is_set():
+			readable = self._wait_readable([self._wake_read, *devices], self._timer_timeout())
+			if not readable:
+				self._tick()
+				continue
+			for fd in readable:
+				if fd == self._wake_read:
+					try:
+						os.read(self._wake_read, 4096)
+					except BlockingIOError:
+						pass
+					continue
+				device = devices[fd]
+				try:
+					for type_, code, value in device.read():
+						yield device, type_, code, value
+				except OSError:
+					# The device has been unplugged.
+					del devices[fd]
+					self._devices.remove(device)
+					device.close()
+
+	def _next_event(self):
+		"""
+		Harmlessly flushes the input loop.
+		"""
+		os.write(self._wake_write, b'\0')
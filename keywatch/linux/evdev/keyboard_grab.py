@@ -0,0 +1,32 @@
+from threading import Event
+
+from . import ecodes
+from .evlistener import EvdevListener, BTN_MISC
+
+class KeyboardGrab(EvdevListener):
+	"""
+	Uses EVIOCGRAB to grab every keyboard device.
+	Keys will not be received by other programs, including the X server.
+	This keyboard grabber grabs the keyboards upon .start()
+	"""
+	def __init__(self, devices=None):
+		super().__init__(devices)
+		self.is_grabbed = Event()
+
+	def _grabs_device(self, device):
+		return device.is_keyboard
+
+	def _open_devices(self):
+		super()._open_devices()
+		self.is_grabbed.set()
+
+	def _close_devices(self):
+		super()._close_devices()
+		self.is_grabbed.clear()
+
+	def _input(self):
+		for _, type_, code, value in self._get_events():
+			if type_ == ecodes.EV_KEY and code < BTN_MISC:
+				state = self._update_state(code, value)
+				yield code + ecodes.X_KEYCODE_OFFSET, state, value == ecodes.KEY_UP
+				#     keycode                          modifiers is_keyup
@@ -0,0 +1,74 @@
+from typing import Optional
+
+from . import ecodes
+from .evlistener import EvdevListener, BTN_MISC
+from .uinput import VirtualDevice
+
+class KeyGrab(EvdevListener):
+	"""
+	Grabs specific keys from the keyboard devices.
+	The 'transparent' parameter determines whether or not
+	other programs will receive key events from grabbed keys.
+	When transparent, programs _will_ receive key events.
+
+	evdev can only grab whole devices. When not transparent, we grab every keyboard
+	and re-inject the keys we are not bound to through a uinput virtual keyboard.
+	NumLock is ignored when matching bindings, as the X11 KeyGrab grabs keys with and without it.
+	"""
+	def __init__(self, transparent=False, devices=None):
+		super().__init__(devices)
+		self._transparent = transparent
+		self._forwarder: Optional[VirtualDevice] = None
+		# Keys whose press was consumed by a binding. Their repeats and release are consumed as well.
+		self._consumed = set()
+
+	def _grabs_device(self, device):
+		return not self._transparent and device.is_keyboard
+
+	def _open_devices(self):
+		if not self._transparent and self._forwarder is None:
+			self._forwarder = VirtualDevice.keyboard('keywatch forwarding keyboard')
+			self._own_device_paths.add(self._forwarder.device_path)
+		try:
+			super()._open_devices()
+		except Exception:
+			self._close_forwarder()
+			raise
+
+	def _close_devices(self):
+		super()._close_devices()
+		self._consumed.clear()
+		self._close_forwarder()
+
+	def _close_forwarder(self):
+		if self._forwarder is not None:
+			self._own_device_paths.clear()
+			self._forwarder.close()
+			self._forwarder = None
+
+	def _keyinfo_bound(self, keycode, modifiers):
+		""" Returns True if keycode+modifiers are bound with any keystate. """
+		for state in [True, False]:
+			if self.keycode_function_map.get((keycode, modifiers, state), None):
+				return True
+		return False
+
+	def _input(self):
+		numlock = self._modifiers['numlock']
+		forwarder = self._forwarder
+		for _, type_, code, value in self._get_events():
+			if type_ == ecodes.EV_KEY and code < BTN_MISC:
+				keycode = code + ecodes.X_KEYCODE_OFFSET
+				state = self._update_state(code, value) & ~numlock
+				if code not in self._consumed and value == ecodes.KEY_DOWN and self._keyinfo_bound(keycode, state):
+					self._consumed.add(code)
+				if code in self._consumed:
+					if value == ecodes.KEY_UP:
+						self._consumed.discard(code)
+					yield keycode, state, value == ecodes.KEY_UP
+					#     keycode  modifiers is_keyup
+					continue
+			if forwarder is not None:
+				forwarder.write(type_, code, value)
+				if type_ == ecodes.EV_SYN:
+					forwarder.flush()
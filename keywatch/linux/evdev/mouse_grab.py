@@ -0,0 +1,100 @@
+from threading import Event
+from typing import Callable
+
+from . import ecodes
+from .evlistener import EvdevListener, BTN_MISC
+
+# evdev button code -> X11 button number
+_buttons = {
+	ecodes.BTN_LEFT: 1,
+	ecodes.BTN_MIDDLE: 2,
+	ecodes.BTN_RIGHT: 3,
+	ecodes.BTN_SIDE: 8,
+	ecodes.BTN_EXTRA: 9,
+}
+
+# X11 reports the scroll wheel as buttons 4 through 7.
+_wheel_buttons = {
+	(ecodes.REL_WHEEL, True): 4,
+	(ecodes.REL_WHEEL, False): 5,
+	(ecodes.REL_HWHEEL, False): 6,
+	(ecodes.REL_HWHEEL, True): 7,
+}
+
+def _default_on_movement_fn(pos, delta):
+	print('Cursor moved by {}.'.format((delta)), end=' ')
+	print('Change this function by calling MouseGrab.set_movement_fn() with your own function.')
+
+class MouseGrab(EvdevListener):
+	"""
+	Grabs cursor movement and mouse button presses from every mouse device,
+	preventing them from being used in the rest of the OS.
+	Keyboards are read, but not grabbed, so that button events carry the current modifiers.
+
+	evdev only reports relative movement. The position given to the movement function is
+	the sum of every movement since the grab started, beginning at (0, 0).
+	"""
+	def __init__(self, devices=None):
+		super().__init__(devices)
+		self.is_grabbed = Event()
+		self._on_movement = _default_on_movement_fn
+		self._would_be_pos = [0, 0]
+
+	def set_movement_fn(self, function: Callable[[int, int], None]):
+		"""
+		Sets the single function that is called for each instance of cursor movement.
+		It receives the would-be cursor position and the movement delta.
+		"""
+		self._on_movement = function
+
+	@property
+	def pos(self):
+		return self.input_state.pos
+
+	def _reads_device(self, device):
+		return device.is_mouse or device.is_keyboard
+
+	def _grabs_device(self, device):
+		return device.is_mouse
+
+	def _open_devices(self):
+		super()._open_devices()
+		self.is_grabbed.set()
+
+	def _close_devices(self):
+		super()._close_devices()
+		self.is_grabbed.clear()
+
+	def _input(self):
+		"""
+		Blocking function that processes raw mouse events.
+		Yields mouse button events, calls self._on_movement(xy, delta) once per
+		input frame that contained cursor movement.
+		"""
+		delta = [0, 0]
+		for _, type_, code, value in self._get_events():
+			if type_ == ecodes.EV_REL:
+				if code == ecodes.REL_X:
+					delta[0] += value
+				elif code == ecodes.REL_Y:
+					delta[1] += value
+				elif code in (ecodes.REL_WHEEL, ecodes.REL_HWHEEL):
+					button = _wheel_buttons[(code, value > 0)]
+					for _ in range(abs(value)):
+						yield button, self._state, False
+						yield button, self._state, True
+			elif type_ == ecodes.EV_KEY:
+				if code < BTN_MISC:
+					# A keyboard key. We only track it for its modifiers.
+					self._update_state(code, value)
+				elif code in _buttons and value != ecodes.KEY_REPEAT:
+					state = self._update_state(code, value)
+					self.input_state.set_button(_buttons[code], value == ecodes.KEY_DOWN)
+					yield _buttons[code], state, value == ecodes.KEY_UP
+					#     keycode         modifiers is_keyup
+			elif type_ == ecodes.EV_SYN and (delta[0] or delta[1]):
+				self._would_be_pos[0] += delta[0]
+				self._would_be_pos[1] += delta[1]
+				self.input_state.pos = tuple(self._would_be_pos)
+				self._on_movement(tuple(self._would_be_pos), tuple(delta))
+				delta = [0, 0]
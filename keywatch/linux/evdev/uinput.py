@@ -0,0 +1,108 @@
+import os
+import time
+from fcntl import ioctl
+from glob import glob
+from typing import Iterable
+
+from . import ecodes
+from ...errors import GenericGrabError
+
+class VirtualDevice:
+	"""
+	Creates an input device through /dev/uinput.
+	Events written to it are seen by the rest of the OS as though they came from real hardware.
+
+	Used to re-inject the keys an evdev KeyGrab does not want, and
+	to test the evdev backend without any physical device attached.
+	"""
+	def __init__(self, name='keywatch virtual device', keys: Iterable[int]=range(1, 256), relative_axes: Iterable[int]=()):
+		try:
+			self.fd = os.open('/dev/uinput', os.O_WRONLY | os.O_NONBLOCK)
+		except OSError as e:
+			raise GenericGrabError('Unable to open /dev/uinput. {}'.format(e))
+		try:
+			ioctl(self.fd, ecodes.UI_SET_EVBIT, ecodes.EV_SYN)
+			ioctl(self.fd, ecodes.UI_SET_EVBIT, ecodes.EV_KEY)
+			for key in keys:
+				ioctl(self.fd, ecodes.UI_SET_KEYBIT, key)
+			relative_axes = tuple(relative_axes)
+			if relative_axes:
+				ioctl(self.fd, ecodes.UI_SET_EVBIT, ecodes.EV_REL)
+				for axis in relative_axes:
+					ioctl(self.fd, ecodes.UI_SET_RELBIT, axis)
+			setup = ecodes.uinput_user_dev.pack(name.encode()[:79], ecodes.BUS_VIRTUAL, 1, 1, 1, 0, *([0] * 256))
+			os.write(self.fd, setup)
+			ioctl(self.fd, ecodes.UI_DEV_CREATE)
+		except OSError:
+			os.close(self.fd)
+			raise
+		self.name = name
+		self._pending = []
+
+	@classmethod
+	def keyboard(cls, name='keywatch virtual keyboard'):
+		return cls(name, keys=range(1, 256))
+
+	@classmethod
+	def mouse(cls, name='keywatch virtual mouse'):
+		buttons = (ecodes.BTN_LEFT, ecodes.BTN_RIGHT, ecodes.BTN_MIDDLE, ecodes.BTN_SIDE, ecodes.BTN_EXTRA)
+		axes = (ecodes.REL_X, ecodes.REL_Y, ecodes.REL_WHEEL, ecodes.REL_HWHEEL)
+		return cls(name, keys=buttons, relative_axes=axes)
+
+	@property
+	def device_path(self) -> str:
+		"""
+		The /dev/input/event* node of this device.
+		Waits briefly for udev to create the node if it does not exist yet.
+		"""
+		sysname = ioctl(self.fd, ecodes.UI_GET_SYSNAME(64), bytes(64)).split(b'\0', 1)[0].decode()
+		for _ in range(100):
+			nodes = glob('/sys/devices/virtual/input/{}/event*'.format(sysname))
+			if nodes:
+				path = '/dev/input/' + os.path.basename(nodes[0])
+				if os.path.exists(path):
+					return path
+			time.sleep(0.01)
+		raise GenericGrabError('uinput device {} did not appear under /dev/input.'.format(sysname))
+
+	def write(self, type_: int, code: int, value: int):
+		""" Queues an event. Nothing is sent until flush() or syn() is called. """
+		self._pending.append(ecodes.input_event.pack(0, 0, type_, code, value))
+
+	def flush(self):
+		""" Sends every queued event in a single write. """
+		if self._pending:
+			os.write(self.fd, b''.join(self._pending))
+			self._pending.clear()
+
+	def syn(self):
+		""" Queues a SYN_REPORT, and then sends every queued event. """
+		self.write(ecodes.EV_SYN, ecodes.SYN_REPORT, 0)
+		self.flush()
+
+	def key(self, code: int, value: int):
+		""" Sends a single key event with an evdev keycode. """
+		self.write(ecodes.EV_KEY, code, value)
+		self.syn()
+
+	def tap(self, code: int):
+		self.key(code, ecodes.KEY_DOWN)
+		self.key(code, ecodes.KEY_UP)
+
+	def move(self, dx: int, dy: int):
+		self.write(ecodes.EV_REL, ecodes.REL_X, dx)
+		self.write(ecodes.EV_REL, ecodes.REL_Y, dy)
+		self.syn()
+
+	def close(self):
+		if self.fd is None:
+			return
+		ioctl(self.fd, ecodes.UI_DEV_DESTROY)
+		os.close(self.fd)
+		self.fd = None
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *_):
+		self.close()
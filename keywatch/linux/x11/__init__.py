@@ -1,3 +1,7 @@
 from .keygrab import KeyGrab
 from .keyboard_grab import KeyboardGrab
-from .mouse_grab import MouseGrab
\ No newline at end of file
+from .mouse_grab import MouseGrab
+from .activity_monitor import ActivityMonitor
+from .record_monitor import KeyboardMonitor, MouseMonitor
+from .injector import Injector
+from .device_grab import DeviceGrab
\ No newline at end of file
@@ -0,0 +1,125 @@
+from collections import namedtuple
+from contextlib import contextmanager
+from threading import Lock, local
+from time import perf_counter
+from typing import Dict, Optional
+
+RequestStats = namedtuple('RequestStats', [
+	'calls', 'requests', 'round_trips', 'syncs', 'flushes', 'blocked_time',
+])
+
+# Requests made outside of any operation, on a thread that has no label.
+OTHER = 'other'
+
+class RequestAccounting:
+	"""
+	Counts the requests X connections send, and the round trips, syncs and flushes they make,
+	per operation, along with the time spent blocked waiting for replies.
+	Syncs are round trips too, and are included in round_trips as well.
+
+	Requests are attributed to the outermost operation running on the thread that sent them,
+	or else to the thread's label, or else to OTHER. Waiting for input events is not counted as blocked time.
+
+	Counting works by wrapping the connections' methods, so it costs nothing until enabled.
+	"""
+	def __init__(self, *displays):
+		# (display, send_request, send_and_recv, sync) as they were before we wrapped them.
+		self._wrapped = []
+		self._local = local()
+		self._lock = Lock()
+		# operation -> [calls, requests, round_trips, syncs, flushes, blocked_time]
+		self._stats: Dict[str, list] = {}
+		for display in displays:
+			self._wrap(display)
+
+	def _wrap(self, display):
+		protocol = display.display
+		send_request = protocol.send_request
+		send_and_recv = protocol.send_and_recv
+		sync = display.sync
+		self._wrapped.append((display, send_request, send_and_recv, sync))
+		protocol.send_request = lambda request, wait_for_response: self._counting_send_request(send_request, request, wait_for_response)
+		protocol.send_and_recv = lambda flush=False, event=False, request=None, recv=False: self._counting_send_and_recv(send_and_recv, flush, event, request, recv)
+		display.sync = lambda: self._counting_sync(sync)
+
+	def close(self):
+		""" Stops counting, restoring the connections' methods as they were before. """
+		for display, send_request, send_and_recv, sync in self._wrapped:
+			display.display.send_request = send_request
+			display.display.send_and_recv = send_and_recv
+			display.sync = sync
+		self._wrapped.clear()
+
+	@contextmanager
+	def operation(self, name: str):
+		""" Attributes the requests the calling thread sends to the named operation, unless it is already inside one. """
+		state = self._local
+		if getattr(state, 'operation', None) is not None:
+			yield
+			return
+		state.operation = name
+		with self._lock:
+			self._entry(name)[0] += 1
+		try:
+			yield
+		finally:
+			state.operation = None
+
+	def label_thread(self, name: Optional[str]):
+		""" Attributes the requests the calling thread sends outside of any operation to name. """
+		self._local.label = name
+
+	def _current(self) -> str:
+		state = self._local
+		return getattr(state, 'operation', None) or getattr(state, 'label', None) or OTHER
+
+	def _entry(self, name: str) -> list:
+		entry = self._stats.get(name)
+		if entry is None:
+			entry = self._stats[name] = [0, 0, 0, 0, 0, 0.0]
+		return entry
+
+	def _counting_send_request(self, send_request, request, wait_for_response):
+		with self._lock:
+			self._entry(self._current())[1] += 1
+		return send_request(request, wait_for_response)
+
+	def _counting_send_and_recv(self, send_and_recv, flush, event, request, recv):
+		if request is None and not flush:
+			# Waiting for input events, or reading whatever has arrived without blocking.
+			return send_and_recv(flush=flush, event=event, request=request, recv=recv)
+		start = perf_counter()
+		try:
+			return send_and_recv(flush=flush, event=event, request=request, recv=recv)
+		finally:
+			elapsed = perf_counter() - start
+			with self._lock:
+				entry = self._entry(self._current())
+				if request is not None:
+					entry[2] += 1
+				else:
+					entry[4] += 1
+				entry[5] += elapsed
+
+	def _counting_sync(self, sync):
+		with self._lock:
+			self._entry(self._current())[3] += 1
+		sync()
+
+	def stats(self) -> Dict[str, RequestStats]:
+		""" Returns a copy of the counts gathered so far, keyed by operation. """
+		with self._lock:
+			return {name: RequestStats(*entry) for name, entry in self._stats.items()}
+
+	def reset(self):
+		with self._lock:
+			self._stats.clear()
+
+	def report(self) -> str:
+		""" Returns a human readable table of the counts, operations that blocked longest first. """
+		lines = ['{:<16} {:>8} {:>10} {:>12} {:>8} {:>8} {:>12}'.format('operation', 'calls', 'requests', 'round trips', 'syncs', 'flushes', 'blocked ms')]
+		for name, stats in sorted(self.stats().items(), key=lambda item: item[1].blocked_time, reverse=True):
+			lines.append('{:<16} {:>8} {:>10} {:>12} {:>8} {:>8} {:>12.3f}'.format(
+				name[:16], stats.calls, stats.requests, stats.round_trips, stats.syncs, stats.flushes, stats.blocked_time * 1000
+			))
+		return '\n'.join(lines)
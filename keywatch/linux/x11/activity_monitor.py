@@ -0,0 +1,85 @@
+from typing import Dict
+
+from Xlib import error
+
+from .xlistener import XListener
+from .xsync import SyncExtension, PositiveTransition, NegativeTransition, AlarmStateDestroyed
+
+class ActivityMonitor(XListener):
+	"""
+	Calls functions when the user goes idle, and when they become active again,
+	without grabbing or receiving any input events.
+
+	Uses alarms on the SYNC extension's IDLETIME counter, so our thread only wakes when a
+	threshold is crossed. In place of a keycode, bindings take an idle threshold in milliseconds.
+	With call_after_release, the function is called when input resumes after being idle at least that long.
+	"""
+	def __init__(self):
+		super().__init__()
+		self._sync = SyncExtension(self._display)
+		self._idle_counter = self._sync.system_counter('IDLETIME')
+		if self._idle_counter is None:
+			raise NotImplementedError('The X server does not provide an IDLETIME counter.')
+		self._error_catcher = error.CatchError(error.BadValue, error.BadMatch)
+		# alarm id -> the binding it triggers. Read by our thread.
+		self._alarm_bindings: Dict[int, tuple] = {}
+		# (threshold, call_after_release) -> alarm id
+		self._alarms: Dict[tuple, int] = {}
+
+	def on_idle(self, function, seconds: float):
+		""" Calls function once the user has not touched any input device for the given number of seconds. """
+		self.bind(function, round(seconds * 1000), 0, False)
+
+	def on_active(self, function, seconds: float):
+		""" Calls function when input resumes after the user has been idle for at least the given number of seconds. """
+		self.bind(function, round(seconds * 1000), 0, True)
+
+	def idle_time(self) -> float:
+		""" Returns the number of seconds since the user last touched an input device. """
+		return self._sync.query_counter(self._idle_counter) / 1000
+
+	def _input(self):
+		for event in self._get_events((self._sync.alarm_notify,)):
+			# Destroying an alarm notifies us as well.
+			if event.state == AlarmStateDestroyed:
+				continue
+			binding = self._alarm_bindings.get(event.alarm)
+			if binding is not None:
+				yield binding
+				#     (threshold, 0, became_active)
+
+	def _grab_ids(self, functions):
+		""" Each threshold needs one alarm for going idle, and another for becoming active. """
+		return {(threshold, release): (threshold, modifiers, release) for threshold, modifiers, release in functions}
+
+	def _grab(self, keycode: int, modifiers: int=0, call_after_release=False):
+		if modifiers:
+			raise ValueError('ActivityMonitor bindings do not take modifiers.')
+		if keycode < 1:
+			raise ValueError('Idle thresholds must be at least 1 millisecond.')
+		self._grab_request((keycode, call_after_release), onerror=self._error_catcher)
+		try:
+			self._maybe_raise_error(self._error_catcher)
+		except Exception:
+			self._ungrab_request((keycode, call_after_release))
+			raise
+
+	def _ungrab(self, keycode: int, modifiers: int=0, call_after_release=False):
+		self._ungrab_request((keycode, call_after_release))
+		self._display.flush()
+
+	def _grab_request(self, grab_id, onerror=None):
+		threshold, became_active = grab_id
+		if became_active:
+			# IDLETIME drops to 0 on any input. Falling from past threshold - 1 means we were idle for at least threshold.
+			alarm = self._sync.create_alarm(self._idle_counter, threshold - 1, NegativeTransition, onerror=onerror)
+		else:
+			alarm = self._sync.create_alarm(self._idle_counter, threshold, PositiveTransition, onerror=onerror)
+		self._alarms[grab_id] = alarm
+		self._alarm_bindings[alarm] = (threshold, 0, became_active)
+
+	def _ungrab_request(self, grab_id):
+		alarm = self._alarms.pop(grab_id, None)
+		if alarm is not None:
+			del self._alarm_bindings[alarm]
+			self._sync.destroy_alarm(alarm)
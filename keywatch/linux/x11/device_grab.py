@@ -0,0 +1,227 @@
+from threading import Event
+from time import monotonic
+from typing import Iterable, List, Optional, Union
+
+from Xlib import X
+from Xlib.ext import ge, xinput
+
+from .devices import check_xinput2, find_devices, list_devices
+from .xlistener import XListener
+from ...errors import AlreadyGrabbedError
+
+_KEY_EVENT_MASK = xinput.KeyPressMask | xinput.KeyReleaseMask
+
+class DeviceGrab(XListener):
+	"""
+	Grabs keys of specific input devices through XInput2, leaving every other device alone.
+	For example, a macro pad's keys can be bound without touching the main keyboard,
+	even though both send the same keycodes.
+
+	devices are XInput2 device ids, or names matched against the slave devices' names.
+	Bound keys are grabbed on those devices only.
+	With whole_device, the devices are grabbed entirely upon .start(), like KeyboardGrab,
+	and none of their keys reach other programs.
+
+	While a binding or subscription is called, self.source_device holds the id of the device that sent the event.
+	"""
+	def __init__(self, devices: Iterable[Union[int, str]], whole_device: bool=False):
+		super().__init__()
+		check_xinput2(self._display)
+		self._xinput_opcode = self._display.get_extension_major(xinput.extname)
+		self.devices: List[int] = self._resolve_devices(devices)
+		self.whole_device = whole_device
+		self.is_grabbed = Event()
+		self.source_device: Optional[int] = None
+
+	def _resolve_devices(self, devices) -> List[int]:
+		ids = []
+		known = {device.id for device in list_devices(self._display)}
+		for device in devices:
+			if isinstance(device, str):
+				matches = find_devices(self._display, device)
+				if not matches:
+					raise ValueError('No input device named {!r}.'.format(device))
+				ids.extend(match.id for match in matches if match.id not in ids)
+			elif device not in known:
+				raise ValueError('No input device with id {}.'.format(device))
+			elif device not in ids:
+				ids.append(device)
+		return ids
+
+	def start(self, *args, **kwargs):
+		"""
+		Grabs our devices if whole_device is set, and then starts
+		listening to them on a new thread.
+		Raises an error if the grab did not succeed.
+		"""
+		if self.whole_device and not self.is_grabbed.is_set() and not self.living.is_set():
+			self._grab_devices()
+		try:
+			super().start(*args, **kwargs)
+		except Exception as e:
+			self._ungrab_devices()
+			raise e
+
+	def _input(self):
+		opcode = self._xinput_opcode
+		state = self.input_state
+		for event in self._get_events((ge.GenericEventCode,)):
+			if event.extension != opcode or event.evtype not in (xinput.KeyPress, xinput.KeyRelease):
+				continue
+			data = event.data
+			is_keyup = event.evtype == xinput.KeyRelease
+			self._event_time = data.time
+			self._event_received = monotonic()
+			state.set_key(data.detail, not is_keyup)
+			state.pos = (int(data.root_x), int(data.root_y))
+			self.source_device = data.sourceid
+			yield data.detail, data.mods.effective_mods, is_keyup
+			#     keycode      modifiers                 is_keyup
+
+	def _grab_devices(self):
+		"""
+		Grabs our devices entirely, with one round trip for all of them.
+		Each grabbed device's keys are delivered to us only. Other devices keep working as usual.
+		"""
+		if self.is_grabbed.is_set():
+			return
+		requests = [xinput.XIGrabDevice(
+			display=self._display.display,
+			defer=True,
+			opcode=self._xinput_opcode,
+			deviceid=device,
+			grab_window=self._root,
+			time=X.CurrentTime,
+			cursor=X.NONE,
+			grab_mode=xinput.GrabModeAsync,
+			paired_device_mode=xinput.GrabModeAsync,
+			owner_events=False,
+			mask=_KEY_EVENT_MASK,
+		) for device in self.devices]
+		failed = []
+		for device, request in zip(self.devices, requests):
+			request.reply()
+			if request.status != X.GrabSuccess:
+				failed.append((device, request.status))
+		if failed:
+			for device in self.devices:
+				self._display.xinput_ungrab_device(device, X.CurrentTime)
+			self._display.flush()
+			device, status = failed[0]
+			if status == X.AlreadyGrabbed:
+				raise AlreadyGrabbedError('Error grabbing input device {}.'.format(device))
+			raise Exception('Error grabbing input device {}. Error # {}'.format(device, status))
+		self._next_event()
+		self.is_grabbed.set()
+
+	def _ungrab_devices(self):
+		""" Ungrabs our devices. Cannot fail. """
+		if not self.is_grabbed.is_set():
+			return
+		for device in self.devices:
+			self._display.xinput_ungrab_device(device, X.CurrentTime)
+		self.is_grabbed.clear()
+		self._next_event()
+
+	def _grab(self, keycode: int, modifiers: int=0, call_after_release=False):
+		if not self._keyinfo_bound(keycode, modifiers):
+			self._apply_grabs((), ((keycode, modifiers),))
+			self._next_event()
+
+	def _ungrab(self, keycode: int, modifiers: int=0, call_after_release=False):
+		if not self.keycode_function_map.get((keycode, modifiers, not call_after_release)):
+			self._apply_grabs(((keycode, modifiers),), ())
+			self._next_event()
+
+	def _xi_modifiers(self, modifiers: int):
+		if modifiers & X.AnyModifier:
+			return [xinput.AnyModifier]
+		return list(self._modifiers_including_numlock(modifiers))
+
+	def _grab_request(self, grab_id, onerror=None):
+		""" Sends a passive grab of the key on each of our devices. Returns the requests, whose replies are read later. """
+		if self.whole_device:
+			return []
+		keycode, modifiers = grab_id
+		return [xinput.XIPassiveGrabDevice(
+			display=self._display.display,
+			defer=True,
+			opcode=self._xinput_opcode,
+			deviceid=device,
+			grab_window=self._root,
+			time=X.CurrentTime,
+			cursor=X.NONE,
+			detail=keycode,
+			grab_type=xinput.GrabtypeKeycode,
+			grab_mode=xinput.GrabModeAsync,
+			paired_device_mode=xinput.GrabModeAsync,
+			owner_events=False,
+			mask=_KEY_EVENT_MASK,
+			modifiers=self._xi_modifiers(modifiers),
+		) for device in self.devices]
+
+	def _ungrab_request(self, grab_id):
+		if self.whole_device:
+			return
+		keycode, modifiers = grab_id
+		for device in self.devices:
+			self._root.xinput_ungrab_keycode(device, keycode, self._xi_modifiers(modifiers))
+
+	def _failed_grab(self, grab_id, requests) -> Optional[Exception]:
+		""" Waits for the replies to a key's grab requests. Returns an error if any of them failed. """
+		for device, request in zip(self.devices, requests):
+			try:
+				request.reply()
+			except Exception as e:
+				return e
+			# A passive grab's reply lists the modifier combinations that could not be grabbed.
+			if request.modifiers:
+				return AlreadyGrabbedError('Error grabbing {} on input device {}.'.format(grab_id, device))
+		return None
+
+	def _apply_grabs(self, released, acquired):
+		"""
+		Sends every ungrab and passive grab request at once, and then reads their replies,
+		which costs a single round trip however many keys and devices there are.
+		If any grab fails, the grabs that did succeed are undone, the released grabs are
+		restored, and the error is raised.
+		"""
+		for grab_id in released:
+			self._ungrab_request(grab_id)
+		requests = {grab_id: self._grab_request(grab_id) for grab_id in acquired}
+		errors = {}
+		for grab_id, grab_requests in requests.items():
+			e = self._failed_grab(grab_id, grab_requests)
+			if e is not None:
+				errors[grab_id] = e
+		if errors:
+			for grab_id in acquired:
+				self._ungrab_request(grab_id)
+			restored = {grab_id: self._grab_request(grab_id) for grab_id in released}
+			for grab_id, grab_requests in restored.items():
+				self._failed_grab(grab_id, grab_requests)
+			# Without released grabs to restore, nothing above waited for a reply, so the ungrabs are still queued.
+			self._display.flush()
+			raise next(iter(errors.values()))
+		self._display.flush()
+
+	def _release_grabs(self, functions):
+		super()._release_grabs(functions)
+		self._ungrab_devices()
+
+	def _restore_grabs(self, functions):
+		if self.whole_device:
+			self._grab_devices()
+		try:
+			super()._restore_grabs(functions)
+		except Exception:
+			self._ungrab_devices()
+			raise
+
+	def _stop(self):
+		"""
+		Exits and cleans up the Listener.
+		This is the only function needed to safely stop the Listener.
+		"""
+		super()._stop()
+		self._ungrab_devices()
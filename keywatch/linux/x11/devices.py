@@ -0,0 +1,52 @@
+from collections import namedtuple
+from typing import List
+
+from Xlib.ext import xinput
+
+_USES = {
+	xinput.MasterPointer: 'master pointer',
+	xinput.MasterKeyboard: 'master keyboard',
+	xinput.SlavePointer: 'slave pointer',
+	xinput.SlaveKeyboard: 'slave keyboard',
+	xinput.FloatingSlave: 'floating slave',
+}
+
+class XIDevice(namedtuple('XIDevice', ['id', 'name', 'use', 'attachment', 'enabled'])):
+	"""
+	An input device as XInput2 reports it.
+	Slave devices are the physical devices. Each is attached to a master device,
+	the virtual keyboard or pointer that core X clients see, unless it is floating.
+	"""
+	__slots__ = ()
+
+	@property
+	def is_slave(self) -> bool:
+		return self.use in (xinput.SlavePointer, xinput.SlaveKeyboard, xinput.FloatingSlave)
+
+	@property
+	def is_keyboard(self) -> bool:
+		return self.use in (xinput.MasterKeyboard, xinput.SlaveKeyboard)
+
+	def __str__(self):
+		return '{} ({}, {})'.format(self.name, self.id, _USES.get(self.use, 'unknown'))
+
+def check_xinput2(display):
+	""" Tells the server which XInput version we speak, which it requires before any other XI2 request. """
+	if not display.has_extension(xinput.extname):
+		raise NotImplementedError('The X server does not support the {} extension.'.format(xinput.extname))
+	version = display.xinput_query_version()
+	if version.major_version < 2:
+		raise NotImplementedError('The X server only supports XInput {}.{}, and XInput 2 is needed.'.format(
+			version.major_version, version.minor_version))
+
+def list_devices(display) -> List[XIDevice]:
+	""" Returns every input device of the X server, masters included. """
+	check_xinput2(display)
+	devices = display.xinput_query_device(xinput.AllDevices).devices
+	return [XIDevice(d.deviceid, d.name if isinstance(d.name, str) else d.name.decode(errors='replace'),
+		d.use, d.attachment, bool(d.enabled)) for d in devices]
+
+def find_devices(display, name: str) -> List[XIDevice]:
+	""" Returns the slave devices whose name contains the given name, ignoring case. """
+	name = name.lower()
+	return [device for device in list_devices(display) if device.is_slave and name in device.name.lower()]
@@ -0,0 +1,114 @@
+from collections import namedtuple
+from typing import Dict, Optional
+
+from Xlib import X, Xatom, error
+
+# How many windows we remember the profile of before starting over.
+MAX_CACHED_WINDOWS = 1024
+
+WindowScope = namedtuple('WindowScope', ['profile', 'wm_class', 'wm_name'])
+WindowScope.__doc__ = """
+Activates a profile while the focused window matches.
+wm_class matches either the instance or the class part of WM_CLASS.
+wm_name matches if it is contained in the window's title.
+Criteria that are None match any window.
+"""
+
+def _scope_matches(scope: WindowScope, wm_class, wm_name) -> bool:
+	if scope.wm_class is not None and scope.wm_class not in (wm_class or ()):
+		return False
+	if scope.wm_name is not None and scope.wm_name not in (wm_name or ''):
+		return False
+	return True
+
+class FocusTracker:
+	"""
+	Follows the focused window through the root window's _NET_ACTIVE_WINDOW property,
+	and works out which profile applies to it.
+	The profile of each window is cached until one of its identifying properties changes.
+	"""
+	def __init__(self, display):
+		self._display = display
+		self._root = display.screen().root
+		self.net_active_window = display.intern_atom('_NET_ACTIVE_WINDOW')
+		self._net_wm_name = display.intern_atom('_NET_WM_NAME')
+		self._utf8_string = display.intern_atom('UTF8_STRING')
+		# Properties of the focused window that can change which profile applies to it.
+		self.identifying_atoms = (Xatom.WM_NAME, Xatom.WM_CLASS, self._net_wm_name)
+		self.scopes = ()
+		self.default_profile: Optional[str] = None
+		self.active_window: Optional[int] = None
+		self._cache: Dict[int, Optional[str]] = {}
+
+	def add_scope(self, scope: WindowScope):
+		self.scopes = self.scopes + (scope,)
+		self._cache.clear()
+
+	def remove_profile(self, profile: str):
+		self.scopes = tuple(scope for scope in self.scopes if scope.profile != profile)
+		self._cache.clear()
+
+	def set_default_profile(self, profile: Optional[str]):
+		self.default_profile = profile
+		self._cache.clear()
+
+	def close(self):
+		""" Stops watching the active window's properties. """
+		self._select_properties(self.active_window, X.NoEventMask)
+		self.active_window = None
+
+	def invalidate(self, window_id: int):
+		self._cache.pop(window_id, None)
+
+	def update_active_window(self) -> Optional[int]:
+		"""
+		Reads _NET_ACTIVE_WINDOW. Watches the new window's properties, and stops watching the old one's.
+		Returns the newly active window's id.
+		"""
+		prop = self._root.get_full_property(self.net_active_window, X.AnyPropertyType)
+		window_id = prop.value[0] if prop and len(prop.value) and prop.value[0] else None
+		if window_id != self.active_window:
+			self._select_properties(self.active_window, X.NoEventMask)
+			self._select_properties(window_id, X.PropertyChangeMask)
+			self.active_window = window_id
+		return window_id
+
+	def _select_properties(self, window_id, event_mask):
+		if window_id is None:
+			return
+		window = self._display.create_resource_object('window', window_id)
+		# The window may already have been destroyed.
+		window.change_attributes(event_mask=event_mask, onerror=error.CatchError(error.BadWindow))
+
+	def profile(self) -> Optional[str]:
+		""" Returns the profile for the active window, or the default profile if no scope matches it. """
+		if self.active_window is None:
+			return self.default_profile
+		try:
+			return self._cache[self.active_window]
+		except KeyError:
+			pass
+		profile = self.default_profile
+		wm_class, wm_name = self._identify(self.active_window)
+		for scope in self.scopes:
+			if _scope_matches(scope, wm_class, wm_name):
+				profile = scope.profile
+				break
+		if len(self._cache) >= MAX_CACHED_WINDOWS:
+			self._cache.clear()
+		self._cache[self.active_window] = profile
+		return profile
+
+	def _identify(self, window_id: int):
+		""" Returns the WM_CLASS and title of a window. """
+		window = self._display.create_resource_object('window', window_id)
+		try:
+			wm_class = window.get_wm_class()
+			prop = window.get_full_property(self._net_wm_name, self._utf8_string)
+			if prop:
+				wm_name = prop.value.decode(errors='replace') if isinstance(prop.value, bytes) else prop.value
+			else:
+				wm_name = window.get_wm_name()
+		except (error.BadWindow, error.BadValue):
+			return None, None
+		return wm_class, wm_name
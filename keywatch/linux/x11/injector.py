@@ -0,0 +1,174 @@
+from collections import namedtuple
+from contextlib import contextmanager
+from os import environ
+from threading import RLock
+from time import monotonic, sleep
+from typing import Optional
+
+from Xlib import X
+from Xlib.display import Display
+from Xlib.ext.xtest import fake_input
+
+from .keymap import Keymap
+
+InjectionStats = namedtuple('InjectionStats', ['events', 'flushes', 'seconds', 'events_per_second'])
+InjectionStats.__doc__ = """
+Totals since an Injector was created or reset.
+seconds only counts time spent injecting, from the first event each flush writes to the flush,
+so events_per_second is the throughput of active runs, not lowered by idle time between them.
+"""
+
+class Injector:
+	"""
+	Sends synthetic key, button and pointer events through the XTest extension.
+
+	Requests are queued and written to the server together: each public call flushes once,
+	and calls made inside batch() are flushed once when the outermost batch exits.
+	With a rate_limit, events are instead paced to at most that many per second,
+	each event following the previous one by 1 / rate_limit seconds. Time spent idle does not build up a burst.
+	Safe to use from several threads, e.g. macros and bound functions. A batch holds the injector
+	until it exits, so the events of different threads' batches are never interleaved.
+
+	Pass an XListener's display and keymap to share its connection, and have its thread keep
+	the keymap up to date. Otherwise, the injector opens a connection of its own.
+	"""
+	def __init__(self, display: Optional[Display]=None, keymap: Optional[Keymap]=None, rate_limit: Optional[float]=None):
+		self._display = display or Display(environ['DISPLAY'])
+		if not self._display.has_extension('XTEST'):
+			raise NotImplementedError('The X server does not support the XTEST extension.')
+		self._root = self._display.screen().root
+		self._keymap = keymap
+		self.rate_limit = rate_limit
+		# Guards _depth and the statistics, and is held by the outermost batch.
+		self._lock = RLock()
+		self._depth = 0
+		self.reset()
+
+	@property
+	def keymap(self) -> Keymap:
+		if self._keymap is None:
+			self._keymap = Keymap(self._display)
+		return self._keymap
+
+	def reset(self):
+		""" Resets the statistics returned by stats(). """
+		with self._lock:
+			self._events = 0
+			self._flushes = 0
+			self._seconds = 0.0
+			# When the first event not flushed yet was queued.
+			self._run_start: Optional[float] = None
+			# When the rate limit next allows an event.
+			self._next_due = 0.0
+
+	def stats(self) -> InjectionStats:
+		with self._lock:
+			if not self._events:
+				return InjectionStats(0, self._flushes, 0.0, 0.0)
+			seconds = self._seconds
+			rate = self._events / seconds if seconds > 0 else float('inf')
+			return InjectionStats(self._events, self._flushes, seconds, rate)
+
+	@contextmanager
+	def batch(self):
+		""" Groups calls so that everything they queue is written with one flush. Other threads wait until the outermost batch exits. """
+		with self._lock:
+			self._depth += 1
+			try:
+				yield self
+			finally:
+				self._depth -= 1
+				if self._depth == 0:
+					self.flush()
+
+	def flush(self):
+		""" Writes every queued event to the server. """
+		with self._lock:
+			self._display.flush()
+			self._flushes += 1
+			if self._run_start is not None:
+				self._seconds += monotonic() - self._run_start
+				self._run_start = None
+
+	def key(self, keycode: int, press: bool=True):
+		with self.batch():
+			self._fake(X.KeyPress if press else X.KeyRelease, keycode)
+
+	def tap(self, keycode: int, modifiers: int=0):
+		""" Presses and releases a key, holding down the given modifiers around it. """
+		with self.batch():
+			held = self._hold(modifiers)
+			self._fake(X.KeyPress, keycode)
+			self._fake(X.KeyRelease, keycode)
+			self._release(held)
+
+	def button(self, button: int, press: bool=True):
+		with self.batch():
+			self._fake(X.ButtonPress if press else X.ButtonRelease, button)
+
+	def click(self, button: int=1, count: int=1):
+		with self.batch():
+			for _ in range(count):
+				self._fake(X.ButtonPress, button)
+				self._fake(X.ButtonRelease, button)
+
+	def move(self, dx: int, dy: int):
+		""" Moves the pointer relative to where it is. """
+		with self.batch():
+			self._fake(X.MotionNotify, True, x=dx, y=dy)
+
+	def move_to(self, x: int, y: int):
+		""" Moves the pointer to a position on the root window. """
+		with self.batch():
+			self._fake(X.MotionNotify, False, root=self._root, x=x, y=y)
+
+	def type(self, text: str):
+		"""
+		Types a string by pressing the keys the keymap says produce each character.
+		Shift and level 3 are only pressed and released when consecutive characters need different ones.
+		Raises ValueError, before sending anything, if a character cannot be typed with the current layout.
+		"""
+		keymap = self.keymap
+		keys = []
+		for char in text:
+			key = keymap.keycode_for(char)
+			if key is None:
+				raise ValueError('No key types {!r} in the current keyboard layout.'.format(char))
+			keys.append(key)
+		with self.batch():
+			held = {}
+			for keycode, state in keys:
+				for mask in [mask for mask in held if not mask & state]:
+					self._fake(X.KeyRelease, held.pop(mask))
+				held.update(self._hold(state & ~sum(held)))
+				self._fake(X.KeyPress, keycode)
+				self._fake(X.KeyRelease, keycode)
+			self._release(held)
+
+	def _hold(self, modifiers: int) -> dict:
+		""" Presses a key for each modifier bit. Returns mask -> keycode for what it pressed. """
+		held = {}
+		for mask, keycode in self.keymap.modifier_keycodes.items():
+			if modifiers & mask:
+				self._fake(X.KeyPress, keycode)
+				held[mask] = keycode
+		return held
+
+	def _release(self, held: dict):
+		for keycode in held.values():
+			self._fake(X.KeyRelease, keycode)
+
+	def _fake(self, event_type: int, detail: int, **kwargs):
+		""" Queues one XTest event, first flushing and waiting if it would exceed our rate limit. """
+		now = monotonic()
+		if self.rate_limit:
+			due = self._next_due
+			if due > now:
+				self.flush()
+				sleep(due - now)
+				now = due
+			self._next_due = now + 1 / self.rate_limit
+		if self._run_start is None:
+			self._run_start = now
+		fake_input(self._display, event_type, detail, **kwargs)
+		self._events += 1
@@ -58,6 +58,18 @@ class KeyboardGrab(XListener):
 		self.is_grabbed.clear()
 		self._next_event()
 	
+	def _release_grabs(self, functions):
+		super()._release_grabs(functions)
+		self._ungrab_keyboard()
+
+	def _restore_grabs(self, functions):
+		self._grab_keyboard()
+		try:
+			super()._restore_grabs(functions)
+		except Exception:
+			self._ungrab_keyboard()
+			raise
+
 	def _stop(self):
 		"""
 		Exits and cleans up the Listener.
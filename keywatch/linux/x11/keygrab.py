@@ -32,22 +32,30 @@ class KeyGrab(XListener):
 		"""
 		bound_with_different_keystate = self.keycode_function_map.get((keycode, modifiers, not call_after_release))
 		if not bound_with_different_keystate:
-			for mods in self._modifiers_including_numlock(modifiers):
-				self._root.ungrab_key(keycode, mods)
-				self._maybe_raise_error(self._error_catcher)
+			self._ungrab_request((keycode, modifiers))
+			self._maybe_raise_error(self._error_catcher)
 			self._next_event()
 
 	def _grab(self, keycode: int, modifiers: int=0, call_after_release=False):
 		""" Grabs a key with specific modifiers, but only if it would be a new key+modifier combo. """
 		already_bound = self._keyinfo_bound(keycode, modifiers)
 		if not already_bound:
-			for mods in self._modifiers_including_numlock(modifiers):
-				self._root.grab_key(keycode, mods, True, self._grab_mode, self._grab_mode, onerror=self._error_catcher)
-				try:
-					self._maybe_raise_error(self._error_catcher)
-				except Exception as e:
-					if isinstance(e, error.BadAccess):
-						raise AlreadyGrabbedError(str(e))
-					else:
-						raise e
-			self._next_event()
\ No newline at end of file
+			self._grab_request((keycode, modifiers), onerror=self._error_catcher)
+			try:
+				self._maybe_raise_error(self._error_catcher)
+			except Exception as e:
+				if isinstance(e, error.BadAccess):
+					raise AlreadyGrabbedError(str(e))
+				else:
+					raise e
+			self._next_event()
+
+	def _grab_request(self, grab_id, onerror=None):
+		keycode, modifiers = grab_id
+		for mods in self._modifiers_including_numlock(modifiers):
+			self._root.grab_key(keycode, mods, True, self._grab_mode, self._grab_mode, onerror=onerror)
+
+	def _ungrab_request(self, grab_id):
+		keycode, modifiers = grab_id
+		for mods in self._modifiers_including_numlock(modifiers):
+			self._root.ungrab_key(keycode, mods)
\ No newline at end of file
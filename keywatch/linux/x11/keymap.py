@@ -0,0 +1,185 @@
+from itertools import combinations
+from typing import Dict, Optional, Tuple
+
+from Xlib import X, XK
+
+# The state bits holding the XKB group.
+GROUP_SHIFT = 13
+GROUP_MASK = 0x3 << GROUP_SHIFT
+# The core mapping only holds two groups, so tables are keyed by this bit alone.
+SECOND_GROUP = 1 << GROUP_SHIFT
+# XK only defines the xkb keysym group once it is loaded.
+ISO_LEVEL3_SHIFT = 0xfe03
+
+# Keysyms that stand for a character without being a Latin-1 or Unicode keysym.
+_SPECIAL_KEYSYMS = {
+	XK.XK_BackSpace: '\b',
+	XK.XK_Tab: '\t',
+	XK.XK_Return: '\n',
+	XK.XK_Escape: '\x1b',
+	XK.XK_Delete: '\x7f',
+	XK.XK_KP_Space: ' ',
+	XK.XK_KP_Tab: '\t',
+	XK.XK_KP_Enter: '\n',
+	XK.XK_KP_Equal: '=',
+	XK.XK_KP_Multiply: '*',
+	XK.XK_KP_Add: '+',
+	XK.XK_KP_Separator: ',',
+	XK.XK_KP_Subtract: '-',
+	XK.XK_KP_Decimal: '.',
+	XK.XK_KP_Divide: '/',
+}
+_SPECIAL_KEYSYMS.update({XK.XK_KP_0 + digit: str(digit) for digit in range(10)})
+# Characters typed by the non-keypad special keysyms.
+_SPECIAL_CHARS = {char: keysym for keysym, char in _SPECIAL_KEYSYMS.items() if keysym < XK.XK_KP_Space or keysym > XK.XK_KP_Equal}
+
+def keysym_to_char(keysym: int) -> Optional[str]:
+	""" Returns the character a keysym types, or None for keysyms that do not type one. """
+	if 0x20 <= keysym <= 0x7e or 0xa0 <= keysym <= 0xff:
+		return chr(keysym)
+	if 0x01000100 <= keysym <= 0x0110ffff:
+		return chr(keysym - 0x01000000)
+	return _SPECIAL_KEYSYMS.get(keysym)
+
+def char_to_keysym(char: str) -> int:
+	""" Returns the keysym for a character. """
+	if char in _SPECIAL_CHARS:
+		return _SPECIAL_CHARS[char]
+	code = ord(char)
+	if 0x20 <= code <= 0x7e or 0xa0 <= code <= 0xff:
+		return code
+	return 0x01000000 + code
+
+def _is_keypad(keysym: int) -> bool:
+	return XK.XK_KP_Space <= keysym <= XK.XK_KP_Equal
+
+def _column(group: int, level: int) -> int:
+	"""
+	Returns where the core keyboard mapping holds a group and level.
+	XKB lays the first two groups out as G1L1 G1L2 G2L1 G2L2 G1L3 G1L4 G2L3 G2L4.
+	"""
+	return group * 2 + level if level < 2 else 4 + group * 2 + level - 2
+
+class Keymap:
+	"""
+	Translates keycodes and modifier state to keysyms and characters with a single dict lookup.
+
+	Every combination of keycode, group, Shift, Lock, NumLock and level 3 is resolved up front,
+	from one request for the keyboard mapping. Call rebuild() when the mapping changes.
+	"""
+	def __init__(self, display):
+		self._display = display
+		self.state_mask = 0
+		self._keysyms: Dict[Tuple[int, int], int] = {}
+		self._chars: Dict[Tuple[int, int], str] = {}
+		# character -> (keycode, state) that types it
+		self._reverse: Dict[str, Tuple[int, int]] = {}
+		# modifier mask -> a keycode that sets it
+		self.modifier_keycodes: Dict[int, int] = {}
+		self.rebuild()
+
+	def keysym(self, keycode: int, state: int) -> int:
+		""" Returns the keysym a keycode produces in the given state, or X.NoSymbol. """
+		return self._keysyms.get((keycode, self._table_state(state)), X.NoSymbol)
+
+	def translate(self, keycode: int, state: int) -> Optional[str]:
+		""" Returns the character a keycode types in the given state, or None if it does not type one. """
+		return self._chars.get((keycode, self._table_state(state)))
+
+	def _table_state(self, state: int) -> int:
+		""" Returns the state our tables are keyed by. Groups 3 and 4 are looked up as the second group, which falls back to the first. """
+		if state & GROUP_MASK:
+			state |= SECOND_GROUP
+		return state & self.state_mask
+
+	def keycode_for(self, char: str) -> Optional[Tuple[int, int]]:
+		"""
+		Returns a (keycode, state) that types the character, needing as few modifiers as possible.
+		Only Shift and level 3 are used, as they can be held down. Returns None if no key types it.
+		"""
+		return self._reverse.get(char)
+
+	def rebuild(self):
+		""" Reads the keyboard and modifier mappings, and recomputes every translation. """
+		display = self._display
+		min_keycode = display.display.info.min_keycode
+		max_keycode = display.display.info.max_keycode
+		mapping = display.get_keyboard_mapping(min_keycode, max_keycode - min_keycode + 1)
+		modifier_mapping = display.get_modifier_mapping()
+		num_lock = self._modifier_mask(modifier_mapping, XK.XK_Num_Lock)
+		level3 = self._modifier_mask(modifier_mapping, ISO_LEVEL3_SHIFT)
+
+		# Only bits that change the translation are part of the key, so other modifiers cannot cause misses.
+		bits = [bit for bit in (X.ShiftMask, X.LockMask, num_lock, level3, SECOND_GROUP) if bit]
+		states = [sum(subset) for count in range(len(bits) + 1) for subset in combinations(bits, count)]
+		keysyms = {}
+		chars = {}
+		for keycode, syms in enumerate(mapping, min_keycode):
+			syms = tuple(syms)
+			if not any(syms):
+				continue
+			for state in states:
+				keysym = self._resolve(syms, state, num_lock, level3)
+				if keysym == X.NoSymbol:
+					continue
+				keysyms[keycode, state] = keysym
+				char = keysym_to_char(keysym)
+				if char is not None:
+					chars[keycode, state] = char
+		holdable = X.ShiftMask | level3
+		reverse = {}
+		for (keycode, state), char in chars.items():
+			if state & ~holdable:
+				continue
+			current = reverse.get(char)
+			if current is None or bin(state).count('1') < bin(current[1]).count('1'):
+				reverse[char] = (keycode, state)
+		modifier_keycodes = {}
+		for index, keycodes in enumerate(modifier_mapping):
+			keycodes = [keycode for keycode in keycodes if keycode]
+			if keycodes:
+				modifier_keycodes[1 << index] = keycodes[0]
+		# Swapped in whole, so other threads never see a partial table.
+		self._keysyms, self._chars, self._reverse = keysyms, chars, reverse
+		self.modifier_keycodes = modifier_keycodes
+		self.state_mask = sum(bits)
+
+	def _modifier_mask(self, modifier_mapping, keysym: int) -> int:
+		""" Returns the modifier bit of whichever modifier the key producing keysym is mapped to, or 0. """
+		keycodes = {keycode for keycode, _ in self._display.keysym_to_keycodes(keysym)}
+		for index, modifier_keycodes in enumerate(modifier_mapping):
+			if keycodes.intersection(modifier_keycodes):
+				return 1 << index
+		return 0
+
+	@staticmethod
+	def _resolve(syms: tuple, state: int, num_lock: int, level3: int) -> int:
+		""" Picks the keysym for a state out of a keycode's row of the keyboard mapping, the way XLookupString does. """
+		group = (state >> GROUP_SHIFT) & 1
+
+		def sym(level):
+			column = _column(group, level)
+			keysym = syms[column] if column < len(syms) else X.NoSymbol
+			if keysym == X.NoSymbol and group:
+				# Groups missing from a key fall back to the first one.
+				column = _column(0, level)
+				keysym = syms[column] if column < len(syms) else X.NoSymbol
+			return keysym
+
+		base = 2 if (level3 and state & level3) else 0
+		lower, upper = sym(base), sym(base + 1)
+		if upper == X.NoSymbol:
+			# A lone keysym stands for both levels, and its case pair is the shifted level.
+			char = keysym_to_char(lower)
+			if char is not None and char.upper() != char and len(char.upper()) == 1:
+				upper = char_to_keysym(char.upper())
+			else:
+				upper = lower
+		shifted = bool(state & X.ShiftMask)
+		if num_lock and state & num_lock and _is_keypad(upper):
+			shifted = not shifted
+		elif state & X.LockMask:
+			lower_char, upper_char = keysym_to_char(lower), keysym_to_char(upper)
+			if lower_char is not None and lower_char != lower_char.upper() and upper_char == lower_char.upper():
+				shifted = not shifted
+		return upper if shifted else lower
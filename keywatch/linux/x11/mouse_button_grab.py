@@ -5,37 +5,69 @@ from ...errors import AlreadyGrabbedError
 class MouseButtonGrab():
 	"""
 	Mix-in class that grabs mouse buttons.
-	Note: Button Release events are currently not being tracked. # TODO Fix this
 	"""
 
 	def __init__(self):
-		self._event_mask = X.ButtonReleaseMask | X.ButtonPressMask
 		super().__init__()
 		self._error_catcher = error.CatchError(error.BadCursor, error.BadAccess, error.BadValue, error.BadWindow)
 
+	def _button_event_mask(self, keycode: int, modifiers: int, call_after_release=False):
+		"""
+		Returns the event mask a button grab needs.
+		The ButtonPress that activates a grab is always reported,
+		so we only ask for releases when something is bound to them.
+		"""
+		if call_after_release or self.keycode_function_map.get((keycode, modifiers, True)):
+			return X.ButtonReleaseMask
+		return X.NoEventMask
+
 	def _grab(self, keycode: int, modifiers: int=0, call_after_release=False):
+		# Grabbing a button we have already grabbed replaces our previous grab, updating its event mask.
+		wants_release = self._button_event_mask(keycode, modifiers, call_after_release) == X.ButtonReleaseMask
+		self._grab_request((keycode, modifiers, wants_release), onerror=self._error_catcher)
+		try:
+			self._maybe_raise_error(self._error_catcher)
+		except Exception as e:
+			if isinstance(e, error.BadAccess):
+				raise AlreadyGrabbedError(str(e))
+			else:
+				raise e
+
+	def _grab_ids(self, functions):
+		"""
+		A button's grab also depends on whether its release is bound, as that changes the grab's event mask.
+		Changing it shows up as releasing one grab and acquiring another, which replaces our previous grab.
+		"""
+		ids = {}
+		for keycode, modifiers, release in functions:
+			wants_release = (keycode, modifiers, True) in functions
+			ids[(keycode, modifiers, wants_release)] = (keycode, modifiers, release)
+		return ids
+
+	def _grab_request(self, grab_id, onerror=None):
+		keycode, modifiers, wants_release = grab_id
 		owner_events = True
 		self._root.grab_button(
 			keycode,
 			modifiers,
 			owner_events,
-			self._event_mask,
+			X.ButtonReleaseMask if wants_release else X.NoEventMask,
 			self._grab_mode,
 			self._grab_mode,
 			0, 0,
-			onerror=self._error_catcher
+			onerror=onerror
 		)
-		try:
-			self._maybe_raise_error(self._error_catcher)
-		except Exception as e:
-			if isinstance(e, error.BadAccess):
-				raise AlreadyGrabbedError(str(e))
-			else:
-				raise e
+
+	def _ungrab_request(self, grab_id):
+		keycode, modifiers, _ = grab_id
+		self._root.ungrab_button(keycode, modifiers)
 
 	def _ungrab(self, keycode: int, modifiers: int=0, call_after_release=False):
 		if not self._keyinfo_bound(keycode, modifiers):
 			self._root.ungrab_button(keycode, modifiers)
+		elif call_after_release:
+			# The button is still bound on press. Stop receiving its releases.
+			self._grab(keycode, modifiers, False)
 
 	def _input(self):
 		""" Blocking function that processes raw mouse events and yields our mouse button events. """
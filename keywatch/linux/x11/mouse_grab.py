@@ -24,9 +24,42 @@ class MouseGrab(MouseButtonGrab, CursorCapture, XListener):
 	mouse.stop()  
 	"""
 
-	def __init__(self):
-		super().__init__()
-		self._event_mask = X.PointerMotionMask | X.ButtonPressMask | X.ButtonReleaseMask
+	def _pointer_event_mask(self):
+		"""
+		Returns the events our pointer grab needs.
+		Button presses and releases are only selected while something is bound to them.
+		"""
+		mask = super()._pointer_event_mask()
+		for _, _, call_after_release in self.keycode_function_map:
+			mask |= X.ButtonReleaseMask if call_after_release else X.ButtonPressMask
+		return mask
+
+	def _grab(self, keycode: int, modifiers: int=0, call_after_release=False):
+		super()._grab(keycode, modifiers, call_after_release)
+		# The binding is only added to keycode_function_map after we return.
+		self._update_pointer_grab(X.ButtonReleaseMask if call_after_release else X.ButtonPressMask)
+
+	def _ungrab(self, keycode: int, modifiers: int=0, call_after_release=False):
+		super()._ungrab(keycode, modifiers, call_after_release)
+		self._update_pointer_grab()
+
+	def _apply_grabs(self, released, acquired):
+		try:
+			super()._apply_grabs(released, acquired)
+		finally:
+			self._update_pointer_grab()
+
+	def _release_grabs(self, functions):
+		super()._release_grabs(functions)
+		self._ungrab_cursor()
+
+	def _restore_grabs(self, functions):
+		self._grab_cursor()
+		try:
+			super()._restore_grabs(functions)
+		except Exception:
+			self._ungrab_cursor()
+			raise
 
 	def _stop(self):
 		self._ungrab_cursor()
@@ -39,13 +72,16 @@ class MouseGrab(MouseButtonGrab, CursorCapture, XListener):
 		"""
 		for event in self._get_events((X.ButtonPress, X.ButtonRelease, X.NotifyPointerRoot)):
 			if event.type == X.NotifyPointerRoot:
+				on_movement = self._on_movement
+				if on_movement is None:
+					continue
 				xy = (event.root_x, event.root_y)
 				delta = self._stick_cursor(xy)
 				# self._stick_cursor generates movement events by warping the pointer back to its starting location,
 				# therefore the movement delta is (0, 0).
 				# We should and do ignore those events.
 				if (delta[0] == delta[1] and delta[0] == 0): continue
-				self._on_movement(tuple(self._would_be_pos), delta)
+				on_movement(tuple(self._would_be_pos), delta)
 			else:
 				yield event.detail, event.state, event.type == X.ButtonRelease
 				#     keycode       modifiers    is_keyup
\ No newline at end of file
@@ -14,7 +14,6 @@ class CursorCapture():
 	""" Mix-in class that tracks cursor movement. """
 
 	def __init__(self, on_movement: Callable[[int, int], None] = _default_on_movement_fn):
-		self._event_mask = X.PointerMotionMask
 		super().__init__()
 		self.is_grabbed = Event()
 		self._on_movement = on_movement
@@ -27,8 +26,22 @@ class CursorCapture():
 		Instead of calling a function for each different keypress, we only have
 		a single function to call for each instance of cursor movement.
 		That function is set via this function.
+		Setting it to None stops cursor movement from being reported to us at all.
 		"""
 		self._on_movement = function
+		self._update_pointer_grab()
+
+	def _pointer_event_mask(self):
+		""" Returns the events our pointer grab needs. Motion is only selected while someone wants it. """
+		if self._on_movement is None:
+			return X.NoEventMask
+		return X.PointerMotionMask
+
+	def _update_pointer_grab(self, extra_mask=X.NoEventMask):
+		""" Changes the event mask of our active pointer grab to match what we currently need. """
+		if self.is_grabbed.is_set():
+			self._display.change_active_pointer_grab(self._pointer_event_mask() | extra_mask, 0, X.CurrentTime)
+			self._display.flush()
 
 	def start(self, *args, **kwargs):
 		"""
@@ -50,7 +63,7 @@ class CursorCapture():
 		confinement = self._root if confine else 0
 		result = self._root.grab_pointer(
 			owner_events,
-			self._event_mask,
+			self._pointer_event_mask(),
 			self._grab_mode,
 			self._grab_mode,
 			confinement,
@@ -66,6 +79,9 @@ class CursorCapture():
 			if result == X.AlreadyGrabbed:
 				raise AlreadyGrabbedError('Cursor (movement) grab failed. Cursor was already grabbed.')
 			raise UnknownGrabError
+		self.is_grabbed.set()
+		# Our thread may not be running yet to have seeded the position.
+		self._seed_input_state()
 		self._start_pos = self.pos
 		self._would_be_pos = list(self._start_pos)
 
@@ -77,9 +93,12 @@ class CursorCapture():
 	def _input(self):
 		""" Blocking function that yields mouse movement. """
 		for event in self._get_events([X.NotifyPointerRoot]):
+			on_movement = self._on_movement
+			if on_movement is None:
+				continue
 			xy = (event.root_x, event.root_y)
 			delta = self._stick_cursor(xy)
-			self._on_movement(tuple(self._would_be_pos), delta)
+			on_movement(tuple(self._would_be_pos), delta)
 	
 	def _stick_cursor(self, xy):
 		"""
@@ -96,11 +115,11 @@ class CursorCapture():
 		self._would_be_pos[0] += delta_x
 		self._would_be_pos[1] += delta_y
 		if (delta_x != 0 or delta_y != 0):
-			fake_input(self._display, X.MotionNotify, x=self._start_pos[0], y=self._start_pos[1])
-			self._display.flush()
+			fake_input(self._control, X.MotionNotify, x=self._start_pos[0], y=self._start_pos[1])
+			self._control.flush()
 		return delta_x, delta_y
 
 	@property
 	def pos(self):
-		data = self._root.query_pointer()._data
-		return data['root_x'], data['root_y']
\ No newline at end of file
+		""" The pointer's position as of the latest event we received. Does not contact the server. """
+		return self.input_state.pos
\ No newline at end of file
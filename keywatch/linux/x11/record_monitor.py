@@ -0,0 +1,152 @@
+from os import environ
+from queue import Queue, Empty
+from struct import Struct
+from threading import Thread
+from time import monotonic
+from typing import Dict, Optional
+
+from Xlib import X, XK
+from Xlib.display import Display
+from Xlib.ext import record
+
+from .xlistener import XListener
+
+# Recorded events are always this long, and each batch the server sends us holds any number of them.
+EVENT_SIZE = 32
+# Every input event has its timestamp at the same offset.
+_event_time = Struct('=L')
+_event_root = Struct('=hh')
+
+class RecordListener(XListener):
+	"""
+	Observes input through the RECORD extension, without grabbing anything.
+	Every program keeps receiving the input we see, and nothing stops other clients from grabbing it.
+
+	The server sends recorded events in batches to a second connection, read by a helper thread.
+	Our own thread replays each batch through the usual bindings and subscriptions.
+	Recorded device events do not carry a reliable modifier state, so we track it ourselves.
+	"""
+	# First and last core event type to record.
+	recorded_events = (X.KeyPress, X.KeyRelease)
+
+	def __init__(self):
+		super().__init__()
+		if not self._display.has_extension(record.extname):
+			raise NotImplementedError('The X server does not support the {} extension.'.format(record.extname))
+		# Batches of raw events. None ends our input loop, and an empty batch just wakes it.
+		self._batches = Queue()
+		self._context: Optional[int] = None
+		self._record_display: Optional[Display] = None
+		self._record_thread: Optional[Thread] = None
+		# keycode -> modifier mask
+		self._modifier_keys: Dict[int, int] = {}
+		self._locking_masks = X.LockMask
+		self._state = 0
+
+	def _thread_entry(self):
+		self._load_modifier_mapping()
+		self._state = self._control_root.query_pointer().mask
+		self._context = self._display.record_create_context(
+			0,
+			[record.AllClients],
+			[{
+				'core_requests': (0, 0),
+				'core_replies': (0, 0),
+				'ext_requests': (0, 0, 0, 0),
+				'ext_replies': (0, 0, 0, 0),
+				'delivered_events': (0, 0),
+				'device_events': self.recorded_events,
+				'errors': (0, 0),
+				'client_started': False,
+				'client_died': False,
+			}],
+		)
+		# enable_context blocks the connection it is sent on until the context is disabled.
+		self._record_display = Display(environ['DISPLAY'])
+		self._record_thread = Thread(target=self._record, daemon=True)
+		self._record_thread.start()
+		try:
+			super()._thread_entry()
+		finally:
+			self._display.record_disable_context(self._context)
+			self._display.flush()
+			self._record_thread.join()
+			self._display.record_free_context(self._context)
+			self._display.flush()
+			self._record_display.close()
+			self._context = None
+
+	def _record(self):
+		""" Runs on the helper thread until the context is disabled. Passes each batch on to our thread. """
+		try:
+			self._record_display.record_enable_context(self._context, self._on_record_reply)
+		finally:
+			self._batches.put(None)
+
+	def _on_record_reply(self, reply):
+		if reply.category == record.FromServer and not reply.client_swapped and reply.data:
+			self._batches.put(reply.data)
+
+	def _next_event(self):
+		self._batches.put(b'')
+
+	def _load_modifier_mapping(self):
+		""" Works out which modifier each keycode sets, and which modifiers lock instead of being held. """
+		self._modifier_keys = {}
+		for index, keycodes in enumerate(self._control.get_modifier_mapping()):
+			for keycode in keycodes:
+				if keycode:
+					self._modifier_keys[keycode] = 1 << index
+		num_lock = self._control.keysym_to_keycode(XK.XK_Num_Lock)
+		self._locking_masks = X.LockMask | self._modifier_keys.get(num_lock, 0)
+
+	def _update_state(self, event_type: int, detail: int) -> int:
+		""" Applies an event to our modifier and button state. Returns the state from before the event, as X reports it. """
+		state = self._state
+		if event_type in (X.ButtonPress, X.ButtonRelease):
+			mask = X.Button1Mask << (detail - 1) if 1 <= detail <= 5 else 0
+		else:
+			mask = self._modifier_keys.get(detail, 0)
+		if mask & self._locking_masks:
+			if event_type == X.KeyPress:
+				self._state ^= mask
+		elif event_type in (X.KeyPress, X.ButtonPress):
+			self._state |= mask
+		else:
+			self._state &= ~mask
+		return state
+
+	def _input(self):
+		release = self.recorded_events[1]
+		while self.living.is_set():
+			try:
+				batch = self._batches.get(timeout=self._timer_timeout())
+			except Empty:
+				self._tick()
+				continue
+			if batch is None:
+				break
+			for offset in range(0, len(batch) - EVENT_SIZE + 1, EVENT_SIZE):
+				event_type = batch[offset] & 0x7f
+				detail = batch[offset + 1]
+				self._event_time = _event_time.unpack_from(batch, offset + 4)[0]
+				self._event_received = monotonic()
+				if event_type == X.KeyPress or event_type == X.KeyRelease:
+					self.input_state.set_key(detail, event_type == X.KeyPress)
+				else:
+					self.input_state.set_button(detail, event_type == X.ButtonPress)
+				self.input_state.pos = _event_root.unpack_from(batch, offset + 20)
+				state = self._update_state(event_type, detail)
+				yield detail, state, event_type == release
+				#     keycode modifiers is_keyup
+
+class KeyboardMonitor(RecordListener):
+	"""
+	Passively watches every key press and release, e.g. for usage metrics.
+	Unlike KeyboardGrab, other programs keep receiving the keyboard.
+	"""
+	recorded_events = (X.KeyPress, X.KeyRelease)
+
+class MouseMonitor(RecordListener):
+	""" Passively watches every mouse button press and release. Other programs keep receiving them. """
+	recorded_events = (X.ButtonPress, X.ButtonRelease)
@@ -1,30 +1,68 @@
+import warnings
 from os import environ
 from queue import Queue
+from threading import Lock, current_thread
+from time import monotonic
+from typing import Optional
 
 from Xlib import X, error
 from Xlib.display import Display
 from Xlib.protocol.event import AnyEvent
 
+from .accounting import RequestAccounting
+from .focus import FocusTracker, WindowScope
+from .keymap import Keymap
+from .injector import Injector
+from ...macros import Macro, MacroRun
 from ...listener import Listener
+from ...errors import AlreadyGrabbedError
 
 class Flags:
 	# The event type we use to send our custom event.
 	message_event = X.FocusIn
-	# event_mask = X.FocusChangeMask
-	event_mask = X.KeyPressMask
+	# Custom events are sent to our own message window with an empty event mask.
+	# X delivers those to the window's creator (us) only, so nothing has to be selected on the root window.
+	event_mask = X.NoEventMask
 	# A flag signifying we only sent a custom event in order to go through another input loop.
 	next_event_flag = 255
 
 class X11Error(BaseException):
 	pass
 
+# Public operations whose requests enable_request_accounting() counts separately.
+ACCOUNTED_OPERATIONS = ('start', 'stop', 'bind', 'unbind', 'unbind_all', 'activate', 'pause', 'resume', 'scope_profile', 'unscope_profile')
+
 class XListener(Listener):
 	def __init__(self):
 		super().__init__()
+		# The event connection. X delivers grabbed and selected input to the connection that grabbed or selected it,
+		# so grabs, event selection, and the requests whose errors we wait for stay on this connection.
 		self._display = Display(environ['DISPLAY'])
 		self._root = self._display.screen().root 
+		# The control connection, for queries, keymaps, warps, injected input and waking our thread.
+		# Its lock is never held by our thread while waiting for input, so requests sent on it do not wait behind event reading.
+		self._control = Display(environ['DISPLAY'])
+		self._control_root = self._control.screen().root
 		self._grab_mode = X.GrabModeAsync
 		self._initial_root_event_mask = 0
+		self._selected_root_event_mask = 0
+		# An unmapped window that only exists to receive our custom events.
+		self._message_window = self._root.create_window(-1, -1, 1, 1, 0, 0, X.InputOnly)
+		# The window has to exist before the control connection can send events to it.
+		self._display.sync()
+		self._control_message_window = self._control.create_resource_object('window', self._message_window.id)
+		self._wake_on_queued_events()
+		# Event type -> function. Called from our thread for events that _input is not looking for.
+		self._event_handlers = {}
+		self._focus: Optional[FocusTracker] = None
+		self._keymap: Optional[Keymap] = None
+		self._injector: Optional[Injector] = None
+		self._macro_runs = set()
+		self._macro_lock = Lock()
+		# When the latest event timestamp was received, to extrapolate the server's clock from.
+		self._event_received = 0.0
+		self._accounting: Optional[RequestAccounting] = None
+		self._closed = False
 
 		self._modifiers = {
 			'shift': X.ShiftMask, # 1
@@ -35,20 +73,142 @@ class XListener(Listener):
 			'any': X.AnyModifier
 		}
 	
+	def _run_thread(self):
+		accounting = self._accounting
+		if accounting is not None:
+			# Until the input loop begins, our thread is still setting up for start().
+			accounting.label_thread('start')
+		super()._run_thread()
+
 	def _thread_entry(self):
+		self._seed_input_state()
 		self._set_window_attributes()
 		super()._thread_entry()	
+		if self._accounting is not None:
+			self._accounting.label_thread('stop')
 		self._reset_window_attributes()
 	
 	def _stop(self):
 		super()._stop()
+		if self._focus is not None:
+			self._event_handlers.pop(X.PropertyNotify, None)
+			self._focus.close()
+			self._focus = None
+		self.cancel_macros()
 		self._next_event()
 	
+	def close(self):
+		"""
+		Closes both of our connections to the X server, stopping us first if we are running.
+		We cannot be started again afterwards. Called when we are garbage collected as well.
+		"""
+		if self._closed:
+			return
+		if self.living.is_set():
+			self.stop()
+		elif self.thread is not None and self.thread is not current_thread():
+			# Stopped with _stop(), our thread may still be tearing down over the event connection.
+			self.thread.join()
+		self._closed = True
+		try:
+			self._control.close()
+		finally:
+			self._display.close()
+
+	def __del__(self):
+		# While running, our thread keeps us alive, so there is nothing left to stop here.
+		if getattr(self, '_closed', True) or self.living.is_set():
+			return
+		try:
+			self.close()
+		except Exception:
+			# The server may already be gone.
+			pass
+
 	def _get_events(self, type_filter):
+		handlers = self._event_handlers
+		display = self._display
+		if self._accounting is not None:
+			self._accounting.label_thread('events')
 		while self.living.is_set():
-			event = self._root.display.next_event()
+			if not display.pending_events():
+				# Waiting outside of python-xlib leaves the connection's lock free for other threads while no input arrives.
+				if not self._wait_readable([display], self._timer_timeout()):
+					self._tick()
+					continue
+				if not display.pending_events():
+					continue
+			event = display.next_event()
+			time = getattr(event, 'time', None)
+			if time:
+				self._event_time = time
+				self._event_received = monotonic()
+			if X.KeyPress <= event.type <= X.MotionNotify:
+				self._update_input_state(event)
 			if event.type in type_filter:
 				yield event
+			else:
+				handler = handlers.get(event.type)
+				if handler is not None:
+					handler(event)
+
+	def enable_request_accounting(self) -> RequestAccounting:
+		"""
+		Starts counting the requests, round trips, syncs and flushes our connection makes, and the time
+		spent waiting for the server, per public operation such as bind() or start().
+		Requests our thread makes while dispatching input are counted under 'events'.
+		Enable before start() for start() to be counted in full. Returns the accounting, whose stats() and report() show the counts.
+		"""
+		if self._accounting is None:
+			self._accounting = RequestAccounting(self._display, self._control)
+			for name in ACCOUNTED_OPERATIONS:
+				# Wrapping the instance's methods counts subclasses' overrides too, along with everything they do before calling ours.
+				setattr(self, name, self._accounted(name, getattr(self, name)))
+		return self._accounting
+
+	def disable_request_accounting(self):
+		""" Stops counting requests. The counts gathered so far are discarded. """
+		if self._accounting is not None:
+			for name in ACCOUNTED_OPERATIONS:
+				delattr(self, name)
+			self._accounting.close()
+			self._accounting = None
+
+	def request_stats(self):
+		""" Returns the counts gathered since request accounting was enabled, keyed by operation. Empty if it is disabled. """
+		accounting = self._accounting
+		if accounting is None:
+			return {}
+		return accounting.stats()
+
+	def _accounted(self, name: str, method):
+		accounting = self._accounting
+		def accounted(*args, **kwargs):
+			with accounting.operation(name):
+				return method(*args, **kwargs)
+		accounted.__doc__ = method.__doc__
+		return accounted
+
+	def _seed_input_state(self):
+		""" Reads the pointer position, and which keys and buttons are down. Costs two round trips. """
+		pointer = self._control_root.query_pointer()
+		buttons = [button for button in range(1, 6) if pointer.mask & (X.Button1Mask << (button - 1))]
+		self.input_state.seed(self._control.query_keymap(), buttons, (pointer.root_x, pointer.root_y))
+
+	def _update_input_state(self, event):
+		""" Applies a key, button or motion event to our input state. """
+		state = self.input_state
+		if event.type == X.KeyPress or event.type == X.KeyRelease:
+			state.set_key(event.detail, event.type == X.KeyPress)
+		elif event.type == X.ButtonPress or event.type == X.ButtonRelease:
+			state.set_button(event.detail, event.type == X.ButtonPress)
+		state.pos = (event.root_x, event.root_y)
+
+	def _clock(self) -> int:
+		""" Estimates the X server's current time, from the timestamp of the latest event. """
+		if self._event_time is None:
+			return super()._clock()
+		return self._event_time + int((monotonic() - self._event_received) * 1000)
 
 	def _maybe_raise_error(self, error_catcher: error.CatchError):
 		"""
@@ -69,6 +229,45 @@ class XListener(Listener):
 		if maybe_error:
 			raise maybe_error
 
+	def _grab_ids(self, functions):
+		"""
+		X grabs keys and buttons with no regard for whether we want their press or release.
+		Thus, bindings differing only by call_after_release share a grab.
+		"""
+		return {(keycode, modifiers): (keycode, modifiers, release) for keycode, modifiers, release in functions}
+
+	def _grab_request(self, grab_id, onerror=None):
+		""" Sends the request(s) for a grab, without waiting for the server to process them. """
+
+	def _ungrab_request(self, grab_id):
+		""" Sends the request(s) to release a grab, without waiting for the server to process them. """
+
+	def _apply_grabs(self, released, acquired):
+		"""
+		Sends every ungrab and grab request at once, and checks all of them with a single sync.
+		If any grab fails, the grabs that did succeed are undone, the released grabs are
+		restored, and the error is raised.
+		"""
+		for grab_id in released:
+			self._ungrab_request(grab_id)
+		catchers = {}
+		for grab_id in acquired:
+			catchers[grab_id] = error.CatchError(error.BadAccess, error.BadValue, error.BadWindow)
+			self._grab_request(grab_id, onerror=catchers[grab_id])
+		self._display.sync()
+		errors = {grab_id: catcher.get_error() for grab_id, catcher in catchers.items() if catcher.get_error()}
+		if errors:
+			# A grab_id may stand for several grabs, of which only some failed. Ungrabbing a failed grab is harmless.
+			for grab_id in acquired:
+				self._ungrab_request(grab_id)
+			for grab_id in released:
+				self._grab_request(grab_id, onerror=error.CatchError(error.BadAccess))
+			self._display.sync()
+			grab_id, e = next(iter(errors.items()))
+			if isinstance(e, error.BadAccess):
+				raise AlreadyGrabbedError('Error grabbing {}. {}'.format(grab_id, e))
+			raise e
+
 	def _modifiers_including_numlock(self, modifiers):
 		including_numlock = modifiers | self._modifiers['numlock']
 		if modifiers == including_numlock:
@@ -80,9 +279,9 @@ class XListener(Listener):
 		Sends a custom event to our _input loop.
 		"""
 		data = bytes([Flags.message_event, flag]+[0]*30)
-		event = AnyEvent(data, self._display)
-		self._root.send_event(event, event_mask=Flags.event_mask)
-		self._display.flush()
+		event = AnyEvent(data, self._control)
+		self._control_message_window.send_event(event, event_mask=Flags.event_mask)
+		self._control.flush()
 
 	def _next_event(self):
 		"""
@@ -90,6 +289,23 @@ class XListener(Listener):
 		"""
 		self._custom_event(Flags.next_event_flag)
 
+	def _wake_on_queued_events(self):
+		"""
+		Wraps the event connection's I/O so that our thread is woken whenever another thread leaves events in python-xlib's queue.
+		Any round trip, e.g. a grab's, may read our events while waiting for its reply, and our thread,
+		waiting for the connection to become readable, would not notice them otherwise.
+		"""
+		protocol = self._display.display
+		send_and_recv = protocol.send_and_recv
+		def waking_send_and_recv(*args, **kwargs):
+			try:
+				return send_and_recv(*args, **kwargs)
+			finally:
+				thread = self.thread
+				if protocol.event_queue and thread is not None and current_thread() is not thread and self.living.is_set():
+					self._next_event()
+		protocol.send_and_recv = waking_send_and_recv
+
 	def _keyinfo_bound(self, keycode, modifiers):
 		"""
 		Returns True if keycode+modifiers are bound with any keystate.
@@ -101,9 +317,141 @@ class XListener(Listener):
 			if self.keycode_function_map.get((keycode, modifiers, state), None):
 				return True
 		
+	@property
+	def keymap(self) -> Keymap:
+		"""
+		Translation table from keycodes and modifier state to keysyms and characters.
+		Built on first use, and rebuilt by our thread whenever the keyboard mapping changes.
+		"""
+		if self._keymap is None:
+			self._keymap = Keymap(self._control)
+			# Every client is sent MappingNotify, without selecting it.
+			self._event_handlers[X.MappingNotify] = self._on_mapping_notify
+		return self._keymap
+
+	def translate(self, keycode: int, state: int) -> Optional[str]:
+		""" Returns the character a key event types, or None if it does not type one. """
+		return self.keymap.translate(keycode, state)
+
+	@property
+	def injector(self) -> Injector:
+		""" Injects input over our control connection, typing text through our keymap. """
+		if self._injector is None:
+			self._injector = Injector(self._control, self.keymap)
+		return self._injector
+
+	def bind_macro(self, macro: Macro, keycode: int, modifiers: int=0, call_after_release: bool=False):
+		""" Binds a key to running a macro. Each press starts another run of it. """
+		self.bind(lambda: self.run_macro(macro), keycode, modifiers, call_after_release)
+
+	def run_macro(self, macro: Macro) -> MacroRun:
+		""" Starts a macro on the shared macro scheduler. It is cancelled if this Listener stops first. """
+		with self._macro_lock:
+			run = macro.run(self.injector, on_done=self._macro_done)
+			if not run.done:
+				self._macro_runs.add(run)
+		return run
+
+	def cancel_macros(self):
+		""" Cancels every macro this Listener started that has not finished yet. """
+		with self._macro_lock:
+			runs = tuple(self._macro_runs)
+		for run in runs:
+			run.cancel()
+
+	def _macro_done(self, run: MacroRun):
+		with self._macro_lock:
+			self._macro_runs.discard(run)
+
+	def _on_mapping_notify(self, event):
+		if event.request == X.MappingPointer:
+			return
+		self._control.refresh_keyboard_mapping(event)
+		self._keymap.rebuild()
+
+	def _root_event_mask(self):
+		"""
+		Returns the events this Listener needs selected on the root window.
+		Grabbed input is delivered regardless of the root window's event mask,
+		so by default nothing is selected and the server filters out everything else.
+		"""
+		if self._focus is not None:
+			# Tells us when _NET_ACTIVE_WINDOW changes.
+			return X.PropertyChangeMask
+		return X.NoEventMask
+
+	def scope_profile(self, profile: str, wm_class: Optional[str]=None, wm_name: Optional[str]=None):
+		"""
+		Only activates the named profile while a matching window is focused.
+		wm_class matches either part of the window's WM_CLASS, and wm_name matches any part of its title.
+		When the focused window matches no scope, default_profile is activated instead.
+		A profile's keys are only grabbed while it is active, leaving them to other programs otherwise.
+		"""
+		if not self.living.is_set():
+			raise Exception('Cannot scope profiles until the Listener has been started.')
+		self.profile(profile)
+		if self._focus is None:
+			self._focus = FocusTracker(self._display)
+			self._focus.default_profile = self.active_profile
+			self._event_handlers[X.PropertyNotify] = self._on_property_notify
+			self._update_root_event_mask()
+			self._focus.update_active_window()
+		self._focus.add_scope(WindowScope(profile, wm_class, wm_name))
+		self._apply_focus()
+
+	def unscope_profile(self, profile: str):
+		""" Removes every scope of the named profile. """
+		if self._focus is not None:
+			self._focus.remove_profile(profile)
+			self._apply_focus()
+
+	@property
+	def default_profile(self) -> Optional[str]:
+		""" The profile that is active while no scoped window is focused. """
+		return self._focus.default_profile if self._focus is not None else None
+
+	@default_profile.setter
+	def default_profile(self, profile: Optional[str]):
+		if self._focus is None:
+			raise Exception('Call scope_profile() before setting a default profile.')
+		self._focus.set_default_profile(profile)
+		self._apply_focus()
+
+	def _apply_focus(self):
+		""" Activates the profile of the focused window, if it is not active already. """
+		profile = self._focus.profile()
+		if profile != self.active_profile:
+			self.activate(profile)
+
+	def _on_property_notify(self, event):
+		focus = self._focus
+		if focus is None:
+			return
+		if event.window.id == self._root.id and event.atom == focus.net_active_window:
+			focus.update_active_window()
+		elif event.window.id == focus.active_window and event.atom in focus.identifying_atoms:
+			focus.invalidate(event.window.id)
+		else:
+			return
+		try:
+			self._apply_focus()
+		except (AlreadyGrabbedError, error.XError) as e:
+			# Our thread has no caller to raise to, and must keep running. The previous profile stays active.
+			warnings.warn('Unable to activate the profile of the focused window. {}'.format(e), RuntimeWarning)
+
 	def _set_window_attributes(self):
 		self._initial_root_event_mask = self._root.get_attributes()._data['your_event_mask']
-		self._root.change_attributes(event_mask = Flags.message_event)
+		self._selected_root_event_mask = self._initial_root_event_mask
+		self._update_root_event_mask()
+
+	def _update_root_event_mask(self):
+		""" Selects the events we need on the root window, preserving the mask that was already selected. """
+		mask = self._initial_root_event_mask | self._root_event_mask()
+		if mask != self._selected_root_event_mask:
+			self._root.change_attributes(event_mask = mask)
+			self._selected_root_event_mask = mask
 	
 	def _reset_window_attributes(self):
-		self._root.change_attributes(event_mask = self._initial_root_event_mask)
\ No newline at end of file
+		if self._selected_root_event_mask != self._initial_root_event_mask:
+			self._root.change_attributes(event_mask = self._initial_root_event_mask)
+			self._selected_root_event_mask = self._initial_root_event_mask
\ No newline at end of file
@@ -0,0 +1,190 @@
+"""
+The parts of the X SYNC extension needed to follow system counters with alarms.
+python-xlib does not implement SYNC, so its requests and events are defined here.
+
+Protocol specification:
+	https://www.x.org/releases/X11R7.7/doc/xextproto/sync.html
+"""
+from struct import Struct
+from typing import Dict, Optional
+
+from Xlib.protocol import rq
+
+extname = 'SYNC'
+
+# Event codes, relative to the extension's first event.
+CounterNotifyCode = 0
+AlarmNotifyCode = 1
+
+# Alarm attributes, in the order their values are sent.
+CACounter = 1 << 0
+CAValueType = 1 << 1
+CAValue = 1 << 2
+CATestType = 1 << 3
+CADelta = 1 << 4
+CAEvents = 1 << 5
+
+ValueTypeAbsolute = 0
+ValueTypeRelative = 1
+
+PositiveTransition = 0
+NegativeTransition = 1
+PositiveComparison = 2
+NegativeComparison = 3
+
+AlarmStateActive = 0
+AlarmStateInactive = 1
+AlarmStateDestroyed = 2
+
+# counter, resolution_hi, resolution_lo, name_length. Followed by the name, padded to 4 bytes.
+_system_counter = Struct('=LlLH')
+
+def _int64(value: int):
+	""" Splits a 64 bit value into the (hi, lo) words the protocol sends it as. """
+	return (value >> 32) & 0xffffffff, value & 0xffffffff
+
+class Initialize(rq.ReplyRequest):
+	_request = rq.Struct(
+		rq.Card8('opcode'),
+		rq.Opcode(0),
+		rq.RequestLength(),
+		rq.Card8('major_version'),
+		rq.Card8('minor_version'),
+		rq.Pad(2),
+	)
+	_reply = rq.Struct(
+		rq.ReplyCode(),
+		rq.Pad(1),
+		rq.Card16('sequence_number'),
+		rq.ReplyLength(),
+		rq.Card8('major_version'),
+		rq.Card8('minor_version'),
+		rq.Pad(22),
+	)
+
+class ListSystemCounters(rq.ReplyRequest):
+	_request = rq.Struct(
+		rq.Card8('opcode'),
+		rq.Opcode(1),
+		rq.RequestLength(),
+	)
+	_reply = rq.Struct(
+		rq.ReplyCode(),
+		rq.Pad(1),
+		rq.Card16('sequence_number'),
+		rq.ReplyLength(),
+		rq.Card32('count'),
+		rq.Pad(20),
+	)
+
+	def _parse_response(self, data):
+		# Each counter is padded to 4 bytes individually, which rq.List cannot express.
+		header, tail = self._reply.parse_binary(data, self._display, rawdict=True)
+		counters = {}
+		offset = 0
+		for _ in range(header['count']):
+			counter, _, _, name_length = _system_counter.unpack_from(tail, offset)
+			start = offset + _system_counter.size
+			counters[tail[start:start + name_length].decode('latin-1')] = counter
+			offset += (_system_counter.size + name_length + 3) & ~3
+		header['counters'] = counters
+		self._response_lock.acquire()
+		self._data = header
+		self._response_lock.release()
+
+class QueryCounter(rq.ReplyRequest):
+	_request = rq.Struct(
+		rq.Card8('opcode'),
+		rq.Opcode(5),
+		rq.RequestLength(),
+		rq.Card32('counter'),
+	)
+	_reply = rq.Struct(
+		rq.ReplyCode(),
+		rq.Pad(1),
+		rq.Card16('sequence_number'),
+		rq.ReplyLength(),
+		rq.Int32('value_hi'),
+		rq.Card32('value_lo'),
+		rq.Pad(16),
+	)
+
+class CreateAlarm(rq.Request):
+	_request = rq.Struct(
+		rq.Card8('opcode'),
+		rq.Opcode(8),
+		rq.RequestLength(),
+		rq.Card32('alarm'),
+		rq.Card32('value_mask'),
+		rq.List('values', rq.Card32Obj),
+	)
+
+class DestroyAlarm(rq.Request):
+	_request = rq.Struct(
+		rq.Card8('opcode'),
+		rq.Opcode(11),
+		rq.RequestLength(),
+		rq.Card32('alarm'),
+	)
+
+class AlarmNotify(rq.Event):
+	_code = None
+	_fields = rq.Struct(
+		rq.Card8('type'),
+		rq.Card8('kind'),
+		rq.Card16('sequence_number'),
+		rq.Card32('alarm'),
+		rq.Int32('counter_value_hi'),
+		rq.Card32('counter_value_lo'),
+		rq.Int32('alarm_value_hi'),
+		rq.Card32('alarm_value_lo'),
+		rq.Card32('time'),
+		rq.Card8('state'),
+		rq.Pad(3),
+	)
+
+class SyncExtension:
+	"""
+	Initializes the SYNC extension on a Display, and sends its requests.
+	Raises NotImplementedError if the X server does not support it.
+	"""
+	def __init__(self, display):
+		info = display.query_extension(extname)
+		if info is None:
+			raise NotImplementedError('The X server does not support the {} extension.'.format(extname))
+		self._display = display
+		self.opcode = info.major_opcode
+		self.alarm_notify = info.first_event + AlarmNotifyCode
+		# Clients must initialize the extension before using any other request of it.
+		Initialize(display=display.display, opcode=self.opcode, major_version=3, minor_version=1)
+		display.extension_add_event(self.alarm_notify, AlarmNotify)
+		self._counters: Optional[Dict[str, int]] = None
+
+	def system_counter(self, name: str) -> Optional[int]:
+		""" Returns the id of the named system counter, e.g. IDLETIME, or None if the server has no such counter. """
+		if self._counters is None:
+			self._counters = ListSystemCounters(display=self._display.display, opcode=self.opcode).counters
+		return self._counters.get(name)
+
+	def query_counter(self, counter: int) -> int:
+		reply = QueryCounter(display=self._display.display, opcode=self.opcode, counter=counter)
+		return (reply.value_hi << 32) | reply.value_lo
+
+	def create_alarm(self, counter: int, value: int, test_type: int, delta: int=0, onerror=None) -> int:
+		"""
+		Creates an alarm that triggers when counter passes the absolute value as described by test_type,
+		and sends us an AlarmNotify event each time it does. Returns the alarm's id.
+		With transition tests and a delta of 0, the alarm stays armed and triggers on every such transition.
+		"""
+		alarm = self._display.allocate_resource_id()
+		values = (counter, ValueTypeAbsolute) + _int64(value) + (test_type,) + _int64(delta) + (True,)
+		CreateAlarm(
+			display=self._display.display, onerror=onerror, opcode=self.opcode, alarm=alarm,
+			value_mask=CACounter | CAValueType | CAValue | CATestType | CADelta | CAEvents,
+			values=values,
+		)
+		return alarm
+
+	def destroy_alarm(self, alarm: int):
+		DestroyAlarm(display=self._display.display, opcode=self.opcode, alarm=alarm)
+		self._display.free_resource_id(alarm)
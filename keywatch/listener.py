@@ -1,25 +1,98 @@
-from threading import Thread, Event
+from select import select
+from threading import Thread, Event, Lock
+from time import monotonic
 from abc import ABC, abstractmethod
-from typing import Optional
+from typing import Dict, Mapping, Optional
 from functools import namedtuple
 
+from .bindings import BindingTable, BindingSnapshot
+from .input_state import InputState
+from .profiler import CallbackProfiler
+from .profiles import BindingProfile
+from .realtime import LatencyStats, RealtimeMode
+from .subscriptions import EventFilter, Subscription, SubscriptionIndex
+from .temporal import TemporalBindings, TimerWheel
+
 HardwareEvent = namedtuple('Event', [
 	'keycode', 'modifiers', 'is_keyup',
 ])
 
 class Listener(ABC):
 	def __init__(self):
-		self.keycode_function_map = {}
+		self._bindings = BindingTable()
+		self._profiles: Dict[str, BindingProfile] = {}
+		self.active_profile: Optional[str] = None
+		# The bindings the active profile added, as opposed to those made with bind().
+		self._profile_bindings = frozenset()
 		self.living = Event()
 		self.thread: Optional[Thread] = None
+		self._profiler: Optional[CallbackProfiler] = None
+		self._subscriptions: Optional[SubscriptionIndex] = None
+		self._subscription_lock = Lock()
+		self._timers: Optional[TimerWheel] = None
+		self._temporal: Optional[TemporalBindings] = None
+		# Timestamp of the event being dispatched, in milliseconds, for backends whose events carry one.
+		self._event_time: Optional[int] = None
+		# While paused, nothing is dispatched. Grabs may have been released as well, in which case
+		# bind() and unbind() only edit our bindings until resume() grabs them.
+		self.paused = False
+		self._grabs_released = False
+		# Counted by pause(). Our thread cancels the timers armed before the latest pause,
+		# and notes how many pauses it has seen in _timers_pauses.
+		self._pauses = 0
+		self._timers_pauses = 0
+		self.input_state = InputState()
+		self._realtime: Optional[RealtimeMode] = None
+		self._latency: Optional[LatencyStats] = None
 	
+	@property
+	def keycode_function_map(self):
+		"""
+		Read-only mapping of (keycode, modifiers, call_after_release) to bound functions.
+		Inside batch(), the editing thread sees its own unpublished changes.
+		"""
+		return self._bindings.view()
+
+	@property
+	def bindings(self) -> BindingSnapshot:
+		""" The current, immutable snapshot of our bindings, along with its version number. """
+		return self._bindings.snapshot
+
+	def is_pressed(self, keycode: int) -> bool:
+		"""
+		Returns True if the key is held down, as of the latest event this Listener received.
+		Does not contact the server. Keys this Listener does not receive events for keep the state they were seeded with.
+		"""
+		return self.input_state.is_pressed(keycode)
+
+	def pressed_keys(self):
+		""" Returns the keycodes of every key that is held down, as of the latest event this Listener received. """
+		return self.input_state.pressed_keys()
+
+	def batch(self):
+		"""
+		Context manager grouping bind() and unbind() calls.
+		The Listener's thread keeps dispatching from the previous snapshot until the
+		outermost batch exits, at which point every change is published as one new version.
+
+		with keyboard.batch():
+			keyboard.unbind(old_keycode)
+			keyboard.bind(function, new_keycode)
+		"""
+		return self._bindings.edit()
+
 	def start(self, daemon=True):
 		""" Start listening to a peripheral on a new thread. """
 		if self.living.is_set():
 			raise Exception('Listener has already been started.')
-		self.thread = Thread(target=self._thread_entry, daemon=daemon)
+		self.thread = Thread(target=self._run_thread, daemon=daemon)
 		self.thread.start()
 		self.living.wait()
+
+	def _run_thread(self):
+		if self._realtime is not None:
+			self._realtime.elevate()
+		self._thread_entry()
 	
 	def _thread_entry(self):
 		""" 
@@ -36,8 +109,76 @@ class Listener(ABC):
 		Waits for input info that matches a bound keystate we have, and
 		then runs the associated function.	
 		"""
-		for func in self._process_input():
-			func()
+		for binding, func in self._process_bindings():
+			latency = self._latency
+			if latency is not None and self._event_time is not None:
+				latency.record_event(self._event_time)
+			self._call(binding, func)
+
+	def _call(self, binding, function):
+		""" Calls a bound function, through the profiler if profiling is enabled. """
+		profiler = self._profiler
+		if profiler is None:
+			function()
+		else:
+			profiler.call(binding, function)
+
+	def enable_profiling(self, slow_threshold: float=0.05, on_slow=None) -> CallbackProfiler:
+		"""
+		Starts timing every bound function this Listener calls.
+		Functions running longer than slow_threshold seconds are flagged, and passed to
+		on_slow(binding, function, seconds) if given.
+		Returns the profiler. Calling this again replaces the profiler and its statistics.
+		"""
+		self._profiler = CallbackProfiler(slow_threshold, on_slow)
+		return self._profiler
+
+	def disable_profiling(self):
+		""" Stops timing bound functions. Statistics gathered so far are discarded. """
+		self._profiler = None
+
+	def enable_realtime(self, cpu: Optional[int]=None, priority: int=10, nice: int=-10, spin: float=0.0002) -> LatencyStats:
+		"""
+		Runs our thread at elevated priority, optionally pinned to a CPU, and has it spin briefly
+		before blocking while waiting for input. See RealtimeMode. Takes effect on the next start().
+		Returns the latency statistics of bound events, which are measured from then on.
+		"""
+		if self.living.is_set():
+			raise Exception('Real-time mode must be enabled before the Listener is started.')
+		self._realtime = RealtimeMode(cpu, priority, nice, spin)
+		self._latency = self._realtime.latency
+		return self._latency
+
+	@property
+	def realtime(self) -> Optional[RealtimeMode]:
+		return self._realtime
+
+	def measure_latency(self) -> LatencyStats:
+		"""
+		Starts recording how long bound events take to be dispatched, without changing how our thread runs.
+		Only backends whose events carry a timestamp, e.g. X11, can be measured.
+		"""
+		if self._latency is None:
+			self._latency = LatencyStats()
+		return self._latency
+
+	def _wait_readable(self, readables, timeout: Optional[float]) -> list:
+		""" Waits for any of readables to become readable, spinning first in real-time mode. Returns the readable ones. """
+		realtime = self._realtime
+		if realtime is not None:
+			return realtime.wait(readables, timeout)
+		readable, _, _ = select(readables, [], [], timeout)
+		return readable
+
+	def profile_stats(self):
+		"""
+		Returns the per-binding statistics gathered since profiling was enabled, keyed by
+		(keycode, modifiers, call_after_release). Returns an empty dict if profiling is disabled.
+		"""
+		profiler = self._profiler
+		if profiler is None:
+			return {}
+		return profiler.stats()
 	
 	def stop(self):
 		""" Stop listening to the peripheral. Can be started again after stopping. """
@@ -51,6 +192,10 @@ class Listener(ABC):
 		if not self.living.is_set():
 			raise Exception('Tried to stop a Listener that is not living.')
 		self.living.clear()
+		self.paused = False
+		self._grabs_released = False
+		if self._timers is not None:
+			self._timers.clear()
 
 	def bind(self, function, keycode: int, modifiers: int=0, call_after_release: bool=False):
 		""" 
@@ -60,20 +205,210 @@ class Listener(ABC):
 		if not self.living.is_set():
 			raise Exception('Cannot bind keys until the Listener has been started.')
 		info = (keycode, modifiers, call_after_release)
-		if self.keycode_function_map.get(info, None) is not None:
-			raise KeyError('Tried to bind an already bound key combination.')
-		self._grab(keycode, modifiers, call_after_release)
-		self.keycode_function_map[info] = function
+		with self._bindings.edit() as functions:
+			if functions.get(info, None) is not None:
+				raise KeyError('Tried to bind an already bound key combination.')
+			if not self._grabs_released:
+				self._grab(keycode, modifiers, call_after_release)
+			functions[info] = function
 	
 	def unbind(self, keycode: int, modifiers: int=0, call_after_release: bool=False):
 		""" Unbinds a function from a specific keypress/keystate. Will ungrab the key if able. """
-		self.keycode_function_map.pop((keycode, modifiers, call_after_release))
-		self._ungrab(keycode, modifiers, call_after_release)
+		with self._bindings.edit() as functions:
+			functions.pop((keycode, modifiers, call_after_release))
+			if not self._grabs_released:
+				self._ungrab(keycode, modifiers, call_after_release)
+			self._profile_bindings = self._profile_bindings - {(keycode, modifiers, call_after_release)}
 
 	def unbind_all(self):
-		""" Calls self.unbind() on all bound key combinations. """
-		for info in self.keycode_function_map.copy():
-			self.unbind(*info)
+		""" Unbinds all bound key combinations, releasing their grabs in one batch. """
+		with self._bindings.edit() as functions:
+			old = dict(functions)
+			functions.clear()
+			if not self._grabs_released:
+				self._regrab(old, {})
+			self._profile_bindings = frozenset()
+			self.active_profile = None
+
+	def pause(self, release_grabs: bool=True):
+		"""
+		Stops calling bound functions and delivering events, while keeping our bindings, thread and connection.
+		With release_grabs, every grab is released in one batch, so that other programs receive those keys again.
+		Otherwise, grabbed keys keep being swallowed, but nothing happens when they are pressed.
+		Bindings can still be changed while paused.
+		"""
+		if not self.living.is_set():
+			raise Exception('Cannot pause a Listener that has not been started.')
+		with self._bindings.edit() as functions:
+			if release_grabs and not self._grabs_released:
+				self._release_grabs(functions)
+				self._grabs_released = True
+			self._pauses += 1
+			self.paused = True
+
+	def resume(self):
+		"""
+		Undoes pause(). Released grabs are acquired again in one batch.
+		If any of them fails, we stay paused with no grabs held, and the error is raised.
+		"""
+		with self._bindings.edit() as functions:
+			if self._grabs_released:
+				self._restore_grabs(functions)
+				self._grabs_released = False
+			self.paused = False
+
+	def _release_grabs(self, functions: Mapping):
+		""" Releases every grab the given bindings hold. Backends grabbing whole devices release those as well. """
+		self._regrab(functions, {})
+
+	def _restore_grabs(self, functions: Mapping):
+		""" Acquires every grab the given bindings need, undoing _release_grabs(). """
+		self._regrab({}, functions)
+
+	def subscribe(self, callback, event_filter: Optional[EventFilter]=None) -> Subscription:
+		"""
+		Calls callback(HardwareEvent) from the Listener's thread for every input event matching event_filter.
+		Any number of subscribers can observe the same Listener. They only receive events
+		this Listener receives, e.g. grabbed keys for KeyGrab, and every key for KeyboardGrab.
+		"""
+		subscription = Subscription(self, callback, event_filter or EventFilter())
+		with self._subscription_lock:
+			index = self._subscriptions or SubscriptionIndex()
+			self._subscriptions = index.with_subscription(subscription)
+		return subscription
+
+	def unsubscribe(self, subscription: Subscription):
+		""" Stops a subscription from receiving events. """
+		with self._subscription_lock:
+			if self._subscriptions is None:
+				return
+			index = self._subscriptions.without_subscription(subscription)
+			self._subscriptions = index if index.subscriptions else None
+
+	def profile(self, name: str) -> BindingProfile:
+		""" Returns the binding profile with the given name, creating it if it does not exist yet. """
+		if name not in self._profiles:
+			self._profiles[name] = BindingProfile(name)
+		return self._profiles[name]
+
+	def activate(self, name: Optional[str]):
+		"""
+		Replaces the active profile's bindings with those of the named profile.
+		Bindings made with bind() are kept. activate(None) only removes the active profile's bindings.
+
+		Only the grabs that differ between the two sets of bindings are changed, in one batch,
+		and dispatch switches to the new bindings in a single step.
+		If any grab fails, the previous bindings stay in place and the error is raised.
+		"""
+		if not self.living.is_set():
+			raise Exception('Cannot activate a profile until the Listener has been started.')
+		target = self._profiles[name].functions if name is not None else {}
+		with self._bindings.edit() as functions:
+			old = dict(functions)
+			new = {info: function for info, function in old.items() if info not in self._profile_bindings}
+			if new.keys() & target.keys():
+				raise KeyError('Profile {!r} binds key combinations that are already bound.'.format(name))
+			new.update(target)
+			functions.clear()
+			functions.update(new)
+			try:
+				if not self._grabs_released:
+					self._regrab(old, new)
+			except Exception:
+				functions.clear()
+				functions.update(old)
+				raise
+			self._profile_bindings = frozenset(target)
+			self.active_profile = name
+
+	@property
+	def temporal(self) -> TemporalBindings:
+		"""
+		Hold, tap, double-tap and release-timing bindings.
+
+		keyboard.temporal.hold(function, keycode, modifiers, ms=800)
+		keyboard.temporal.double_tap(function, keycode, within_ms=300)
+		"""
+		if self._temporal is None:
+			self._temporal = TemporalBindings(self)
+		return self._temporal
+
+	def _timer_wheel(self) -> TimerWheel:
+		if self._timers is None:
+			self._timers_pauses = self._pauses
+			self._timers = TimerWheel(self._event_timestamp())
+		return self._timers
+
+	def _clock(self) -> int:
+		""" The current time in milliseconds, on the same timebase as our events' timestamps. """
+		return int(monotonic() * 1000)
+
+	def _event_timestamp(self) -> int:
+		""" The time of the event being dispatched, or the current time if the backend does not timestamp events. """
+		return self._event_time if self._event_time is not None else self._clock()
+
+	def _timer_timeout(self) -> Optional[float]:
+		""" Seconds until _tick() needs to be called, or None if no timers are pending. Backends may block for this long. """
+		timers = self._timers
+		if timers is None:
+			return None
+		next_tick = timers.next_tick()
+		if next_tick is None:
+			return None
+		return max(0, next_tick - self._clock()) / 1000
+
+	def _tick(self):
+		""" Runs the timers that are due. Called from our thread only. """
+		timers = self._timers
+		if timers is not None:
+			if self.paused or self._timers_pauses != self._pauses:
+				self._cancel_timers()
+			elif timers.pending:
+				timers.advance(self._clock())
+
+	def _cancel_timers(self):
+		""" Cancels every timer armed before the latest pause(), forgetting any held keys. Called from our thread only. """
+		self._timers_pauses = self._pauses
+		if self._timers.pending:
+			if self._temporal is not None:
+				self._temporal.cancel()
+			self._timers.clear()
+
+	def _grab_ids(self, functions: Mapping) -> Dict:
+		"""
+		Maps an identifier for each underlying grab to one of the bindings needing it.
+		Bindings that share an identifier share a grab.
+		"""
+		return {info: info for info in functions}
+
+	def _regrab(self, old: Mapping, new: Mapping):
+		""" Releases the grabs only the old bindings need, and acquires those only the new bindings need. """
+		old_ids = self._grab_ids(old)
+		new_ids = self._grab_ids(new)
+		released = {grab_id: old_ids[grab_id] for grab_id in old_ids.keys() - new_ids.keys()}
+		acquired = {grab_id: new_ids[grab_id] for grab_id in new_ids.keys() - old_ids.keys()}
+		if released or acquired:
+			self._apply_grabs(released, acquired)
+
+	def _apply_grabs(self, released: Dict, acquired: Dict):
+		"""
+		Applies a set of grab changes. Both arguments map grab identifiers to a binding.
+		By default, this calls _ungrab() and _grab() once per binding.
+		Backends that can batch their grabs should override it.
+		"""
+		for info in released.values():
+			self._ungrab(*info)
+		grabbed = []
+		try:
+			for info in acquired.values():
+				self._grab(*info)
+				grabbed.append(info)
+		except Exception:
+			for info in grabbed:
+				self._ungrab(*info)
+			for info in released.values():
+				self._grab(*info)
+			raise
 
 	def _grab(self, keycode: int, modifiers: int, call_after_release: bool):
 		""" Grabs the key, button, cursor, etc. """
@@ -88,10 +423,31 @@ class Listener(ABC):
 	def _process_input(self):
 		""" Blocking process that receives grabbed key/button information
 		and yields the functions bound to those key combinations. """
+		for _, func in self._process_bindings():
+			yield func
+
+	def _process_bindings(self):
+		""" Same as _process_input, but yields (binding, function) pairs. """
 		for input_info in self._input():
 			if not self.living.is_set():
 				break
+			timers = self._timers
+			if timers is not None:
+				if self.paused or self._timers_pauses != self._pauses:
+					self._cancel_timers()
+				elif timers.pending:
+					# Timers due before this event run before it.
+					timers.advance(self._event_timestamp())
+			if self.paused:
+				continue
+			subscriptions = self._subscriptions
+			if subscriptions is not None:
+				matched = subscriptions.lookup(input_info)
+				if matched:
+					event = HardwareEvent(*input_info)
+					for subscription in matched:
+						subscription.deliver(event)
 			try:
-				yield self.keycode_function_map[input_info]
+				yield input_info, self._bindings.snapshot.functions[input_info]
 			except KeyError:
-				continue
\ No newline at end of file
+				continue
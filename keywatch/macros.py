@@ -0,0 +1,173 @@
+import heapq
+import warnings
+from collections import namedtuple
+from itertools import count
+from threading import Condition, Event, Lock, Thread
+from time import monotonic
+from typing import Callable, Optional
+
+Key = namedtuple('Key', ['keycode', 'press'])
+Tap = namedtuple('Tap', ['keycode', 'modifiers'])
+Tap.__new__.__defaults__ = (0,)
+Button = namedtuple('Button', ['button', 'press'])
+Click = namedtuple('Click', ['button', 'count'])
+Click.__new__.__defaults__ = (1, 1)
+Move = namedtuple('Move', ['dx', 'dy'])
+MoveTo = namedtuple('MoveTo', ['x', 'y'])
+Type = namedtuple('Type', ['text'])
+Delay = namedtuple('Delay', ['seconds'])
+
+def _apply(injector, step):
+	""" Queues one step on the injector. """
+	if isinstance(step, Key):
+		injector.key(step.keycode, step.press)
+	elif isinstance(step, Tap):
+		injector.tap(step.keycode, step.modifiers)
+	elif isinstance(step, Button):
+		injector.button(step.button, step.press)
+	elif isinstance(step, Click):
+		injector.click(step.button, step.count)
+	elif isinstance(step, Move):
+		injector.move(step.dx, step.dy)
+	elif isinstance(step, MoveTo):
+		injector.move_to(step.x, step.y)
+	elif isinstance(step, Type):
+		injector.type(step.text)
+
+class Macro:
+	"""
+	A declarative sequence of input steps, e.g.
+	Macro(Tap(a_keycode), Delay(0.1), Type('hello'), Click(1))
+
+	Steps between two delays are injected together, with a single flush.
+	A macro can be run any number of times, including concurrently.
+	"""
+	_step_types = (Key, Tap, Button, Click, Move, MoveTo, Type, Delay)
+
+	def __init__(self, *steps):
+		for step in steps:
+			if not isinstance(step, self._step_types):
+				raise TypeError('{!r} is not a macro step.'.format(step))
+		self.steps = steps
+
+	def run(self, injector, scheduler: Optional['MacroScheduler']=None, on_done: Optional[Callable]=None) -> 'MacroRun':
+		""" Starts running the macro on the shared scheduler thread. Returns a handle to cancel or wait for it. """
+		run = MacroRun(self, injector, on_done)
+		(scheduler or default_scheduler()).schedule(run, monotonic())
+		return run
+
+class MacroRun:
+	""" One execution of a Macro. """
+	def __init__(self, macro: Macro, injector, on_done: Optional[Callable]=None):
+		self.macro = macro
+		self.injector = injector
+		self.cancelled = False
+		# The exception a step raised, which stopped the macro.
+		self.error: Optional[Exception] = None
+		self._index = 0
+		self._done = Event()
+		self._on_done = on_done
+
+	@property
+	def done(self) -> bool:
+		return self._done.is_set()
+
+	def cancel(self):
+		""" Stops the macro before its next step. Steps already injected are not undone. """
+		self.cancelled = True
+		self._finish()
+
+	def wait(self, timeout: Optional[float]=None) -> bool:
+		""" Waits for the macro to finish or be cancelled. Returns False on timeout. """
+		return self._done.wait(timeout)
+
+	def result(self, timeout: Optional[float]=None) -> bool:
+		""" Like wait(), but raises the exception the macro failed with, if any. """
+		finished = self._done.wait(timeout)
+		if self.error is not None:
+			raise self.error
+		return finished
+
+	def _advance(self, deadline: float) -> Optional[float]:
+		"""
+		Injects every step up to the next delay. Returns when the following steps are due, or None once finished.
+		Deadlines follow on from the previous deadline, rather than from when we got around to it, so delays do not drift.
+		"""
+		steps = self.macro.steps
+		try:
+			with self.injector.batch():
+				while self._index < len(steps) and not self.cancelled:
+					step = steps[self._index]
+					self._index += 1
+					if isinstance(step, Delay):
+						return deadline + step.seconds
+					_apply(self.injector, step)
+		except Exception as e:
+			self.error = e
+			# Runs started by a binding have nobody waiting on them.
+			warnings.warn('Macro failed: {!r}'.format(e), RuntimeWarning)
+		self._finish()
+		return None
+
+	def _finish(self):
+		if not self._done.is_set():
+			self._done.set()
+			if self._on_done is not None:
+				self._on_done(self)
+
+class MacroScheduler:
+	"""
+	Runs every macro on one thread, from a queue ordered by monotonic deadline.
+	The thread sleeps until the earliest deadline, or until an earlier one is scheduled.
+	"""
+	def __init__(self):
+		self._queue = []
+		self._condition = Condition()
+		# Breaks ties between equal deadlines, in scheduling order.
+		self._order = count()
+		self._thread: Optional[Thread] = None
+
+	def schedule(self, run: MacroRun, deadline: float):
+		with self._condition:
+			if self._thread is None:
+				self._thread = Thread(target=self._loop, daemon=True)
+				self._thread.start()
+			heapq.heappush(self._queue, (deadline, next(self._order), run))
+			if self._queue[0][2] is run:
+				self._condition.notify()
+
+	def _next_due(self):
+		""" Waits for, and removes, the next macro whose deadline has passed. """
+		with self._condition:
+			while True:
+				if not self._queue:
+					self._condition.wait()
+					continue
+				deadline, _, run = self._queue[0]
+				remaining = deadline - monotonic()
+				if remaining > 0:
+					self._condition.wait(remaining)
+					continue
+				heapq.heappop(self._queue)
+				return deadline, run
+
+	def _loop(self):
+		while True:
+			deadline, run = self._next_due()
+			# Cancelled macros are skipped here, rather than searched for in the queue.
+			if run.cancelled:
+				continue
+			next_deadline = run._advance(deadline)
+			if next_deadline is not None:
+				self.schedule(run, next_deadline)
+
+_default_scheduler: Optional[MacroScheduler] = None
+_default_scheduler_lock = Lock()
+
+def default_scheduler() -> MacroScheduler:
+	""" Returns the scheduler shared by every Listener. """
+	global _default_scheduler
+	with _default_scheduler_lock:
+		if _default_scheduler is None:
+			_default_scheduler = MacroScheduler()
+		return _default_scheduler
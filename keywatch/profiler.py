@@ -0,0 +1,71 @@
+from threading import Lock
+from time import perf_counter
+from typing import Callable, Dict, Hashable, Optional
+from collections import namedtuple
+
+BindingStats = namedtuple('BindingStats', [
+	'function', 'calls', 'total_time', 'max_time', 'slow_calls',
+])
+
+class CallbackProfiler:
+	"""
+	Times the functions a Listener calls for its bindings.
+	Records per-binding invocation counts, cumulative and max wall time,
+	and flags calls that take longer than slow_threshold seconds.
+	"""
+	def __init__(self, slow_threshold: float=0.05, on_slow: Optional[Callable[[Hashable, Callable, float], None]]=None):
+		"""
+		on_slow: Called as on_slow(binding, function, seconds) from the Listener's thread
+		whenever a bound function runs for longer than slow_threshold.
+		"""
+		self.slow_threshold = slow_threshold
+		self.on_slow = on_slow
+		self._lock = Lock()
+		# binding -> [function, calls, total_time, max_time, slow_calls]
+		self._stats: Dict[Hashable, list] = {}
+
+	def call(self, binding: Hashable, function: Callable):
+		""" Calls function, timing it against the given binding. """
+		start = perf_counter()
+		try:
+			function()
+		finally:
+			elapsed = perf_counter() - start
+			slow = elapsed > self.slow_threshold
+			with self._lock:
+				entry = self._stats.get(binding)
+				if entry is None or entry[0] is not function:
+					# New binding, or the binding has since been rebound to another function.
+					entry = self._stats[binding] = [function, 0, 0.0, 0.0, 0]
+				entry[1] += 1
+				entry[2] += elapsed
+				if elapsed > entry[3]:
+					entry[3] = elapsed
+				if slow:
+					entry[4] += 1
+			if slow and self.on_slow is not None:
+				self.on_slow(binding, function, elapsed)
+
+	def stats(self) -> Dict[Hashable, BindingStats]:
+		""" Returns a copy of the statistics gathered so far, keyed by binding. """
+		with self._lock:
+			return {binding: BindingStats(*entry) for binding, entry in self._stats.items()}
+
+	def slow_bindings(self) -> Dict[Hashable, BindingStats]:
+		""" Returns the statistics of bindings that have had at least one slow call. """
+		return {binding: stats for binding, stats in self.stats().items() if stats.slow_calls}
+
+	def reset(self):
+		with self._lock:
+			self._stats.clear()
+
+	def report(self) -> str:
+		""" Returns a human readable table of the gathered statistics, slowest bindings first. """
+		lines = ['{:<32} {:<32} {:>8} {:>12} {:>12} {:>6}'.format('binding', 'function', 'calls', 'total ms', 'max ms', 'slow')]
+		ordered = sorted(self.stats().items(), key=lambda item: item[1].total_time, reverse=True)
+		for binding, stats in ordered:
+			name = getattr(stats.function, '__qualname__', repr(stats.function))
+			lines.append('{:<32} {:<32} {:>8} {:>12.3f} {:>12.3f} {:>6}'.format(
+				str(binding), name[:32], stats.calls, stats.total_time * 1000, stats.max_time * 1000, stats.slow_calls
+			))
+		return '\n'.join(lines)
@@ -0,0 +1,24 @@
+from typing import Callable, Dict
+
+class BindingProfile:
+	"""
+	A named set of bindings, which a Listener can switch to all at once with Listener.activate().
+	Changing a profile does not affect a Listener until the profile is activated (again).
+	"""
+	def __init__(self, name: str):
+		self.name = name
+		self.functions: Dict[tuple, Callable] = {}
+
+	def bind(self, function, keycode: int, modifiers: int=0, call_after_release: bool=False):
+		""" Adds a binding to the profile. Same arguments as Listener.bind(). """
+		info = (keycode, modifiers, call_after_release)
+		if info in self.functions:
+			raise KeyError('Tried to bind an already bound key combination.')
+		self.functions[info] = function
+
+	def unbind(self, keycode: int, modifiers: int=0, call_after_release: bool=False):
+		""" Removes a binding from the profile. """
+		self.functions.pop((keycode, modifiers, call_after_release))
+
+	def __repr__(self):
+		return '{}({!r}, {} bindings)'.format(self.__class__.__name__, self.name, len(self.functions))
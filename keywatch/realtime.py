@@ -0,0 +1,141 @@
+import os
+import warnings
+from select import select
+from threading import Lock
+from time import monotonic, perf_counter
+from typing import Dict, Optional, Sequence
+
+# Latencies are counted in buckets this many milliseconds wide, up to LATENCY_BUCKETS of them.
+BUCKET_MS = 0.1
+LATENCY_BUCKETS = 10000
+
+class LatencyStats:
+	"""
+	Distribution of the time from an input event being generated to its binding being called.
+
+	Event timestamps come from another clock, e.g. the X server's, so latencies are measured
+	against the smallest difference seen between our clock and theirs. That difference is
+	the fastest any event has been delivered, and is treated as zero latency.
+	Samples are counted in a fixed histogram, so recording one allocates nothing.
+	"""
+	def __init__(self):
+		self._lock = Lock()
+		self.reset()
+
+	def reset(self):
+		with self._lock:
+			self._buckets = [0] * (LATENCY_BUCKETS + 1)
+			self._offset: Optional[float] = None
+			self.count = 0
+			self.max_ms = 0.0
+
+	def record_event(self, event_ms: float):
+		""" Records the latency of an event with the given timestamp, dispatched now. """
+		difference = monotonic() * 1000 - event_ms
+		with self._lock:
+			if self._offset is None or difference < self._offset:
+				self._offset = difference
+			self._record(difference - self._offset)
+
+	def record(self, latency_ms: float):
+		with self._lock:
+			self._record(latency_ms)
+
+	def _record(self, latency_ms: float):
+		self._buckets[min(int(latency_ms / BUCKET_MS), LATENCY_BUCKETS)] += 1
+		self.count += 1
+		if latency_ms > self.max_ms:
+			self.max_ms = latency_ms
+
+	def percentile(self, percent: float) -> float:
+		""" Returns the latency, in milliseconds, that the given percentage of events were dispatched within. """
+		with self._lock:
+			if not self.count:
+				return 0.0
+			target = self.count * percent / 100
+			seen = 0
+			for bucket, count in enumerate(self._buckets):
+				seen += count
+				if seen >= target:
+					return min((bucket + 1) * BUCKET_MS, self.max_ms)
+			return self.max_ms
+
+	def summary(self) -> Dict[str, float]:
+		return {
+			'count': self.count,
+			'p50': self.percentile(50),
+			'p90': self.percentile(90),
+			'p99': self.percentile(99),
+			'p99.9': self.percentile(99.9),
+			'max': self.max_ms,
+		}
+
+	def report(self) -> str:
+		""" Returns the summary as one human readable line. """
+		summary = self.summary()
+		return '{} events, '.format(summary.pop('count')) + ', '.join('{} {:.1f} ms'.format(name, ms) for name, ms in summary.items())
+
+class RealtimeMode:
+	"""
+	Settings for running a Listener's thread ahead of everything else on a busy machine.
+
+	The thread asks for SCHED_FIFO at the given priority, which needs CAP_SYS_NICE or an rtprio limit.
+	Failing that, it lowers its nice value as far as it is permitted to. If cpu is given, the thread is pinned to it.
+	While waiting for input, the thread polls for 'spin' seconds before blocking, so that an event
+	arriving right after the previous one is picked up without waiting to be scheduled again.
+	"""
+	def __init__(self, cpu: Optional[int]=None, priority: int=10, nice: int=-10, spin: float=0.0002):
+		self.cpu = cpu
+		self.priority = priority
+		self.nice = nice
+		self.spin = spin
+		# What elevate() achieved: 'fifo', 'nice' or 'normal', and whether the thread is pinned to cpu.
+		self.scheduling = 'normal'
+		self.pinned = False
+		self.latency = LatencyStats()
+
+	def elevate(self):
+		"""
+		Applies our settings to the calling thread. Settings that are not permitted are skipped,
+		as recorded in self.scheduling and self.pinned. Failing to pin to the requested cpu also warns.
+		"""
+		if self.cpu is not None and hasattr(os, 'sched_setaffinity'):
+			try:
+				os.sched_setaffinity(0, {self.cpu})
+				self.pinned = True
+			except OSError as e:
+				warnings.warn('Unable to pin the Listener thread to CPU {}. {}'.format(self.cpu, e), RuntimeWarning)
+		if hasattr(os, 'sched_setscheduler'):
+			try:
+				os.sched_setscheduler(0, os.SCHED_FIFO, os.sched_param(self.priority))
+				self.scheduling = 'fifo'
+				return
+			except OSError:
+				pass
+		if hasattr(os, 'setpriority'):
+			# Linux applies nice values to the calling thread only.
+			for nice in range(self.nice, 0):
+				try:
+					os.setpriority(os.PRIO_PROCESS, 0, nice)
+					self.scheduling = 'nice'
+					return
+				except OSError:
+					continue
+
+	def wait(self, readables: Sequence, timeout: Optional[float]) -> list:
+		"""
+		Waits for any of readables to become readable, polling for up to 'spin' seconds before blocking.
+		Returns the readable ones, which is empty on timeout.
+		"""
+		start = perf_counter()
+		spin_until = start + min(self.spin, timeout) if timeout is not None else start + self.spin
+		while True:
+			readable, _, _ = select(readables, [], [], 0)
+			if readable:
+				return readable
+			if perf_counter() >= spin_until:
+				break
+		if timeout is not None:
+			timeout = max(timeout - (perf_counter() - start), 0)
+		readable, _, _ = select(readables, [], [], timeout)
+		return readable
@@ -0,0 +1,131 @@
+from collections import deque
+from threading import Condition, Event
+from typing import Iterable, List, Optional, Set, Tuple
+
+from .listener import Listener
+from .errors import AlreadyGrabbedError
+
+class _Advance:
+	""" Feed marker that moves the virtual clock forward. """
+	__slots__ = ('ms',)
+
+	def __init__(self, ms: int):
+		self.ms = ms
+
+class _Barrier:
+	""" Feed marker that is reached once every event fed before it has been dispatched. """
+	__slots__ = ('reached',)
+
+	def __init__(self):
+		self.reached = Event()
+
+class SimulatedListener(Listener):
+	"""
+	A Listener whose input comes from a programmable feed instead of a device,
+	for testing and benchmarking binding logic and dispatch without a display.
+
+	Events are (keycode, modifiers, is_keyup) tuples, optionally followed by a timestamp in
+	milliseconds, which sets the virtual clock. Timers, e.g. temporal bindings, follow the
+	virtual clock only, so their results do not depend on how fast the simulation runs.
+
+	Every grab and ungrab is recorded in self.calls as ('grab' or 'ungrab', keycode, modifiers, call_after_release).
+	Grabs of (keycode, modifiers) pairs in self.refused fail with AlreadyGrabbedError.
+
+	start(threaded=False) dispatches nothing by itself. run(events) then dispatches
+	on the calling thread, which is what benchmarks of the dispatch path want.
+	"""
+	def __init__(self, record_calls: bool=True):
+		super().__init__()
+		self.calls: List[Tuple[str, int, int, bool]] = []
+		self.record_calls = record_calls
+		self.refused: Set[Tuple[int, int]] = set()
+		# The virtual clock, in milliseconds.
+		self.time = 0
+		self._feed = deque()
+		self._feed_ready = Condition()
+		self._blocking = True
+
+	def start(self, daemon=True, threaded: bool=True):
+		if threaded:
+			super().start(daemon)
+			return
+		if self.living.is_set():
+			raise Exception('Listener has already been started.')
+		self._blocking = False
+		self.living.set()
+
+	def stop(self):
+		if self.thread is None:
+			self._stop()
+			self._blocking = True
+			return
+		super().stop()
+
+	def _stop(self):
+		super()._stop()
+		with self._feed_ready:
+			self._feed_ready.notify()
+
+	def feed(self, events: Iterable):
+		""" Queues events for our thread to dispatch, in order. Lists and tuples are queued without being copied. """
+		with self._feed_ready:
+			self._feed.append(events)
+			self._feed_ready.notify()
+
+	def advance(self, ms: int):
+		""" Moves the virtual clock forward once every event fed so far has been dispatched, running any timers that come due. """
+		self.feed((_Advance(ms),))
+
+	def drain(self, timeout: Optional[float]=None) -> bool:
+		""" Waits until every event fed so far has been dispatched. Returns False on timeout. """
+		barrier = _Barrier()
+		self.feed((barrier,))
+		return barrier.reached.wait(timeout)
+
+	def run(self, events: Iterable):
+		""" Dispatches events on the calling thread, then returns. For Listeners started with threaded=False. """
+		if self.thread is not None:
+			raise Exception('run() is only available after start(threaded=False).')
+		self.feed(events)
+		self.input_loop()
+
+	def _clock(self) -> int:
+		return self.time
+
+	def _grab(self, keycode: int, modifiers: int, call_after_release: bool):
+		if (keycode, modifiers) in self.refused:
+			raise AlreadyGrabbedError('Simulated grab of ({}, {}) refused.'.format(keycode, modifiers))
+		if self.record_calls:
+			self.calls.append(('grab', keycode, modifiers, call_after_release))
+
+	def _ungrab(self, keycode: int, modifiers: int, call_after_release: bool):
+		if self.record_calls:
+			self.calls.append(('ungrab', keycode, modifiers, call_after_release))
+
+	def _next_batch(self):
+		""" Returns the next batch of the feed, or None once we should stop. """
+		with self._feed_ready:
+			while not self._feed:
+				if not self._blocking or not self.living.is_set():
+					return None
+				self._feed_ready.wait()
+			return self._feed.popleft()
+
+	def _input(self):
+		while self.living.is_set():
+			batch = self._next_batch()
+			if batch is None:
+				return
+			for item in batch:
+				if item.__class__ is tuple:
+					if len(item) == 4:
+						self.time = item[3]
+						item = item[:3]
+					yield item
+				elif isinstance(item, _Advance):
+					self.time += item.ms
+					self._tick()
+				elif isinstance(item, _Barrier):
+					item.reached.set()
+				else:
+					yield tuple(item)
@@ -0,0 +1,107 @@
+import heapq
+from collections import namedtuple
+from itertools import count
+from threading import Condition, Thread, current_thread
+from time import monotonic
+from typing import Callable, Iterable, Iterator, List, Optional
+
+from .subscriptions import EventFilter
+
+StreamEvent = namedtuple('StreamEvent', [
+	'timestamp', 'source', 'keycode', 'modifiers', 'is_keyup', 'pos',
+])
+
+class MergedStream:
+	"""
+	Combines the events of several Listeners into one sequence, ordered by event timestamp.
+	For example, a KeyboardGrab and a MouseGrab on the same X server share the server's clock,
+	so key presses and clicks come out in the order the user made them.
+
+	Each Listener hands its events over from its own thread. An event is held back for
+	window_ms milliseconds after it arrives, in case an earlier one is still on its way
+	from another Listener, and events are then released in timestamp order.
+	An event arriving after later ones were released is still delivered, and counted in self.late.
+
+	Consume the stream either by iterating over it from one thread, or with start(callback).
+	Either way, events are delivered one at a time, so consumers need no locking of their own.
+	"""
+	def __init__(self, listeners: Iterable=(), window_ms: float=20, event_filter: Optional[EventFilter]=None):
+		self.window = window_ms / 1000
+		self.late = 0
+		self._ready = Condition()
+		# (timestamp, sequence, arrival, StreamEvent)
+		self._heap: List[tuple] = []
+		self._sequence = count()
+		self._released_timestamp = None
+		self._subscriptions = []
+		self._closed = False
+		self._thread: Optional[Thread] = None
+		for listener in listeners:
+			self.add(listener, event_filter)
+
+	def add(self, listener, event_filter: Optional[EventFilter]=None):
+		""" Adds a Listener's key and button events matching event_filter to the stream. """
+		def push(event):
+			self.push(listener, event.keycode, event.modifiers, event.is_keyup)
+		self._subscriptions.append(listener.subscribe(push, event_filter))
+
+	def movement_fn(self, listener) -> Callable:
+		""" Returns a movement function, for set_movement_fn(), adding a Listener's movement to the stream with a keycode of None. """
+		def push(pos, delta):
+			self.push(listener, None, 0, False, pos)
+		return push
+
+	def push(self, source, keycode: Optional[int], modifiers: int, is_keyup: bool, pos=None):
+		""" Adds an event to the stream, timestamped by the source Listener's event being dispatched. Called from the source's thread. """
+		event = StreamEvent(source._event_timestamp(), source, keycode, modifiers, is_keyup, pos if pos is not None else source.input_state.pos)
+		with self._ready:
+			heapq.heappush(self._heap, (event.timestamp, next(self._sequence), monotonic(), event))
+			self._ready.notify()
+
+	def __iter__(self) -> Iterator[StreamEvent]:
+		""" Yields events in timestamp order until the stream is closed. Events still held back are yielded before stopping. """
+		heap = self._heap
+		with self._ready:
+			while True:
+				if heap:
+					timestamp, _, arrival, event = heap[0]
+					wait = arrival + self.window - monotonic()
+					if wait <= 0 or self._closed:
+						heapq.heappop(heap)
+						if self._released_timestamp is not None and timestamp < self._released_timestamp:
+							self.late += 1
+						else:
+							self._released_timestamp = timestamp
+						self._ready.release()
+						try:
+							yield event
+						finally:
+							self._ready.acquire()
+						continue
+				elif self._closed:
+					return
+				else:
+					wait = None
+				self._ready.wait(wait)
+
+	def start(self, callback: Callable[[StreamEvent], None], daemon: bool=True):
+		""" Calls callback(StreamEvent) for each event, in order, from a new thread. """
+		if self._thread is not None:
+			raise Exception('The stream is already being consumed by a thread.')
+		def consume():
+			for event in self:
+				callback(event)
+		self._thread = Thread(target=consume, daemon=daemon)
+		self._thread.start()
+
+	def close(self):
+		""" Stops taking events from the Listeners. Consumers receive the events still held back, and then stop. """
+		for subscription in self._subscriptions:
+			subscription.cancel()
+		self._subscriptions.clear()
+		with self._ready:
+			self._closed = True
+			self._ready.notify_all()
+		if self._thread is not None and self._thread is not current_thread():
+			self._thread.join()
+			self._thread = None
@@ -0,0 +1,100 @@
+from time import monotonic
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+# The most distinct (keycode, modifiers, is_keyup) combinations an index remembers before starting over.
+MAX_CACHED_EVENTS = 4096
+
+class EventFilter:
+	"""
+	Declarative description of the events a subscriber wants to receive.
+	Every criterion defaults to None, which matches anything.
+
+	keycodes: Only these keycodes/buttons.
+	modifiers: Modifier bits the event must have. Compared exactly, unless modifier_mask is given.
+	modifier_mask: Which modifier bits to compare against 'modifiers'. Other bits are ignored.
+	is_keyup: True for releases only, False for presses only.
+	rate_limit: At most this many events per second are delivered. Excess events are dropped.
+	"""
+	def __init__(self, keycodes: Optional[Iterable[int]]=None, modifiers: Optional[int]=None,
+			modifier_mask: Optional[int]=None, is_keyup: Optional[bool]=None, rate_limit: Optional[float]=None):
+		self.keycodes = frozenset(keycodes) if keycodes is not None else None
+		if modifier_mask is None:
+			modifier_mask = 0 if modifiers is None else ~0
+		self.modifier_mask = modifier_mask
+		self.modifiers = (modifiers or 0) & modifier_mask
+		self.is_keyup = is_keyup
+		self.rate_limit = rate_limit
+
+	def matches(self, keycode: int, modifiers: int, is_keyup: bool) -> bool:
+		if self.keycodes is not None and keycode not in self.keycodes:
+			return False
+		return self._matches_state(modifiers, is_keyup)
+
+	def _matches_state(self, modifiers: int, is_keyup: bool) -> bool:
+		if (modifiers & self.modifier_mask) != self.modifiers:
+			return False
+		return self.is_keyup is None or self.is_keyup == is_keyup
+
+class Subscription:
+	""" A consumer of a Listener's event stream. Returned by Listener.subscribe(). """
+	def __init__(self, listener, callback: Callable, event_filter: EventFilter):
+		self.listener = listener
+		self.callback = callback
+		self.filter = event_filter
+		self._min_interval = 1 / event_filter.rate_limit if event_filter.rate_limit else 0
+		self._next_delivery = 0.0
+
+	def deliver(self, event):
+		""" Calls our callback with the event, unless that would exceed our rate limit. """
+		if self._min_interval:
+			now = monotonic()
+			if now < self._next_delivery:
+				return
+			self._next_delivery = now + self._min_interval
+		self.callback(event)
+
+	def cancel(self):
+		""" Stops this subscription from receiving further events. """
+		self.listener.unsubscribe(self)
+
+class SubscriptionIndex:
+	"""
+	An immutable set of subscriptions, compiled for dispatch.
+
+	Filters are indexed by keycode. The subscriptions matching a given
+	(keycode, modifiers, is_keyup) are worked out the first time it is seen,
+	after which each event costs a single dict lookup, however many subscribers there are.
+	Adding or removing a subscription builds a new index.
+	"""
+	def __init__(self, subscriptions: Iterable[Subscription]=()):
+		self.subscriptions: Tuple[Subscription, ...] = tuple(subscriptions)
+		self._any_keycode = tuple(s for s in self.subscriptions if s.filter.keycodes is None)
+		self._by_keycode: Dict[int, Tuple[Subscription, ...]] = {}
+		for subscription in self.subscriptions:
+			for keycode in subscription.filter.keycodes or ():
+				self._by_keycode[keycode] = self._by_keycode.get(keycode, ()) + (subscription,)
+		self._cache: Dict[tuple, Tuple[Subscription, ...]] = {}
+
+	def with_subscription(self, subscription: Subscription) -> 'SubscriptionIndex':
+		return SubscriptionIndex(self.subscriptions + (subscription,))
+
+	def without_subscription(self, subscription: Subscription) -> 'SubscriptionIndex':
+		return SubscriptionIndex(s for s in self.subscriptions if s is not subscription)
+
+	def lookup(self, input_info) -> Tuple[Subscription, ...]:
+		""" Returns the subscriptions whose filters match the given (keycode, modifiers, is_keyup). """
+		try:
+			return self._cache[input_info]
+		except KeyError:
+			pass
+		try:
+			keycode, modifiers, is_keyup = input_info
+		except (TypeError, ValueError):
+			return ()
+		candidates = {id(s) for s in self._by_keycode.get(keycode, ()) + self._any_keycode}
+		# Iterating self.subscriptions keeps delivery in subscription order.
+		matched = tuple(s for s in self.subscriptions if id(s) in candidates and s.filter._matches_state(modifiers, is_keyup))
+		if len(self._cache) >= MAX_CACHED_EVENTS:
+			self._cache.clear()
+		self._cache[input_info] = matched
+		return matched
@@ -0,0 +1,241 @@
+from functools import partial
+from threading import Lock
+from typing import Callable, Dict, List, Optional, Tuple
+
+class Timer:
+	""" A callback scheduled on a TimerWheel. Returned by TimerWheel.schedule(). """
+	__slots__ = ('tick', 'callback', '_wheel')
+
+	def __init__(self, wheel: 'TimerWheel', tick: int, callback: Callable):
+		self._wheel = wheel
+		self.tick = tick
+		self.callback = callback
+
+	def cancel(self):
+		self._wheel._remove(self)
+
+class TimerWheel:
+	"""
+	A hashed timer wheel. Times are integers in milliseconds, on whichever timebase the caller uses.
+
+	Timers are hashed into slots by the tick they expire on. Scheduling and cancelling a timer,
+	and advancing by one tick, each cost O(1) regardless of how many timers are pending.
+	Timers further away than one revolution wait in their slot until their tick comes around.
+
+	Timers are run by one thread, through advance(), but may be scheduled and cancelled from any thread.
+	A lock guards the slots, and is not held while running callbacks, so they may schedule and cancel timers too.
+	"""
+	def __init__(self, now: int, tick_ms: int=10, slots: int=256):
+		self.tick_ms = tick_ms
+		self._lock = Lock()
+		self._slots: List[Dict[Timer, None]] = [{} for _ in range(slots)]
+		# The last tick whose timers have run.
+		self._tick = now // tick_ms
+		self.pending = 0
+
+	def schedule(self, deadline: int, callback: Callable) -> Timer:
+		""" Calls callback() from advance() once the time reaches deadline. """
+		# Rounded up, so that timers never run early.
+		tick = -(-deadline // self.tick_ms)
+		with self._lock:
+			# Deadlines that have already passed run on the next advance().
+			timer = Timer(self, max(tick, self._tick + 1), callback)
+			self._slots[timer.tick % len(self._slots)][timer] = None
+			self.pending += 1
+		return timer
+
+	def next_tick(self) -> Optional[int]:
+		""" Returns when advance() next needs to be called, or None if no timers are pending. """
+		if not self.pending:
+			return None
+		return (self._tick + 1) * self.tick_ms
+
+	def advance(self, now: int):
+		""" Runs every timer whose deadline is at or before now. """
+		target = now // self.tick_ms
+		due = []
+		with self._lock:
+			if target <= self._tick:
+				return
+			# Past one revolution, every slot has been visited and later ticks would only revisit them.
+			first = max(self._tick + 1, target - len(self._slots) + 1)
+			self._tick = target
+			for tick in range(first, target + 1):
+				if self.pending == len(due):
+					break
+				slot = self._slots[tick % len(self._slots)]
+				if not slot:
+					continue
+				slot_due = [timer for timer in slot if timer.tick <= target]
+				for timer in slot_due:
+					del slot[timer]
+				due.extend(slot_due)
+			self.pending -= len(due)
+		for timer in due:
+			# Cancelled by another thread, or by an earlier callback, since being taken off the wheel.
+			callback = timer.callback
+			if callback is not None:
+				callback()
+
+	def clear(self):
+		with self._lock:
+			for slot in self._slots:
+				for timer in slot:
+					timer.callback = None
+				slot.clear()
+			self.pending = 0
+
+	def _remove(self, timer: Timer):
+		with self._lock:
+			timer.callback = None
+			slot = self._slots[timer.tick % len(self._slots)]
+			if timer in slot:
+				del slot[timer]
+				self.pending -= 1
+
+class TemporalKey:
+	"""
+	Tracks one key+modifier combination, and calls its temporal bindings.
+	Its press() and release() are bound to the key like any other function.
+	"""
+	def __init__(self, listener, keycode: int, modifiers: int):
+		self._listener = listener
+		self.keycode = keycode
+		self.modifiers = modifiers
+		self.holds: List[Tuple[int, Callable]] = []
+		self.taps: List[Tuple[int, Callable]] = []
+		self.double_taps: List[Tuple[int, Callable]] = []
+		self.timed_releases: List[Callable] = []
+		self._pressed_at: Optional[int] = None
+		self._last_press: Optional[int] = None
+		self._hold_timers: List[Timer] = []
+		self._pending_release: Optional[Timer] = None
+		self._released_at: Optional[int] = None
+
+	def press(self):
+		now = self._listener._event_timestamp()
+		if self._pending_release is not None:
+			if now == self._released_at:
+				# X autorepeat sends a release and a press with the same timestamp. The key is still held.
+				self._pending_release.cancel()
+				self._pending_release = None
+				return
+			self._pending_release.cancel()
+			self._released(self._released_at)
+		if self._pressed_at is not None:
+			return
+		self._pressed_at = now
+		if self.double_taps:
+			if self._last_press is not None:
+				since = now - self._last_press
+				# A third tap starts a new pair, rather than completing another one.
+				self._last_press = None
+				for within, function in self.double_taps:
+					if since <= within:
+						self._call(function)
+			else:
+				self._last_press = now
+		wheel = self._listener._timer_wheel()
+		for duration, function in self.holds:
+			self._hold_timers.append(wheel.schedule(now + duration, partial(self._call, function)))
+
+	def release(self):
+		"""
+		Waits until after the release's own timestamp before acting on it,
+		so that an autorepeat press arriving with the same timestamp can cancel it.
+		"""
+		if self._pressed_at is None:
+			return
+		self._released_at = self._listener._event_timestamp()
+		if self._pending_release is not None:
+			self._pending_release.cancel()
+		self._pending_release = self._listener._timer_wheel().schedule(self._released_at + 1, self._on_pending_release)
+
+	def _on_pending_release(self):
+		self._pending_release = None
+		self._released(self._released_at)
+
+	def _released(self, now: int):
+		held = now - self._pressed_at
+		self._pressed_at = None
+		for timer in self._hold_timers:
+			timer.cancel()
+		self._hold_timers.clear()
+		for max_duration, function in self.taps:
+			if held < max_duration:
+				self._call(function)
+		for function in self.timed_releases:
+			self._call(partial(function, held))
+
+	def cancel(self):
+		""" Forgets any key that is held, and cancels its timers. """
+		for timer in self._hold_timers:
+			timer.cancel()
+		self._hold_timers.clear()
+		if self._pending_release is not None:
+			self._pending_release.cancel()
+			self._pending_release = None
+		self._pressed_at = None
+		self._last_press = None
+
+	def _call(self, function: Callable):
+		self._listener._call((self.keycode, self.modifiers, self._pressed_at is None), function)
+
+class TemporalBindings:
+	"""
+	Bindings that depend on how long a key is held, or how quickly it is pressed again.
+	Returned by Listener.temporal.
+
+	Each key's press and release are bound to the Listener as usual, so they are grabbed,
+	batched and profiled like any other binding. Timing comes from the events' own timestamps
+	where the backend provides them, and every timer lives on a single TimerWheel, advanced by
+	the Listener's own thread. No threads are created.
+	"""
+	def __init__(self, listener):
+		self._listener = listener
+		self._keys: Dict[Tuple[int, int], TemporalKey] = {}
+
+	def hold(self, function, keycode: int, modifiers: int=0, ms: int=500):
+		""" Calls function once the key has been held down for ms milliseconds, while it is still held. """
+		self._key(keycode, modifiers).holds.append((ms, function))
+
+	def tap(self, function, keycode: int, modifiers: int=0, max_ms: int=200):
+		""" Calls function when the key is released less than max_ms milliseconds after being pressed. """
+		self._key(keycode, modifiers).taps.append((max_ms, function))
+
+	def double_tap(self, function, keycode: int, modifiers: int=0, within_ms: int=300):
+		""" Calls function when the key is pressed again within within_ms milliseconds of the previous press. """
+		self._key(keycode, modifiers).double_taps.append((within_ms, function))
+
+	def timed_release(self, function, keycode: int, modifiers: int=0):
+		""" Calls function(held_ms) with how long the key was held, each time it is released. """
+		self._key(keycode, modifiers).timed_releases.append(function)
+
+	def unbind(self, keycode: int, modifiers: int=0):
+		""" Removes every temporal binding of a key. """
+		key = self._keys.pop((keycode, modifiers))
+		key.cancel()
+		with self._listener.batch():
+			self._listener.unbind(keycode, modifiers, False)
+			self._listener.unbind(keycode, modifiers, True)
+
+	def cancel(self):
+		""" Forgets every key that is held, and cancels their timers. """
+		for key in self._keys.values():
+			key.cancel()
+
+	def _key(self, keycode: int, modifiers: int) -> TemporalKey:
+		""" Returns the key's TemporalKey, binding its press and release if they are not bound to it yet. """
+		key = self._keys.get((keycode, modifiers))
+		functions = self._listener.keycode_function_map
+		if key is not None and functions.get((keycode, modifiers, False)) == key.press:
+			return key
+		if key is not None:
+			# Its bindings were removed from under us, e.g. by unbind_all(), and its temporal bindings with them.
+			key.cancel()
+		key = TemporalKey(self._listener, keycode, modifiers)
+		with self._listener.batch():
+			self._listener.bind(key.press, keycode, modifiers, False)
+			self._listener.bind(key.release, keycode, modifiers, True)
+		self._keys[keycode, modifiers] = key
+		return key
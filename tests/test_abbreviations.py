@@ -0,0 +1,80 @@
+import warnings
+from random import Random
+from time import perf_counter
+
+import pytest
+
+from keywatch.abbreviations import AbbreviationMatcher
+from keywatch.simulated import SimulatedListener
+
+def _typed(matcher: AbbreviationMatcher, text: str):
+	return [match[0] for match in map(matcher.feed, text) if match is not None]
+
+def test_overlapping_triggers():
+	matcher = AbbreviationMatcher(dict.fromkeys(['he', 'she', 'his'], print))
+	# The longest trigger ending at a character fires.
+	assert _typed(matcher, 'ushe') == ['she']
+	# Matching starts over after a trigger fires, so the 'he' of 'she he' does not fire twice.
+	assert _typed(matcher, 'rs he') == ['he']
+	assert _typed(matcher, 'xhis') == ['his']
+
+def test_shadowed_triggers_warn():
+	with pytest.warns(RuntimeWarning, match="'hers' by 'he'"):
+		AbbreviationMatcher(dict.fromkeys(['he', 'hers'], print))
+	matcher = AbbreviationMatcher(dict.fromkeys(['btw'], print), word_start=True)
+	with warnings.catch_warnings():
+		warnings.simplefilter('error')
+		# 'tw' is only typed inside a word of 'btw', so word_start keeps it from firing first.
+		matcher.add_trigger('tw', print)
+		with pytest.raises(RuntimeWarning):
+			matcher.add_trigger('b', print)
+
+def test_backspace():
+	matcher = AbbreviationMatcher(dict.fromkeys([';sig', ';addr'], print))
+	assert _typed(matcher, ';ss\b\bsx\big') == [';sig']
+	assert _typed(matcher, ';ad\x1bdr') == []
+
+def test_word_start():
+	matcher = AbbreviationMatcher(dict.fromkeys(['btw'], print), word_start=True)
+	assert _typed(matcher, 'abtw') == []
+	assert _typed(matcher, ' btw') == ['btw']
+
+def test_hot_reload_keeps_typed_text():
+	matcher = AbbreviationMatcher(dict.fromkeys(['abc'], print))
+	assert _typed(matcher, 'xy') == []
+	matcher.set_triggers(dict.fromkeys(['xyz'], print))
+	assert _typed(matcher, 'z') == ['xyz']
+
+def test_attach_to_listener():
+	listener = SimulatedListener()
+	listener.start(threaded=False)
+	calls = []
+	matcher = AbbreviationMatcher({'ab': lambda: calls.append('ab')})
+	chars = {1: 'a', 2: 'b', 3: '\b'}
+	matcher.attach(listener, lambda keycode, modifiers: chars.get(keycode, '' if keycode == 50 else None))
+	listener.run([(1, 0, False), (1, 0, True), (50, 0, False), (2, 0, False), (1, 0, False), (9, 0, False), (2, 0, False)])
+	assert calls == ['ab']
+	listener.stop()
+
+def benchmark(count=10000, length=200000):
+	""" Prints how many characters per second are matched against many triggers. """
+	rng = Random(0)
+	# Triggers of one length, so that none of them can shadow another.
+	alphabet = 'abcdefghijklmnopqrstuvwxyz'
+	triggers = {';' + ''.join(rng.choice(alphabet) for _ in range(3)): print for _ in range(count)}
+	matcher = AbbreviationMatcher(triggers)
+	text = ''.join(rng.choice(alphabet + ' ;') for _ in range(length))
+	start = perf_counter()
+	matches = sum(1 for char in text if matcher.feed(char) is not None)
+	elapsed = perf_counter() - start
+	print('{:,.0f} characters/sec against {:,} triggers, {} matches'.format(length / elapsed, len(triggers), matches))
+
+def main():
+	for name, test in sorted(globals().items()):
+		if name.startswith('test_'):
+			test()
+			print(name, 'passed')
+	benchmark()
+
+if __name__ == '__main__':
+	main()
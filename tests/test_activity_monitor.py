@@ -0,0 +1,24 @@
+from queue import Queue, Empty
+
+from keywatch import ActivityMonitor
+
+from utils import SafetyNet
+
+def main():
+	queue = Queue()
+	with SafetyNet(ActivityMonitor()) as monitor:
+		monitor.on_idle(lambda: queue.put('idle'), 2)
+		monitor.on_active(lambda: queue.put('active'), 2)
+		print('Please leave the keyboard and mouse alone for 2 seconds, then press any key.')
+		for expected in ('idle', 'active'):
+			try:
+				state = queue.get(timeout=10)
+			except Empty:
+				raise Exception('Did not notice the user becoming {} in time.'.format(expected))
+			if state != expected:
+				raise Exception('Expected to become {}, became {}.'.format(expected, state))
+			print('Became', state)
+	print('Success')
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,42 @@
+from threading import Event, Thread
+from time import perf_counter
+
+from keywatch import KeyGrab
+
+from utils import SafetyNet, keycode_names
+
+def bind_latencies(listener, count=200):
+	""" Returns how long each of count bind() and unbind() pairs took, in milliseconds, sorted. """
+	latencies = []
+	for _ in range(count):
+		start = perf_counter()
+		listener.bind(print, keycode_names['b'])
+		listener.unbind(keycode_names['b'])
+		latencies.append((perf_counter() - start) * 1000)
+	return sorted(latencies)
+
+def main():
+	with SafetyNet(KeyGrab()) as listener:
+		listener.bind(lambda: None, keycode_names['a'])
+		quiet = bind_latencies(listener)
+		# Keep our listener busy reading events while binding.
+		done = Event()
+		def type_a():
+			while not done.is_set():
+				listener.injector.tap(keycode_names['a'])
+				listener.injector.flush()
+		typist = Thread(target=type_a, daemon=True)
+		typist.start()
+		try:
+			busy = bind_latencies(listener)
+		finally:
+			done.set()
+			typist.join()
+	for name, latencies in (('idle', quiet), ('under event traffic', busy)):
+		print('bind+unbind {}: median {:.2f} ms, p99 {:.2f} ms'.format(name, latencies[len(latencies) // 2], latencies[int(len(latencies) * 0.99)]))
+	if busy[len(busy) // 2] > quiet[len(quiet) // 2] * 3 + 1:
+		raise Exception('Binding slowed down considerably while events were being read.')
+	print('Success')
+
+if __name__ == '__main__':
+	main()
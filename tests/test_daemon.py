@@ -0,0 +1,42 @@
+from queue import Queue
+from threading import Thread
+from time import sleep
+
+from keywatch.daemon import HotkeyDaemon, DaemonClient
+
+from general_tests import test_single_bind, test_unbind_rebind, test_expect_double_bind_error
+from utils import wait_for_input, keycode_names
+
+SOCKET_PATH = '/tmp/keywatch-test.sock'
+
+def test_shared_binding():
+	""" Two clients bind the same key. Both should be called for a single keypress. """
+	first, second = Queue(), Queue()
+	a, b = DaemonClient(SOCKET_PATH), DaemonClient(SOCKET_PATH)
+	a.start()
+	b.start()
+	a.bind(lambda: first.put(0), keycode_names['a'])
+	b.bind(lambda: second.put(0), keycode_names['a'])
+	success = wait_for_input(first, timeout=7) and wait_for_input(second, timeout=1)
+	a.stop()
+	b.stop()
+	if not success:
+		raise Exception('Both clients should have received the keypress.')
+
+def main():
+	daemon = HotkeyDaemon(SOCKET_PATH)
+	thread = Thread(target=daemon.serve_forever, daemon=True)
+	thread.start()
+	sleep(0.5)
+
+	queue = Queue()
+	test_unbind_rebind(DaemonClient(SOCKET_PATH), queue, 'b')
+	test_single_bind(DaemonClient(SOCKET_PATH), queue, 'a')
+	test_expect_double_bind_error(DaemonClient(SOCKET_PATH), queue, 'a')
+	test_shared_binding()
+
+	daemon.shutdown()
+	thread.join()
+
+if __name__ == '__main__':
+	main()
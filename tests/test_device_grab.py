@@ -0,0 +1,34 @@
+from queue import Queue, Empty
+
+from Xlib.display import Display
+
+from keywatch import DeviceGrab
+from keywatch.linux.x11.devices import list_devices
+
+from utils import SafetyNet, keycode_names
+
+def main():
+	devices = [device for device in list_devices(Display()) if device.is_slave and device.is_keyboard]
+	for index, device in enumerate(devices):
+		print(index, device)
+	device = devices[int(input('Which keyboard should be grabbed? '))]
+	queue = Queue()
+	with SafetyNet(DeviceGrab([device.id])) as listener:
+		listener.bind(lambda: queue.put(listener.source_device), keycode_names['a'])
+		print('Please press "a" on {}, and then "a" on any other keyboard.'.format(device.name))
+		try:
+			source = queue.get(timeout=10)
+		except Empty:
+			raise Exception('Did not receive "a" from {}.'.format(device.name))
+		if source != device.id:
+			raise Exception('The key press came from device {}, expected {}.'.format(source, device.id))
+		try:
+			source = queue.get(timeout=5)
+		except Empty:
+			pass
+		else:
+			raise Exception('Received a key press from device {}, which is not grabbed.'.format(source))
+	print('Success')
+
+if __name__ == '__main__':
+	main()
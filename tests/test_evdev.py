@@ -0,0 +1,113 @@
+"""
+Tests the evdev backend against virtual devices.
+Requires read/write access to /dev/uinput and /dev/input, but no X server or user input.
+"""
+
+import os
+from queue import Queue, Empty
+
+import pytest
+
+from keywatch.errors import AlreadyGrabbedError
+from keywatch.linux.evdev import KeyGrab, KeyboardGrab, MouseGrab
+from keywatch.linux.evdev import ecodes
+from keywatch.linux.evdev.uinput import VirtualDevice
+
+KEY_A = 30
+# X11 keycode of the 'a' key
+a = KEY_A + ecodes.X_KEYCODE_OFFSET
+shift = 1
+
+def _virtual_device(factory):
+	if not os.access('/dev/uinput', os.W_OK):
+		pytest.skip('Virtual devices need write access to /dev/uinput.')
+	with factory() as device:
+		yield device
+
+@pytest.fixture
+def keyboard():
+	yield from _virtual_device(VirtualDevice.keyboard)
+
+@pytest.fixture
+def mouse():
+	yield from _virtual_device(VirtualDevice.mouse)
+
+def expect(queue: Queue, value, timeout=2):
+	try:
+		result = queue.get(timeout=timeout)
+	except Empty:
+		raise Exception('Expected {!r}, received nothing.'.format(value))
+	if result != value:
+		raise Exception('Expected {!r}, received {!r}.'.format(value, result))
+
+def test_keyboard_grab(keyboard: VirtualDevice):
+	queue = Queue()
+	k = KeyboardGrab(devices=[keyboard.device_path])
+	k.start()
+	k.bind(lambda: queue.put('a'), a)
+	k.bind(lambda: queue.put('shift+a'), a, shift)
+	k.bind(lambda: queue.put('a released'), a, 0, True)
+	keyboard.tap(KEY_A)
+	expect(queue, 'a')
+	expect(queue, 'a released')
+	keyboard.key(ecodes.KEY_LEFTSHIFT, ecodes.KEY_DOWN)
+	keyboard.tap(KEY_A)
+	keyboard.key(ecodes.KEY_LEFTSHIFT, ecodes.KEY_UP)
+	expect(queue, 'shift+a')
+	k.stop()
+	print('KeyboardGrab success')
+
+def test_keygrab_forwarding(keyboard: VirtualDevice):
+	queue = Queue()
+	k = KeyGrab(devices=[keyboard.device_path])
+	k.start()
+	k.bind(lambda: queue.put('a'), a)
+	# Reads the forwarding keyboard, which should only see unbound keys.
+	observer = KeyboardGrab(devices=[k._forwarder.device_path])
+	observer.start()
+	observer.bind(lambda: queue.put('forwarded b'), 48 + ecodes.X_KEYCODE_OFFSET)
+	observer.bind(lambda: queue.put('forwarded a'), a)
+	keyboard.tap(KEY_A)
+	keyboard.tap(48) # KEY_B
+	expect(queue, 'a')
+	expect(queue, 'forwarded b')
+	observer.stop()
+	k.stop()
+	print('KeyGrab forwarding success')
+
+def test_grab_grabbed(keyboard: VirtualDevice):
+	k = KeyboardGrab(devices=[keyboard.device_path])
+	k.start()
+	try:
+		KeyboardGrab(devices=[keyboard.device_path]).start()
+	except AlreadyGrabbedError:
+		print('Success. Was not able to grab something that was grabbed.')
+	else:
+		raise Exception('Grabbed a device that was already grabbed.')
+	finally:
+		k.stop()
+
+def test_mouse(mouse: VirtualDevice):
+	queue = Queue()
+	m = MouseGrab(devices=[mouse.device_path])
+	m.set_movement_fn(lambda pos, delta: queue.put(delta))
+	m.start()
+	m.bind(lambda: queue.put('lmb'), 1)
+	mouse.move(5, -3)
+	expect(queue, (5, -3))
+	mouse.tap(ecodes.BTN_LEFT)
+	expect(queue, 'lmb')
+	m.stop()
+	print('MouseGrab success')
+
+def main():
+	with VirtualDevice.keyboard() as keyboard:
+		test_keyboard_grab(keyboard)
+		test_keyboard_grab(keyboard)
+		test_keygrab_forwarding(keyboard)
+		test_grab_grabbed(keyboard)
+	with VirtualDevice.mouse() as mouse:
+		test_mouse(mouse)
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,63 @@
+from tempfile import TemporaryDirectory
+
+from keywatch.event_log import EventLog, KEYUP
+from keywatch.simulated import SimulatedListener
+
+def test_range_queries_span_segments():
+	with TemporaryDirectory() as directory:
+		log = EventLog(directory, segment_records=100, index_interval=8)
+		for i in range(1000):
+			log.append(i * 10, keycode=i % 256)
+		assert len(log) == 1000
+		views = log.range(995, 2505)
+		assert [len(view) for view in views] == [100, 51]
+		assert [record.timestamp for view in views for record in view] == list(range(1000, 2501, 10))
+		for view in views:
+			view.release()
+		assert [record.keycode for record in log.events(0, 30)] == [0, 1, 2]
+		assert list(log.events(10000, 20000)) == []
+		log.close()
+
+def test_stopping_early_releases_views():
+	with TemporaryDirectory() as directory:
+		log = EventLog(directory, segment_records=100)
+		for i in range(300):
+			log.append(i)
+		events = log.events(0, 300)
+		assert next(events).timestamp == 0
+		events.close()
+		log.close()
+
+def test_reopened_log_keeps_appending():
+	with TemporaryDirectory() as directory:
+		log = EventLog(directory, segment_records=64)
+		for i in range(100):
+			log.append(i)
+		log.close()
+		log = EventLog(directory, segment_records=64)
+		# Older timestamps are recorded as the latest one, so that queries can bisect.
+		log.append(50, keycode=7)
+		assert len(log) == 101
+		assert [tuple(record) for record in log.events(99, 100)] == [(99, 0, 0, 0, 0, 0), (99, 7, 0, 0, 0, 0)]
+		log.close()
+
+def test_attach_records_a_listener():
+	with TemporaryDirectory() as directory:
+		log = EventLog(directory)
+		listener = SimulatedListener()
+		listener.start(threaded=False)
+		log.attach(listener)
+		listener.run([(38, 4, False, 1000), (38, 4, True, 1250)])
+		records = list(log.events(0, 1 << 62))
+		assert [(r.keycode, r.modifiers, r.flags) for r in records] == [(38, 4, 0), (38, 4, KEYUP)]
+		listener.stop()
+		log.close()
+
+def main():
+	for name, test in sorted(globals().items()):
+		if name.startswith('test_'):
+			test()
+			print(name, 'passed')
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,44 @@
+"""
+Tests which X events each listener selects, without an X server.
+"""
+
+from Xlib import X
+
+from keywatch.bindings import BindingTable
+from keywatch.linux.x11.mouse_grab import MouseGrab
+
+def _mouse(bindings=(), on_movement=None) -> MouseGrab:
+	""" A MouseGrab that was never connected, holding the given (keycode, modifiers, call_after_release) bindings. """
+	mouse = MouseGrab.__new__(MouseGrab)
+	mouse._on_movement = on_movement
+	mouse._bindings = BindingTable()
+	with mouse._bindings.edit() as functions:
+		functions.update({info: print for info in bindings})
+	return mouse
+
+def test_pointer_grab_selects_only_what_is_used():
+	assert _mouse()._pointer_event_mask() == X.NoEventMask
+	assert _mouse(on_movement=print)._pointer_event_mask() == X.PointerMotionMask
+	assert _mouse([(1, 0, False)])._pointer_event_mask() == X.ButtonPressMask
+	assert _mouse([(1, 0, True), (3, 0, True)])._pointer_event_mask() == X.ButtonReleaseMask
+
+def test_button_grabs_ask_for_releases_only_when_bound():
+	mouse = _mouse([(1, 0, False), (3, 0, False), (3, 0, True)])
+	assert mouse._button_event_mask(1, 0) == X.NoEventMask
+	assert mouse._button_event_mask(1, 0, call_after_release=True) == X.ButtonReleaseMask
+	assert mouse._button_event_mask(3, 0) == X.ButtonReleaseMask
+
+def test_binding_a_release_replaces_the_button_grab():
+	mouse = _mouse()
+	press = {(1, 0, False): print}
+	both = {(1, 0, False): print, (1, 0, True): print}
+	assert set(mouse._grab_ids(press)) == {(1, 0, False)}
+	# Both bindings share one grab, which asks for releases.
+	assert set(mouse._grab_ids(both)) == {(1, 0, True)}
+
+def test_root_window_needs_nothing_without_focus_tracking():
+	mouse = _mouse()
+	mouse._focus = None
+	assert mouse._root_event_mask() == X.NoEventMask
+	mouse._focus = object()
+	assert mouse._root_event_mask() == X.PropertyChangeMask
@@ -0,0 +1,159 @@
+"""
+Tests focus-driven profile switching with a fake display, so no X server or user input is needed.
+"""
+
+import warnings
+
+from Xlib import X, Xatom, error
+
+from keywatch.simulated import SimulatedListener
+from keywatch.linux.x11.xlistener import XListener
+from keywatch.linux.x11.focus import FocusTracker, WindowScope
+
+class _Property:
+	def __init__(self, value):
+		self.value = value
+
+class _Window:
+	def __init__(self, window_id, wm_class=None, wm_name=None):
+		self.id = window_id
+		self.wm_class = wm_class
+		self.wm_name = wm_name
+		self.active = None
+		self.event_mask = X.NoEventMask
+
+	def get_full_property(self, atom, property_type):
+		if self.active is not None:
+			return _Property([self.active])
+		if self.wm_name is not None:
+			return _Property(self.wm_name.encode())
+		return None
+
+	def get_wm_class(self):
+		return self.wm_class
+
+	def get_wm_name(self):
+		return self.wm_name
+
+	def change_attributes(self, event_mask, onerror=None):
+		self.event_mask = event_mask
+
+class _Display:
+	def __init__(self, windows):
+		self.root = _Window(1)
+		self.windows = {window.id: window for window in windows}
+		self._atoms = {}
+
+	def screen(self):
+		return self
+
+	def intern_atom(self, name):
+		return self._atoms.setdefault(name, 1000 + len(self._atoms))
+
+	def create_resource_object(self, kind, window_id):
+		return self.windows[window_id]
+
+class _FocusListener(SimulatedListener):
+	""" A SimulatedListener that switches profiles as the fake display's focus changes, the way XListener does. """
+	_apply_focus = XListener._apply_focus
+	_on_property_notify = XListener._on_property_notify
+
+	def __init__(self, display):
+		super().__init__()
+		self._root = display.root
+		self._focus = FocusTracker(display)
+
+	def focus(self, window_id):
+		self._root.active = window_id
+		self._on_property_notify(_Event(self._root, self._focus.net_active_window))
+
+class _Event:
+	def __init__(self, window, atom):
+		self.window = window
+		self.atom = atom
+
+def _listener():
+	editor = _Window(10, ('emacs', 'Emacs'), 'notes.txt - Emacs')
+	browser = _Window(11, ('navigator', 'Firefox'), 'Some page')
+	terminal = _Window(12, ('xterm', 'XTerm'), 'shell')
+	display = _Display([editor, browser, terminal])
+	listener = _FocusListener(display)
+	listener.start(threaded=False)
+	listener.profile('editor').bind(print, 1)
+	listener.profile('browser').bind(print, 2)
+	listener.profile('default').bind(print, 3)
+	listener._focus.add_scope(WindowScope('editor', 'Emacs', None))
+	listener._focus.add_scope(WindowScope('browser', None, 'page'))
+	listener._focus.set_default_profile('default')
+	return listener, display
+
+def test_scopes_match_class_or_title():
+	listener, display = _listener()
+	listener.focus(10)
+	assert listener.active_profile == 'editor'
+	listener.focus(11)
+	assert listener.active_profile == 'browser'
+	listener.focus(12)
+	assert listener.active_profile == 'default'
+	listener.focus(0)
+	assert listener.active_profile == 'default'
+	listener.stop()
+
+def test_focus_changes_only_regrab_differences():
+	listener, display = _listener()
+	listener.focus(10)
+	listener.calls.clear()
+	listener.focus(11)
+	assert sorted(listener.calls) == [('grab', 2, 0, False), ('ungrab', 1, 0, False)]
+	listener.stop()
+
+def test_only_the_focused_window_is_watched():
+	listener, display = _listener()
+	listener.focus(10)
+	listener.focus(11)
+	assert display.windows[10].event_mask == X.NoEventMask
+	assert display.windows[11].event_mask == X.PropertyChangeMask
+	listener.stop()
+
+def test_retitled_windows_are_identified_again():
+	listener, display = _listener()
+	listener.focus(12)
+	display.windows[12].wm_name = 'man page'
+	# Only the focused window's identifying properties are looked at.
+	listener._on_property_notify(_Event(display.windows[11], Xatom.WM_NAME))
+	assert listener.active_profile == 'default'
+	listener._on_property_notify(_Event(display.windows[12], Xatom.WM_NAME))
+	assert listener.active_profile == 'browser'
+	listener.stop()
+
+def test_removed_profiles_stop_matching():
+	listener, display = _listener()
+	listener.focus(10)
+	listener._focus.remove_profile('editor')
+	listener._apply_focus()
+	assert listener.active_profile == 'default'
+	listener.stop()
+
+def test_failed_switches_warn_and_keep_the_profile():
+	listener, display = _listener()
+	listener.focus(10)
+	listener.refused.add((2, 0))
+	with warnings.catch_warnings(record=True) as caught:
+		warnings.simplefilter('always')
+		listener.focus(11)
+	assert listener.active_profile == 'editor'
+	assert [warning.category for warning in caught] == [RuntimeWarning]
+	listener.stop()
+
+def test_x_errors_while_switching_warn():
+	listener, display = _listener()
+	listener.focus(10)
+	def fail(*args):
+		raise error.BadValue(display, bytes(32))
+	listener._grab = fail
+	with warnings.catch_warnings(record=True) as caught:
+		warnings.simplefilter('always')
+		listener.focus(11)
+	assert listener.active_profile == 'editor'
+	assert [warning.category for warning in caught] == [RuntimeWarning]
+	listener.stop()
@@ -0,0 +1,42 @@
+from keywatch.gestures import GestureRecognizer
+
+def _draw(recognizer: GestureRecognizer, points):
+	""" Presses the button at the first point, moves through the rest in small steps, then releases. """
+	recognizer.on_movement(points[0], (0, 0))
+	recognizer.press()
+	x, y = points[0]
+	for target in points[1:]:
+		while (x, y) != target:
+			dx = max(-3, min(3, target[0] - x))
+			dy = max(-3, min(3, target[1] - y))
+			x, y = x + dx, y + dy
+			recognizer.on_movement((x, y), (dx, dy))
+	recognizer.release()
+
+def test_strokes():
+	recognizer = GestureRecognizer(flick_speed=float('inf'))
+	calls = []
+	recognizer.bind_stroke(lambda: calls.append('L'), ['down', 'right'])
+	recognizer.bind_stroke(lambda: calls.append('back'), ['left'])
+	recognizer.bind_stroke(lambda: calls.append('zigzag'), ['right', 'down-left', 'right'])
+	_draw(recognizer, [(100, 100), (100, 200), (200, 200)])
+	_draw(recognizer, [(300, 100), (150, 104)])
+	_draw(recognizer, [(0, 0), (100, 0), (0, 100), (100, 100)])
+	assert calls == ['L', 'back', 'zigzag']
+
+def test_drag_when_no_stroke_matches():
+	recognizer = GestureRecognizer(flick_speed=float('inf'))
+	calls = []
+	recognizer.bind_stroke(lambda: calls.append('L'), ['down', 'right'])
+	recognizer.bind_drag(lambda start, end: calls.append((start, end)))
+	_draw(recognizer, [(0, 0), (0, -90)])
+	_draw(recognizer, [(0, 0), (2, 2)])
+	assert calls == [((0, 0), (0, -90))]
+
+def main():
+	test_strokes()
+	test_drag_when_no_stroke_matches()
+	print('Success')
+
+if __name__ == '__main__':
+	main()
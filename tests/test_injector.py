@@ -0,0 +1,26 @@
+from queue import Queue
+
+from keywatch import KeyGrab, Injector
+
+from utils import keycode_names, SafetyNet
+
+def test_type(queue: Queue):
+	""" Typed text reaches a grab on its keys, in a single flush. """
+	with SafetyNet(KeyGrab()) as k:
+		k.bind(lambda: queue.put('a'), keycode_names['a'])
+		k.bind(lambda: queue.put('b'), keycode_names['b'])
+		injector = Injector(k._display, k.keymap)
+		injector.type('abba')
+		received = ''.join(queue.get(timeout=2) for _ in range(4))
+		if received != 'abba':
+			raise Exception('Injected "abba", received {!r}.'.format(received))
+		stats = injector.stats()
+		if stats.events != 8 or stats.flushes != 1:
+			raise Exception('Expected 8 events in one flush, got {}.'.format(stats))
+		print('Success', stats)
+
+def main():
+	test_type(Queue())
+
+if __name__ == '__main__':
+	main()
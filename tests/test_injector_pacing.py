@@ -0,0 +1,39 @@
+from time import monotonic, sleep
+
+from keywatch.linux.x11 import injector as injector_module
+from keywatch.linux.x11.injector import Injector
+
+class RecordingDisplay:
+	""" Stands in for an X connection, recording when each fake event is queued. """
+	def __init__(self):
+		self.sent = []
+
+	def has_extension(self, name):
+		return True
+
+	def screen(self):
+		return self
+
+	@property
+	def root(self):
+		return None
+
+	def flush(self):
+		pass
+
+def test_rate_limit_survives_idle_time(monkeypatch):
+	display = RecordingDisplay()
+	monkeypatch.setattr(injector_module, 'fake_input', lambda display, *args, **kwargs: display.sent.append(monotonic()))
+	injector = Injector(display, rate_limit=100)
+	injector.click(1)
+	sleep(0.2)
+	# 0.2 seconds at 100 events per second must not turn into a burst of 20 events.
+	start = monotonic()
+	for _ in range(5):
+		injector.click(1)
+	assert monotonic() - start >= 9 * 0.01 * 0.9
+	gaps = [later - earlier for earlier, later in zip(display.sent[2:], display.sent[3:])]
+	assert min(gaps) >= 0.01 * 0.9
+	stats = injector.stats()
+	# Throughput only counts time spent injecting, not the idle time between calls.
+	assert stats.events == 12 and stats.seconds < 0.2 and stats.events_per_second > 50
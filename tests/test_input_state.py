@@ -0,0 +1,31 @@
+from keywatch.input_state import InputState
+
+def test_seed_and_update():
+	state = InputState()
+	keymap = bytearray(32)
+	keymap[38 >> 3] |= 1 << (38 & 7)
+	state.seed(keymap, [1, 3], (10, 20))
+	assert state.is_pressed(38) and not state.is_pressed(39)
+	assert state.pressed_buttons() == (1, 3) and state.pos == (10, 20)
+	state.set_key(255, True)
+	state.set_key(38, False)
+	state.set_button(1, False)
+	assert state.pressed_keys() == (255,)
+	assert state.pressed_buttons() == (3,)
+
+def test_keycodes_past_255_are_ignored():
+	state = InputState()
+	# evdev's KEY_MICMUTE, 248, is reported as keycode 256.
+	state.set_key(256, True)
+	state.set_key(263, False)
+	state.set_button(300, True)
+	assert not state.is_pressed(256) and not state.is_button_pressed(300)
+	assert state.pressed_keys() == () and state.pressed_buttons() == ()
+
+def main():
+	test_seed_and_update()
+	test_keycodes_past_255_are_ignored()
+	print('Success')
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,37 @@
+from types import SimpleNamespace
+
+from Xlib import X, XK
+
+from keywatch.linux.x11.keymap import Keymap
+
+# keycode -> G1L1 G1L2 G2L1 G2L2
+MAPPING = {
+	10: (XK.XK_a, XK.XK_A, 0x1000444, 0x1000424), # Cyrillic ef in the second group.
+	11: (XK.XK_b, XK.XK_B, X.NoSymbol, X.NoSymbol),
+}
+
+class MappingDisplay:
+	""" Answers the requests Keymap makes with a fixed keyboard mapping. """
+	def __init__(self):
+		self.display = SimpleNamespace(info=SimpleNamespace(min_keycode=8, max_keycode=12))
+
+	def get_keyboard_mapping(self, first_keycode, count):
+		return [MAPPING.get(keycode, (X.NoSymbol,) * 4) for keycode in range(first_keycode, first_keycode + count)]
+
+	def get_modifier_mapping(self):
+		return [[] for _ in range(8)]
+
+	def keysym_to_keycodes(self, keysym):
+		return iter(())
+
+def test_groups():
+	keymap = Keymap(MappingDisplay())
+	assert keymap.translate(10, 0) == 'a'
+	assert keymap.translate(10, X.ShiftMask) == 'A'
+	assert keymap.translate(10, 0x2000) == 'ф'
+	# Groups 3 and 4 are not in the core mapping, and are looked up as the second group.
+	assert keymap.translate(10, 0x4000) == 'ф'
+	assert keymap.translate(10, 0x6000 | X.ShiftMask) == 'Ф'
+	# Keys without a second group fall back to the first.
+	assert keymap.translate(11, 0x4000) == 'b'
+	assert keymap.keysym(11, 0x6000) == XK.XK_b
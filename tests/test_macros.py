@@ -0,0 +1,32 @@
+from queue import Queue
+from time import monotonic
+
+from keywatch import KeyGrab
+from keywatch.macros import Macro, Tap, Delay
+
+from utils import keycode_names, SafetyNet
+
+def test_delays(queue: Queue):
+	""" A macro's steps arrive in order, spaced out by its delays. """
+	with SafetyNet(KeyGrab()) as k:
+		k.bind(lambda: queue.put(monotonic()), keycode_names['b'])
+		run = k.run_macro(Macro(Tap(keycode_names['b']), Delay(0.3), Tap(keycode_names['b'])))
+		first, second = queue.get(timeout=2), queue.get(timeout=2)
+		if not run.wait(1) or second - first < 0.25:
+			raise Exception('Macro steps were not delayed. {:.3f}s apart.'.format(second - first))
+
+def test_stop_cancels(queue: Queue):
+	""" Stopping a Listener cancels the macros it started. """
+	with SafetyNet(KeyGrab()) as k:
+		run = k.run_macro(Macro(Delay(5), Tap(keycode_names['b'])))
+	if not run.wait(1) or not run.cancelled:
+		raise Exception('Macro kept running after its Listener stopped.')
+
+def main():
+	queue = Queue()
+	test_delays(queue)
+	test_stop_cancels(queue)
+	print('Success')
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,29 @@
+from queue import Queue
+
+from keywatch import KeyGrab
+
+from utils import wait_for_input, keycode_names, SafetyNet
+
+def test_switch_profiles(listener, queue: Queue):
+	with SafetyNet(listener) as k:
+		k.profile('first').bind(lambda: queue.put(0), keycode_names['a'])
+		k.profile('second').bind(lambda: queue.put(0), keycode_names['b'])
+
+		k.activate('first')
+		print('Profile "first" is active. Bound a.')
+		if not wait_for_input(queue, timeout=7):
+			raise Exception('User could or did not press the required input in time. (First profile)')
+
+		k.activate('second')
+		print('Profile "second" is active. Bound b, a is no longer bound.')
+		if not wait_for_input(queue, timeout=7):
+			raise Exception('User could or did not press the required input in time. (Second profile)')
+		if k.keycode_function_map.get((keycode_names['a'], 0, False)):
+			raise Exception('Binding from the first profile is still active.')
+
+def main():
+	queue = Queue()
+	test_switch_profiles(KeyGrab(), queue)
+
+if __name__ == '__main__':
+	main()
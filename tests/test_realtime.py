@@ -0,0 +1,62 @@
+import os
+from threading import Thread
+from time import perf_counter, sleep
+
+from keywatch.realtime import LatencyStats, RealtimeMode
+
+def test_percentiles():
+	stats = LatencyStats()
+	for ms in range(1, 101):
+		stats.record(ms)
+	assert stats.count == 100
+	assert abs(stats.percentile(50) - 50) < 0.2
+	assert abs(stats.percentile(99) - 99) < 0.2
+	assert stats.max_ms == 100
+	stats.reset()
+	assert stats.count == 0 and stats.percentile(99) == 0
+
+def test_wait_spins_then_blocks():
+	mode = RealtimeMode(spin=0.001)
+	read, write = os.pipe()
+	try:
+		start = perf_counter()
+		assert mode.wait([read], 0.05) == []
+		assert perf_counter() - start >= 0.04
+		Thread(target=lambda: (sleep(0.01), os.write(write, b'\0'))).start()
+		assert mode.wait([read], None) == [read]
+	finally:
+		os.close(read)
+		os.close(write)
+
+def wakeup_latency(mode: RealtimeMode, count=1000):
+	""" Measures how long a thread waiting in mode.wait() takes to notice a pipe becoming readable. """
+	read, write = os.pipe()
+	stats = LatencyStats()
+	def waiter():
+		mode.elevate()
+		for _ in range(count):
+			mode.wait([read], None)
+			stats.record((perf_counter() - sent[0]) * 1000)
+			os.read(read, 64)
+	sent = [0.0]
+	thread = Thread(target=waiter)
+	thread.start()
+	for _ in range(count):
+		sleep(0.001)
+		sent[0] = perf_counter()
+		os.write(write, b'\0')
+	thread.join()
+	os.close(read)
+	os.close(write)
+	return stats
+
+def main():
+	for name, test in sorted(globals().items()):
+		if name.startswith('test_'):
+			test()
+			print(name, 'passed')
+	print('blocking:       ', wakeup_latency(RealtimeMode(spin=0)).report())
+	print('spin and block: ', wakeup_latency(RealtimeMode(spin=0.002)).report())
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,21 @@
+from queue import Queue
+
+from keywatch import KeyboardMonitor, KeyGrab
+
+from utils import wait_for_input, keycode_names, SafetyNet
+
+def test_passive(queue: Queue):
+	""" A monitor sees keys without taking them away from a KeyGrab bound to the same key. """
+	with SafetyNet(KeyboardMonitor()) as monitor, SafetyNet(KeyGrab()) as grab:
+		monitor.bind(lambda: queue.put(0), keycode_names['a'])
+		grab.bind(lambda: queue.put(1), keycode_names['a'])
+		if not wait_for_input(queue):
+			raise Exception('User could or did not press the required input in time.')
+		queue.get(timeout=1)
+
+def main():
+	queue = Queue()
+	test_passive(queue)
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,30 @@
+from keywatch import KeyGrab
+
+from utils import keycode_names
+
+def main():
+	listener = KeyGrab()
+	accounting = listener.enable_request_accounting()
+	listener.start()
+	listener.bind(print, keycode_names['a'])
+	with listener.batch():
+		listener.bind(print, keycode_names['b'])
+		listener.bind(print, keycode_names['b'], 1)
+	listener.unbind(keycode_names['a'])
+	listener.stop()
+	stats = listener.request_stats()
+	print(accounting.report())
+	for operation in ('start', 'bind', 'unbind', 'stop'):
+		if operation not in stats:
+			raise Exception('No requests were counted for {}().'.format(operation))
+	if stats['bind'].calls != 3:
+		raise Exception('Expected 3 bind() calls, counted {}.'.format(stats['bind'].calls))
+	if stats['bind'].round_trips < 1:
+		raise Exception('bind() made no round trips, although grabbing syncs.')
+	listener.disable_request_accounting()
+	if listener.request_stats():
+		raise Exception('Requests are still being counted after disabling accounting.')
+	print('Success')
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,384 @@
+from time import perf_counter, sleep
+from threading import Thread
+
+from keywatch.simulated import SimulatedListener
+from keywatch.subscriptions import EventFilter
+from keywatch.errors import AlreadyGrabbedError
+
+def _started(threaded=False) -> SimulatedListener:
+	listener = SimulatedListener()
+	listener.start(threaded=threaded)
+	return listener
+
+def test_dispatch():
+	listener = _started()
+	calls = []
+	listener.bind(lambda: calls.append('a'), 1)
+	listener.bind(lambda: calls.append('a up'), 1, 0, True)
+	listener.bind(lambda: calls.append('shift b'), 2, 1)
+	listener.run([(1, 0, False), (2, 0, False), (2, 1, False), (1, 0, True)])
+	assert calls == ['a', 'shift b', 'a up']
+	listener.stop()
+
+def test_threaded_dispatch():
+	listener = _started(threaded=True)
+	calls = []
+	listener.bind(lambda: calls.append(1), 1)
+	listener.feed([(1, 0, False)] * 100)
+	assert listener.drain(timeout=2)
+	assert len(calls) == 100
+	listener.stop()
+
+def test_grabs_are_recorded():
+	listener = _started()
+	listener.bind(print, 1)
+	listener.unbind(1)
+	assert listener.calls == [('grab', 1, 0, False), ('ungrab', 1, 0, False)]
+	listener.stop()
+
+def test_batches_publish_one_snapshot():
+	listener = _started()
+	listener.bind(print, 1)
+	before = listener.bindings
+	seen = []
+	with listener.batch():
+		listener.bind(print, 2)
+		listener.unbind(1)
+		# Our thread sees its own edits. Any other thread still sees the previous snapshot.
+		assert set(listener.keycode_function_map) == {(2, 0, False)}
+		other = Thread(target=lambda: seen.append(set(listener.keycode_function_map)))
+		other.start()
+		other.join()
+		assert listener.bindings is before
+	assert seen == [{(1, 0, False)}]
+	assert listener.bindings.version == before.version + 1
+	assert set(listener.bindings.functions) == {(2, 0, False)}
+	# Snapshots cannot be modified, and are not affected by later edits.
+	try:
+		before.functions[3, 0, False] = print
+	except TypeError:
+		pass
+	else:
+		raise AssertionError('A binding snapshot was modified.')
+	assert set(before.functions) == {(1, 0, False)}
+	listener.stop()
+
+def test_failed_grab_in_a_batch_keeps_earlier_bindings():
+	listener = _started()
+	listener.refused.add((3, 0))
+	try:
+		with listener.batch():
+			listener.bind(print, 2)
+			listener.bind(print, 3)
+	except AlreadyGrabbedError:
+		pass
+	else:
+		raise AssertionError('Binding a refused grab succeeded.')
+	# The grab that did succeed stays bound, so that it can be unbound.
+	assert set(listener.bindings.functions) == {(2, 0, False)}
+	listener.unbind(2)
+	assert listener.calls == [('grab', 2, 0, False), ('ungrab', 2, 0, False)]
+	listener.stop()
+
+def test_callbacks_can_rebind():
+	listener = _started()
+	calls = []
+	def swap():
+		calls.append(1)
+		with listener.batch():
+			listener.unbind(1)
+			listener.bind(lambda: calls.append(2), 2)
+	listener.bind(swap, 1)
+	listener.run([(1, 0, False), (1, 0, False), (2, 0, False)])
+	assert calls == [1, 2]
+	listener.stop()
+
+def test_callback_profiling():
+	listener = _started()
+	slow = []
+	profiler = listener.enable_profiling(slow_threshold=0.01, on_slow=lambda binding, function, seconds: slow.append(binding))
+	listener.bind(lambda: None, 1)
+	listener.bind(lambda: sleep(0.02), 2)
+	listener.run([(1, 0, False), (1, 0, False), (2, 0, False), (3, 0, False)])
+	stats = listener.profile_stats()
+	assert set(stats) == {(1, 0, False), (2, 0, False)}
+	assert stats[1, 0, False].calls == 2 and stats[1, 0, False].slow_calls == 0
+	assert stats[2, 0, False].slow_calls == 1 and stats[2, 0, False].max_time >= 0.02
+	assert slow == [(2, 0, False)] and list(profiler.slow_bindings()) == [(2, 0, False)]
+	# Rebinding starts the binding's statistics over.
+	listener.unbind(1)
+	listener.bind(lambda: None, 1)
+	listener.run([(1, 0, False)])
+	assert listener.profile_stats()[1, 0, False].calls == 1
+	listener.disable_profiling()
+	assert listener.profile_stats() == {}
+	listener.stop()
+
+def test_profile_switch_only_regrabs_differences():
+	listener = _started()
+	listener.profile('first').bind(print, 1)
+	listener.profile('first').bind(print, 2)
+	listener.profile('second').bind(print, 2)
+	listener.profile('second').bind(print, 3)
+	listener.activate('first')
+	listener.calls.clear()
+	listener.activate('second')
+	assert sorted(listener.calls) == [('grab', 3, 0, False), ('ungrab', 1, 0, False)]
+	listener.stop()
+
+def test_failed_activation_keeps_previous_profile():
+	listener = _started()
+	listener.profile('first').bind(print, 1)
+	listener.profile('second').bind(print, 2)
+	listener.activate('first')
+	listener.refused.add((2, 0))
+	try:
+		listener.activate('second')
+	except AlreadyGrabbedError:
+		pass
+	else:
+		raise AssertionError('Activating a profile with a refused grab succeeded.')
+	assert listener.active_profile == 'first'
+	assert set(listener.keycode_function_map) == {(1, 0, False)}
+	listener.stop()
+
+def test_profiles_keep_plain_bindings():
+	listener = _started()
+	calls = []
+	listener.bind(lambda: calls.append('plain'), 1)
+	listener.profile('first').bind(lambda: calls.append('first'), 2)
+	listener.activate('first')
+	version = listener.bindings.version
+	listener.run([(1, 0, False), (2, 0, False)])
+	listener.activate(None)
+	listener.run([(1, 0, False), (2, 0, False)])
+	assert calls == ['plain', 'first', 'plain']
+	assert listener.active_profile is None and listener.bindings.version == version + 1
+	# Editing a profile does not change our bindings until it is activated again.
+	listener.profile('first').bind(print, 3)
+	assert set(listener.keycode_function_map) == {(1, 0, False)}
+	listener.stop()
+
+def test_profiles_cannot_overlap_plain_bindings():
+	listener = _started()
+	listener.bind(print, 1)
+	listener.profile('first').bind(print, 1)
+	listener.calls.clear()
+	try:
+		listener.activate('first')
+	except KeyError:
+		pass
+	else:
+		raise AssertionError('Activated a profile that rebinds a bound key combination.')
+	assert listener.active_profile is None and listener.calls == []
+	listener.stop()
+
+def test_unbind_all_deactivates_the_profile():
+	listener = _started()
+	listener.bind(print, 1)
+	listener.profile('first').bind(print, 2)
+	listener.activate('first')
+	listener.unbind_all()
+	assert listener.active_profile is None and dict(listener.keycode_function_map) == {}
+	assert sorted(listener.calls[-2:]) == [('ungrab', 1, 0, False), ('ungrab', 2, 0, False)]
+	listener.stop()
+
+def test_pause_and_resume():
+	listener = _started()
+	calls = []
+	listener.bind(lambda: calls.append(1), 1)
+	listener.pause()
+	listener.run([(1, 0, False)])
+	assert calls == [] and listener.calls[-1] == ('ungrab', 1, 0, False)
+	listener.resume()
+	listener.run([(1, 0, False)])
+	assert calls == [1] and listener.calls[-1] == ('grab', 1, 0, False)
+	listener.stop()
+
+def test_pause_can_keep_grabs():
+	listener = _started()
+	calls = []
+	listener.bind(lambda: calls.append(1), 1)
+	listener.pause(release_grabs=False)
+	listener.run([(1, 0, False)])
+	listener.resume()
+	listener.run([(1, 0, False)])
+	assert calls == [1] and listener.calls == [('grab', 1, 0, False)]
+	listener.stop()
+
+def test_binding_while_paused_grabs_on_resume():
+	listener = _started()
+	calls = []
+	listener.bind(print, 1)
+	listener.pause()
+	listener.calls.clear()
+	listener.bind(lambda: calls.append(2), 2)
+	listener.unbind(1)
+	assert listener.calls == []
+	listener.resume()
+	listener.run([(2, 0, False)])
+	assert calls == [2] and listener.calls == [('grab', 2, 0, False)]
+	listener.stop()
+
+def test_failed_resume_stays_paused():
+	listener = _started()
+	listener.bind(print, 1)
+	listener.bind(print, 2)
+	listener.pause()
+	listener.refused.add((2, 0))
+	listener.calls.clear()
+	try:
+		listener.resume()
+	except AlreadyGrabbedError:
+		pass
+	else:
+		raise AssertionError('Resuming with a refused grab succeeded.')
+	# Whatever was grabbed before the failure is released again.
+	assert listener.paused and listener.calls == [('grab', 1, 0, False), ('ungrab', 1, 0, False)]
+	listener.refused.clear()
+	listener.resume()
+	assert not listener.paused
+	listener.stop()
+
+def test_pause_cancels_pending_holds():
+	listener = _started()
+	calls = []
+	listener.temporal.hold(lambda: calls.append('hold'), 1, ms=500)
+	listener.run([(1, 0, False, 1000)])
+	listener.pause()
+	listener.advance(1000)
+	listener.run([])
+	assert calls == []
+	listener.resume()
+	listener.advance(1000)
+	listener.run([(1, 0, True, 3100)])
+	assert calls == []
+	# Holds work as usual after resuming.
+	listener.run([(1, 0, False, 4000)])
+	listener.advance(600)
+	listener.run([])
+	assert calls == ['hold']
+	listener.stop()
+
+def test_timers_work_after_pausing_with_none_pending():
+	listener = _started()
+	calls = []
+	listener.pause()
+	listener.resume()
+	listener.temporal.hold(lambda: calls.append('hold'), 1, ms=500)
+	listener.temporal.tap(lambda: calls.append('tap'), 2, max_ms=200)
+	listener.run([(2, 0, False, 1000), (2, 0, True, 1050)])
+	listener.advance(10)
+	listener.run([(2, 0, False, 1100), (2, 0, True, 1150), (1, 0, False, 1200)])
+	listener.pause()
+	listener.resume()
+	listener.advance(600)
+	listener.run([(1, 0, False, 2000)])
+	listener.advance(600)
+	listener.run([])
+	# The hold pressed before the second pause is cancelled by it. The one pressed after it fires.
+	assert calls == ['tap', 'tap', 'hold']
+	listener.stop()
+
+def test_subscriptions():
+	listener = _started()
+	events = []
+	listener.subscribe(events.append, EventFilter(keycodes=[5], is_keyup=False))
+	listener.run([(5, 0, False), (5, 0, True), (6, 0, False)])
+	assert [tuple(event) for event in events] == [(5, 0, False)]
+	listener.stop()
+
+def test_subscription_filters():
+	listener = _started()
+	everything, shifted, releases = [], [], []
+	listener.subscribe(everything.append)
+	# Only Shift (1) is compared. Lock (2) may be on or off.
+	listener.subscribe(shifted.append, EventFilter(modifiers=1, modifier_mask=1 | 4))
+	listener.subscribe(releases.append, EventFilter(keycodes=[5, 6], is_keyup=True))
+	events = [(5, 0, False), (5, 1, False), (5, 3, False), (5, 5, False), (6, 0, True), (7, 1, True)]
+	listener.run(events)
+	assert [tuple(event) for event in everything] == events
+	assert [tuple(event) for event in shifted] == [(5, 1, False), (5, 3, False), (7, 1, True)]
+	assert [tuple(event) for event in releases] == [(6, 0, True)]
+	listener.stop()
+
+def test_exact_modifiers_by_default():
+	listener = _started()
+	events = []
+	listener.subscribe(events.append, EventFilter(modifiers=0))
+	listener.run([(5, 0, False), (5, 1, False)])
+	assert [tuple(event) for event in events] == [(5, 0, False)]
+	listener.stop()
+
+def test_subscription_rate_limit():
+	listener = _started()
+	limited, unlimited = [], []
+	listener.subscribe(limited.append, EventFilter(rate_limit=1))
+	listener.subscribe(unlimited.append, EventFilter())
+	listener.run([(5, 0, False)] * 10)
+	assert len(limited) == 1 and len(unlimited) == 10
+	listener.stop()
+
+def test_cancelled_subscriptions_stop_receiving():
+	listener = _started()
+	first, second = [], []
+	subscription = listener.subscribe(first.append, EventFilter(keycodes=[5]))
+	listener.subscribe(second.append, EventFilter(keycodes=[5]))
+	listener.run([(5, 0, False)])
+	subscription.cancel()
+	# Cancelling twice does nothing.
+	subscription.cancel()
+	listener.run([(5, 0, False)])
+	assert len(first) == 1 and len(second) == 2
+	listener.stop()
+
+def test_subscriptions_see_unbound_events_but_not_while_paused():
+	listener = _started()
+	events, calls = [], []
+	listener.bind(lambda: calls.append(5), 5)
+	listener.subscribe(events.append)
+	listener.run([(5, 0, False), (6, 0, False)])
+	listener.pause()
+	listener.run([(5, 0, False)])
+	assert [tuple(event) for event in events] == [(5, 0, False), (6, 0, False)] and calls == [5]
+	listener.stop()
+
+def test_temporal_bindings_follow_the_virtual_clock():
+	listener = _started()
+	calls = []
+	listener.temporal.hold(lambda: calls.append(('hold', listener.time)), 1, ms=500)
+	listener.temporal.tap(lambda: calls.append(('tap', listener.time)), 1, max_ms=200)
+	listener.temporal.double_tap(lambda: calls.append(('double', listener.time)), 1, within_ms=300)
+	listener.run([(1, 0, False, 1000), (1, 0, True, 1100), (1, 0, False, 1250), (1, 0, True, 1300)])
+	listener.advance(100)
+	# An autorepeat release and press share a timestamp, and do not end the hold.
+	listener.run([(1, 0, False, 2000), (1, 0, True, 2300), (1, 0, False, 2300)])
+	listener.advance(300)
+	listener.run([(1, 0, True, 2700)])
+	listener.advance(100)
+	listener.run([])
+	assert calls == [('tap', 1250), ('double', 1250), ('tap', 1400), ('hold', 2600)]
+	listener.stop()
+
+def benchmark(count=1_000_000):
+	""" Prints how many events per second the dispatch path handles. """
+	listener = SimulatedListener(record_calls=False)
+	listener.start(threaded=False)
+	for keycode in range(8, 108):
+		listener.bind(lambda: None, keycode)
+	events = [(8 + i % 200, 0, False) for i in range(count)]
+	start = perf_counter()
+	listener.run(events)
+	elapsed = perf_counter() - start
+	print('{:,.0f} events/sec, half of them bound'.format(count / elapsed))
+	listener.stop()
+
+def main():
+	for name, test in sorted(globals().items()):
+		if name.startswith('test_'):
+			test()
+			print(name, 'passed')
+	benchmark()
+
+if __name__ == '__main__':
+	main()
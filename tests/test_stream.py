@@ -0,0 +1,45 @@
+from threading import Thread
+
+from keywatch.simulated import SimulatedListener
+from keywatch.stream import MergedStream
+
+def _started() -> SimulatedListener:
+	listener = SimulatedListener()
+	listener.start(threaded=False)
+	return listener
+
+def test_events_are_ordered_by_timestamp():
+	keyboard, mouse = _started(), _started()
+	stream = MergedStream([keyboard, mouse], window_ms=50)
+	received = []
+	consumer = Thread(target=lambda: received.extend(stream))
+	consumer.start()
+	# The mouse's events are handed over after the keyboard's, although some of them happened first.
+	keyboard.run([(37, 0, False, 1000), (38, 4, False, 1030), (37, 0, True, 1060)])
+	mouse.run([(1, 4, False, 1020), (1, 4, True, 1050)])
+	stream.close()
+	consumer.join()
+	assert [(event.timestamp, event.keycode) for event in received] == [(1000, 37), (1020, 1), (1030, 38), (1050, 1), (1060, 37)]
+	assert [event.source for event in received] == [keyboard, mouse, keyboard, mouse, keyboard]
+	assert stream.late == 0
+	keyboard.stop()
+	mouse.stop()
+
+def test_callback_consumer():
+	keyboard = _started()
+	stream = MergedStream([keyboard], window_ms=0)
+	received = []
+	stream.start(received.append)
+	keyboard.run([(10, 0, False, 5), (10, 0, True, 6)])
+	stream.close()
+	assert [(event.keycode, event.is_keyup) for event in received] == [(10, False), (10, True)]
+	keyboard.stop()
+
+def main():
+	for name, test in sorted(globals().items()):
+		if name.startswith('test_'):
+			test()
+			print(name, 'passed')
+
+if __name__ == '__main__':
+	main()